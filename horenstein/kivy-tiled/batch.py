@@ -0,0 +1,154 @@
+"""Path finding for many agents at once, spread over a pool of processes.
+
+The collision grid is copied into shared memory once and every worker
+searches it in place, so a batch only sends the (start, dest) pairs and the
+paths found over the process boundary. Paths come back as arrays of tile
+indices rather than lists of tuples to keep that cheap too.
+
+Like pathfinding, nothing in here touches Kivy, the workers never import it.
+"""
+import array
+import concurrent.futures
+import os
+from multiprocessing import shared_memory
+
+from grid import CollisionGrid, CostGrid
+from searches import ALGORITHMS, GridSearches
+
+# tile indices fit in 32 bits on any map that fits in memory
+INDEX_TYPECODE = 'I'
+
+# bytes of the double each tile cost is shared as
+COST_SIZE = 8
+
+
+class BatchPlanner(object):
+    """Solves batches of path queries on a process pool.
+
+    The pool and the shared copy of the grid live until close is called,
+    changes to the grid are copied over before the next batch.
+
+    :param grid: The collision grid to search.
+    :type grid: CollisionGrid
+    :param workers: Number of worker processes, one per core if None.
+    :type workers: int
+    :param hpa_cluster_size: Cluster size of the 'hpa' algorithm.
+    :type hpa_cluster_size: int
+    :param costs: Tile costs of the 'astar' algorithm, shared with the
+        workers like the grid.
+    :type costs: CostGrid
+    """
+
+    def __init__(self, grid, workers=None, hpa_cluster_size=16, costs=None):
+        self.grid = grid
+        self.workers = workers or os.cpu_count() or 1
+        self.hpa_cluster_size = hpa_cluster_size
+        self.costs = costs
+
+        size = grid.width * grid.height
+        self._shared = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self._shared.buf[:size] = bytes(grid.cells)
+        self._shared_costs = None
+        if costs is not None:
+            self._shared_costs = shared_memory.SharedMemory(create=True, size=max(size * COST_SIZE, 1))
+            self._shared_costs.buf[:size * COST_SIZE] = costs.costs.tobytes()
+            self._costs_version = costs.version
+        # bumped when the grid changes so workers drop what they built on it
+        self._generation = 0
+        self._dirty = False
+        grid.add_listener(self._on_tile_changed)
+
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_start_worker,
+            initargs=(self._shared.name, self._shared_costs and self._shared_costs.name,
+                      grid.width, grid.height, hpa_cluster_size))
+
+    def find_paths(self, pairs, algorithm='astar', chunk_size=None):
+        """Find the paths between many pairs of tiles.
+
+        :param pairs: The (start, dest) coordinate tuples to find paths for.
+        :type pairs: list
+        :param algorithm: One of ALGORITHMS.
+        :type algorithm: str
+        :param chunk_size: Pairs sent to a worker at a time, enough for each
+            worker to get a few chunks if None.
+        :type chunk_size: int
+        :return: List of paths in the order of pairs, each a list of
+            coordinate tuples or an empty list if there is no path.
+        :rtype: list
+        """
+        if algorithm not in ALGORITHMS:
+            raise ValueError('Unknown path finding algorithm "{}", use one of {}'.format(algorithm, ALGORITHMS))
+        pairs = [(tuple(start), tuple(dest)) for start, dest in pairs]
+        if not pairs:
+            return []
+
+        if self.costs is not None and self.costs.version != self._costs_version:
+            size = self.grid.width * self.grid.height
+            self._shared_costs.buf[:size * COST_SIZE] = self.costs.costs.tobytes()
+            self._costs_version = self.costs.version
+            self._generation += 1
+        if self._dirty:
+            size = self.grid.width * self.grid.height
+            self._shared.buf[:size] = bytes(self.grid.cells)
+            self._generation += 1
+            self._dirty = False
+
+        chunk_size = chunk_size or max(1, len(pairs) // (self.workers * 4))
+        chunks = [pairs[i:i + chunk_size] for i in range(0, len(pairs), chunk_size)]
+        tasks = [(self._generation, algorithm, chunk) for chunk in chunks]
+
+        width = self.grid.width
+        paths = []
+        for chunk_paths in self._executor.map(_find_paths, tasks):
+            for indices in chunk_paths:
+                paths.append([(index % width, index // width) for index in array.array(INDEX_TYPECODE, indices)])
+        return paths
+
+    def close(self):
+        """Stop the workers and free the shared grid."""
+        self.grid.remove_listener(self._on_tile_changed)
+        self._executor.shutdown()
+        for shared in (self._shared, self._shared_costs):
+            if shared is not None:
+                shared.close()
+                shared.unlink()
+
+    def _on_tile_changed(self, x, y, blocked):
+        self._dirty = True
+
+
+# the state of a worker process, set up by _start_worker
+_worker = {}
+
+
+def _start_worker(shared_name, shared_costs_name, width, height, hpa_cluster_size):
+    _worker['shared'] = shared_memory.SharedMemory(name=shared_name)
+    _worker['shared_costs'] = shared_memory.SharedMemory(name=shared_costs_name) if shared_costs_name else None
+    _worker['searches'] = _grid_searches(width, height, hpa_cluster_size)
+    _worker['generation'] = 0
+
+
+def _grid_searches(width, height, hpa_cluster_size):
+    size = width * height
+    costs = None
+    if _worker['shared_costs'] is not None:
+        costs = CostGrid(width, height, _worker['shared_costs'].buf[:size * COST_SIZE].cast('d'))
+    return GridSearches(CollisionGrid(width, height, _worker['shared'].buf[:size]), hpa_cluster_size, costs)
+
+
+def _find_paths(task):
+    generation, algorithm, pairs = task
+    searches = _worker['searches']
+    if generation != _worker['generation']:
+        # the neighbor masks, jump tables and clusters were built on the grid
+        # before it changed
+        grid = searches.grid
+        searches = _worker['searches'] = _grid_searches(grid.width, grid.height, searches.hpa_cluster_size)
+        _worker['generation'] = generation
+
+    width = searches.grid.width
+    return [
+        array.array(INDEX_TYPECODE, [y * width + x for x, y in searches.find_path(algorithm, start, dest)]).tobytes()
+        for start, dest in pairs
+    ]
@@ -0,0 +1,49 @@
+"""Measure the throughput of the batch planner in paths per second against
+finding the same paths one after the other.
+
+Run from the kivy-tiled directory, optionally with the number of worker
+processes (one per core by default):
+
+    python benchmarks/bench_batch_paths.py [workers]
+"""
+import os
+import sys
+import timeit
+
+from maps import open_field, random_queries, rooms
+
+from batch import BatchPlanner
+from pathfinding import astar
+
+QUERIES = 200
+
+
+def report(name, elapsed, count):
+    print('  {:<16} {:>9.1f} paths/s'.format(name, count / elapsed))
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count() or 1
+    for name, grid in (('open field', open_field(256, 256)), ('rooms', rooms(256, 256))):
+        queries = random_queries(grid, QUERIES)
+        print('256x256 {}, {} queries, {} workers'.format(name, QUERIES, workers))
+
+        start_time = timeit.default_timer()
+        loop_paths = [astar(grid, start, dest) for start, dest in queries]
+        report('loop', timeit.default_timer() - start_time, QUERIES)
+
+        start_time = timeit.default_timer()
+        planner = BatchPlanner(grid, workers)
+        # the first batch pays for starting the worker processes
+        planner.find_paths(queries[:workers])
+        print('  pool start {:>8.2f} ms'.format((timeit.default_timer() - start_time) * 1000.0))
+
+        start_time = timeit.default_timer()
+        batch_paths = planner.find_paths(queries)
+        report('batch', timeit.default_timer() - start_time, QUERIES)
+        planner.close()
+        assert [len(path) for path in loop_paths] == [len(path) for path in batch_paths]
+
+
+if __name__ == '__main__':
+    main()
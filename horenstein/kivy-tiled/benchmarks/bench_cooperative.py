@@ -0,0 +1,80 @@
+"""Plan 100 and 300 agents at once with the cooperative planner, stepping
+them all until they arrive, and check none of them ever run into each
+other. The planner gets a few frames per step, as CooperativeMovement
+plans every frame and steps every half a second.
+
+Each frame is only limited by the tiles searched, not by time, so the
+agents that arrive only depend on the seed the starts and destinations
+are picked with, 0 unless given.
+
+Run from the kivy-tiled directory:
+
+    python benchmarks/bench_cooperative.py [seed]
+"""
+import random
+import sys
+import timeit
+
+from maps import open_field, random_walkable_tile, rooms
+
+from cooperative import CooperativePlanner
+
+AGENTS = (100, 300)
+BUDGET = 2000
+FRAMES_PER_STEP = 4
+MAX_STEPS = 400
+
+
+def conflicts(before, after):
+    """Count the agents sharing a tile or swapping tiles between two steps."""
+    count = len(after) - len(set(after.values()))
+    agents_by_tile = dict((tile, agent_id) for agent_id, tile in before.items())
+    for agent_id, tile in after.items():
+        other_id = agents_by_tile.get(tile)
+        if other_id is not None and other_id != agent_id and after[other_id] == before[agent_id]:
+            count += 1
+    return count
+
+
+def main():
+    seed = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+    for name, grid in (('open field', open_field(128, 128)), ('rooms', rooms(128, 128))):
+        for agent_count in AGENTS:
+            rng = random.Random(seed)
+            tiles = set()
+            while len(tiles) < agent_count * 2:
+                tiles.add(random_walkable_tile(grid, rng))
+            tiles = list(tiles)
+            rng.shuffle(tiles)
+
+            planner = CooperativePlanner(grid)
+            for agent_id in range(agent_count):
+                planner.add_agent(agent_id, tiles[agent_id], tiles[agent_count + agent_id])
+            positions = dict((agent_id, tiles[agent_id]) for agent_id in range(agent_count))
+
+            frame_times = []
+            conflict_count = 0
+            for _ in range(MAX_STEPS):
+                for _ in range(FRAMES_PER_STEP):
+                    start_time = timeit.default_timer()
+                    planner.plan(BUDGET)
+                    frame_times.append((timeit.default_timer() - start_time) * 1000.0)
+                new_positions = planner.advance()
+                conflict_count += conflicts(positions, new_positions)
+                positions = new_positions
+                if all(planner.is_done(agent_id) for agent_id in positions):
+                    break
+
+            arrived = sum(planner.is_done(agent_id) for agent_id in positions)
+            print('128x128 {}, {} agents, seed {}, budget {} tiles per frame'.format(
+                name, agent_count, seed, BUDGET))
+            print('  arrived             {:>9} after {} steps'.format(arrived, planner.time))
+            print('  stalled             {:>9}'.format(len(planner.stalled())))
+            print('  conflicts           {:>9}'.format(conflict_count))
+            print('  plan per frame      {:>9.2f} ms mean {:>9.2f} ms worst'.format(
+                sum(frame_times) / len(frame_times), max(frame_times)))
+            planner.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Compare the A* find_path against the random-sample search it replaced,
+and against the hierarchical (HPA*) search on the bigger maps.
+
+Run from the kivy-tiled directory:
+
+    python benchmarks/bench_find_path.py
+"""
+import random
+import timeit
+
+from maps import open_field, random_queries
+
+from hpa import HierarchicalPathfinder
+from pathfinding import astar
+
+
+def legacy_find_path(grid, start, dest):
+    """The search find_path used before A*, kept here as the baseline.
+
+    random.sample() stopped accepting sets in Python 3.11, choosing from a
+    tuple of the set is what it did internally before that.
+    """
+    came_from = {start: None}
+    reachable = set([start])
+    explored = set()
+    while reachable:
+        node = random.choice(tuple(reachable))
+        if node == dest:
+            path = []
+            while node is not None:
+                path.insert(0, node)
+                node = came_from[node]
+            return path
+        reachable.remove(node)
+        explored.add(node)
+        for adjacent in grid.neighbors(*node):
+            if adjacent not in explored and adjacent not in reachable:
+                came_from[adjacent] = node
+                reachable.add(adjacent)
+    return []
+
+
+def run(name, search, grid, queries):
+    lengths = []
+    start_time = timeit.default_timer()
+    for start, dest in queries:
+        lengths.append(len(search(grid, start, dest)))
+    elapsed = timeit.default_timer() - start_time
+    found = [length for length in lengths if length]
+    print('  {:<8} {:>9.2f} ms/query  avg path length {:>7.1f}'.format(
+        name, elapsed * 1000.0 / len(queries), sum(found) / float(len(found) or 1)))
+
+
+def main():
+    random.seed(0)
+    # the legacy search is far too slow to run on the big maps
+    for size, count, with_legacy in ((32, 20, True), (64, 10, True), (128, 3, True), (256, 10, False)):
+        grid = open_field(size, size)
+        queries = random_queries(grid, count)
+        print('{0}x{0} open field, 20% blocked, {1} queries'.format(size, count))
+        if with_legacy:
+            run('legacy', legacy_find_path, grid, queries)
+        run('astar', astar, grid, queries)
+        if size >= 128:
+            start_time = timeit.default_timer()
+            pathfinder = HierarchicalPathfinder(grid)
+            print('  hpa build {:>6.2f} ms'.format((timeit.default_timer() - start_time) * 1000.0))
+            run('hpa', lambda grid, start, dest: pathfinder.find_path(start, dest), grid, queries)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Compare one flow field against a search per agent when every agent heads
+to the same tiles, and updating the field against building it again.
+
+Run from the kivy-tiled directory:
+
+    python benchmarks/bench_flow_field.py
+"""
+import random
+import timeit
+
+from maps import maze, open_field, random_walkable_tile, rooms
+
+from flowfield import FlowField
+from pathfinding import astar
+
+AGENTS = 100
+TARGETS = 8
+CHANGES = 50
+
+
+def timed(function):
+    start_time = timeit.default_timer()
+    result = function()
+    return result, (timeit.default_timer() - start_time) * 1000.0
+
+
+def main():
+    for name, grid in (('open field', open_field(256, 256)), ('maze', maze(257, 257)), ('rooms', rooms(256, 256))):
+        rng = random.Random(0)
+        targets = [random_walkable_tile(grid, rng) for _ in range(TARGETS)]
+        agents = [random_walkable_tile(grid, rng) for _ in range(AGENTS)]
+        print('256x256 {}, {} agents, {} targets'.format(name, AGENTS, TARGETS))
+
+        def search_per_agent():
+            # the nearest target is only known after searching for each
+            return [min((astar(grid, agent, target) for target in targets), key=lambda path: len(path) or len(grid.cells))
+                    for agent in agents[:AGENTS // 10]]
+        _, elapsed = timed(search_per_agent)
+        print('  astar per agent     {:>9.2f} ms for {} agents'.format(elapsed, AGENTS // 10))
+
+        flow_field, elapsed = timed(lambda: FlowField(grid, targets))
+        print('  flow field build    {:>9.2f} ms'.format(elapsed))
+        _, elapsed = timed(lambda: [flow_field.next_step(*agent) for agent in agents])
+        print('  next_step           {:>9.4f} ms per agent'.format(elapsed / AGENTS))
+        _, elapsed = timed(lambda: flow_field.next_steps(agents))
+        print('  next_steps          {:>9.4f} ms for all agents'.format(elapsed))
+
+        total = 0.0
+        for _ in range(CHANGES):
+            x, y = rng.randrange(grid.width), rng.randrange(grid.height)
+            grid.set_blocked(x, y, grid.is_walkable(x, y))
+            _, elapsed = timed(lambda: flow_field.distance(0, 0))
+            total += elapsed
+        print('  incremental update  {:>9.2f} ms per changed tile'.format(total / CHANGES))
+
+
+if __name__ == '__main__':
+    main()
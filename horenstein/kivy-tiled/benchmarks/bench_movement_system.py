@@ -0,0 +1,57 @@
+"""Measure the time a frame takes to move every agent along its path, one
+at a time in Python as the per-agent animations do against all at once with
+PathFollowers.
+
+Run from the kivy-tiled directory:
+
+    python benchmarks/bench_movement_system.py
+"""
+import timeit
+
+from maps import open_field, random_queries
+
+from movement import PathFollowers
+from pathfinding import astar
+
+PATHS = 200
+FRAMES = 120
+FRAME_TIME = 1.0 / 60
+
+
+def per_agent_frame(agents, dt):
+    """Move each agent like an Animation does, the way the agents would
+    without a movement system.
+    """
+    for agent in agents:
+        path, travelled = agent[0], min(agent[1] + 2.0 * dt, len(agent[0]) - 1)
+        agent[1] = travelled
+        step = int(travelled)
+        (x0, y0), (x1, y1) = path[step], path[min(step + 1, len(path) - 1)]
+        fraction = travelled - step
+        agent[2] = x0 + (x1 - x0) * fraction, y0 + (y1 - y0) * fraction
+
+
+def main():
+    grid = open_field(256, 256)
+    paths = [path for path in (astar(grid, start, dest) for start, dest in random_queries(grid, PATHS)) if path]
+    print('256x256 open field, {} frames'.format(FRAMES))
+    for count in (1000, 5000, 10000):
+        agents = [[paths[index % len(paths)], 0.0, None] for index in range(count)]
+        start_time = timeit.default_timer()
+        for frame in range(FRAMES):
+            per_agent_frame(agents, FRAME_TIME)
+        per_agent = (timeit.default_timer() - start_time) * 1000.0 / FRAMES
+
+        followers = PathFollowers(grid, capacity=count)
+        for index in range(count):
+            followers.add(paths[index % len(paths)])
+        start_time = timeit.default_timer()
+        for frame in range(FRAMES):
+            followers.advance(FRAME_TIME)
+        batched = (timeit.default_timer() - start_time) * 1000.0 / FRAMES
+
+        print('  {:>6} agents {:>9.2f} ms per agent {:>9.2f} ms batched per frame'.format(count, per_agent, batched))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Compare A* and Jump Point Search on open field, maze and room and corridor
+maps, checking that JPS finds paths as short as A*'s.
+
+Run from the kivy-tiled directory:
+
+    python benchmarks/bench_path_algorithms.py
+"""
+import timeit
+
+from maps import maze, open_field, random_queries, rooms
+
+from jps import JumpPointSearch
+from pathfinding import astar
+
+QUERIES = 20
+
+
+def run(name, search, grid, queries):
+    start_time = timeit.default_timer()
+    lengths = [len(search(grid, start, dest)) for start, dest in queries]
+    elapsed = (timeit.default_timer() - start_time) * 1000.0 / len(queries)
+    print('  {:<6} {:>8.2f} ms/query'.format(name, elapsed))
+    return lengths, elapsed
+
+
+def main():
+    for size in (64, 256):
+        maps = (
+            ('empty field', open_field(size, size, density=0.0)),
+            ('open field', open_field(size, size)),
+            ('maze', maze(size + 1, size + 1)),
+            ('rooms', rooms(size, size)),
+        )
+        for name, grid in maps:
+            queries = random_queries(grid, QUERIES)
+            print('{0}x{0} {1}, {2} queries'.format(size, name, QUERIES))
+            astar_lengths, astar_elapsed = run('astar', astar, grid, queries)
+
+            start_time = timeit.default_timer()
+            jump_point_search = JumpPointSearch(grid)
+            jump_point_search.build_tables()
+            tables_elapsed = (timeit.default_timer() - start_time) * 1000.0
+            print('  jps tables {:>6.2f} ms'.format(tables_elapsed))
+            jps_lengths, jps_elapsed = run(
+                'jps', lambda grid, start, dest: jump_point_search.find_path(start, dest), grid, queries)
+            assert astar_lengths == jps_lengths, 'JPS found paths of a different length than A*'
+
+            # queries it takes for the tables to pay for themselves
+            if jps_elapsed < astar_elapsed:
+                print('  jps pays off after {:.0f} queries'.format(tables_elapsed / (astar_elapsed - jps_elapsed)))
+            else:
+                print('  jps never pays off')
+
+
+if __name__ == '__main__':
+    main()
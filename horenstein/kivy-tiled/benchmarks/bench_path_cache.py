@@ -0,0 +1,48 @@
+"""Measure the path cache on agents going back and forth between a few spots
+while tiles keep changing.
+
+Run from the kivy-tiled directory:
+
+    python benchmarks/bench_path_cache.py
+"""
+import random
+import timeit
+
+from maps import open_field, random_walkable_tile
+
+from path_cache import PathCache
+from pathfinding import astar
+
+SIZE = 128
+SPOTS = 8
+QUERIES = 2000
+# one tile flips every this many queries
+CHANGE_EVERY = 20
+
+
+def run(name, grid, find_path):
+    rng = random.Random(0)
+    spots = [random_walkable_tile(grid, rng) for _ in range(SPOTS)]
+    start_time = timeit.default_timer()
+    for query in range(QUERIES):
+        find_path(rng.choice(spots), rng.choice(spots))
+        if query % CHANGE_EVERY == 0:
+            x, y = rng.randrange(grid.width), rng.randrange(grid.height)
+            grid.set_blocked(x, y, grid.is_walkable(x, y))
+    elapsed = timeit.default_timer() - start_time
+    print('  {:<8} {:>7.3f} ms/query'.format(name, elapsed * 1000.0 / QUERIES))
+
+
+def main():
+    print('{0}x{0} open field, {1} queries between {2} spots'.format(SIZE, QUERIES, SPOTS))
+    grid = open_field(SIZE, SIZE)
+    run('astar', grid, lambda start, dest: astar(grid, start, dest))
+
+    grid = open_field(SIZE, SIZE)
+    path_cache = PathCache(grid)
+    run('cached', grid, lambda start, dest: path_cache.find_path(start, dest, lambda start, dest: astar(grid, start, dest)))
+    print('  {}'.format(path_cache.stats()))
+
+
+if __name__ == '__main__':
+    main()
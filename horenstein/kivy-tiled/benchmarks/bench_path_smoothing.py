@@ -0,0 +1,35 @@
+"""Measure how many animations a TileMovement runs for a path walked tile by
+tile against pulled straight, and what pulling it straight costs.
+
+Run from the kivy-tiled directory:
+
+    python benchmarks/bench_path_smoothing.py
+"""
+import timeit
+
+from maps import maze, open_field, random_queries, rooms
+
+from pathfinding import astar
+from smoothing import smooth_path
+
+QUERIES = 50
+
+
+def main():
+    for name, grid in (('open field', open_field(256, 256)), ('rooms', rooms(256, 256)), ('maze', maze(257, 257))):
+        paths = [astar(grid, start, dest) for start, dest in random_queries(grid, QUERIES)]
+        paths = [path for path in paths if path]
+
+        start_time = timeit.default_timer()
+        smoothed = [smooth_path(grid, path) for path in paths]
+        elapsed = (timeit.default_timer() - start_time) * 1000.0 / len(paths)
+
+        steps = sum(len(path) - 1 for path in paths) / float(len(paths))
+        lines = sum(len(path) - 1 for path in smoothed) / float(len(paths))
+        print('256x256 {}, {} paths'.format(name, len(paths)))
+        print('  {:>8.1f} steps {:>8.1f} lines per path, {:.1f}x fewer animations, {:.2f} ms to smooth'.format(
+            steps, lines, steps / lines, elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Compare the TileMap renderers by instruction count and frame time.
+
+This one needs a window. Run it from the kivy-tiled directory, optionally
+with the map to draw:
+
+    python benchmarks/bench_renderer.py [path/to/map.tmx]
+"""
+import os
+import sys
+import timeit
+
+# keep kivy from parsing the map path as one of its own options
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kivy.config import Config
+
+# uncapped frame rate, otherwise every renderer reports the vsync interval
+Config.set('graphics', 'maxfps', '0')
+Config.set('graphics', 'vsync', '0')
+
+from kivy.app import App
+from kivy.clock import Clock
+from kivy.uix.floatlayout import FloatLayout
+
+from tiled import TileMap
+
+FRAMES = 300
+
+
+def count_instructions(instruction):
+    children = getattr(instruction, 'children', None) or []
+    return len(children) + sum(count_instructions(child) for child in children)
+
+
+class RendererBenchmarkApp(App):
+
+    def __init__(self, map_file_path, **kwargs):
+        super(RendererBenchmarkApp, self).__init__(**kwargs)
+        self.map_file_path = map_file_path
+        self.runs = [('rectangles', 16), ('rectangles', None), ('mesh', 16), ('mesh', None)]
+
+    def build(self):
+        self.root_widget = FloatLayout()
+        Clock.schedule_once(lambda *args: self.next_run())
+        return self.root_widget
+
+    def next_run(self):
+        self.root_widget.clear_widgets()
+        if not self.runs:
+            self.stop()
+            return
+
+        renderer, chunk_size = self.runs.pop(0)
+        self.label = '{:<10} chunk_size={}'.format(renderer, chunk_size)
+
+        start_time = timeit.default_timer()
+        self.tile_map = TileMap(self.map_file_path, chunk_size=chunk_size, renderer=renderer)
+        self.root_widget.add_widget(self.tile_map)
+        self.tile_map.on_size()
+        self.build_time = timeit.default_timer() - start_time
+
+        self.frame_times = []
+        Clock.schedule_interval(self.on_frame, 0)
+
+    def on_frame(self, dt):
+        self.frame_times.append(dt)
+        if len(self.frame_times) < FRAMES:
+            return
+
+        # the first frames include uploading the textures
+        frame_times = self.frame_times[10:]
+        print('{}  build {:>7.2f} ms  {:>6} instructions  {:>6.2f} ms/frame'.format(
+            self.label, self.build_time * 1000.0, count_instructions(self.tile_map.canvas),
+            sum(frame_times) * 1000.0 / len(frame_times)))
+        Clock.schedule_once(lambda *args: self.next_run())
+        return False
+
+
+if __name__ == '__main__':
+    map_file_path = sys.argv[1] if len(sys.argv) > 1 else 'test/assets/testmap.tmx'
+    RendererBenchmarkApp(map_file_path).run()
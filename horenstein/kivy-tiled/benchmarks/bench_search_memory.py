@@ -0,0 +1,84 @@
+"""Measure what a find_path search takes, with its g scores and parents
+kept in dictionaries against in the reused arrays, on grids below and above
+DENSE_SEARCH_MIN_TILES. The arrays allocate a fraction of what the
+dictionaries do, but only search clearly faster once searches take hundreds
+of thousands of tiles, such as through the 512x512 maze; the times are the
+best of a few runs of each, taken in turns, as they vary from run to run
+about as much as the smaller differences.
+
+Run from the kivy-tiled directory:
+
+    python benchmarks/bench_search_memory.py
+"""
+import timeit
+import tracemalloc
+
+from maps import maze, open_field, random_queries
+
+import pathfinding
+from pathfinding import astar
+
+QUERIES = 20
+REPEATS = 3
+
+# label to the DENSE_SEARCH_MIN_TILES and DENSE_SEARCH_MAX_TILES searching
+# every grid with them
+KINDS = (('dictionaries', 0, 0), ('arrays', 0, 1 << 22))
+
+
+def measure_time(grid, queries):
+    """Get the mean time per search.
+    :rtype: float
+    """
+    start_time = timeit.default_timer()
+    for start, dest in queries:
+        astar(grid, start, dest)
+    return (timeit.default_timer() - start_time) * 1000.0 / len(queries)
+
+
+def measure_memory(grid, queries):
+    """Get the mean peak memory allocated per search.
+    :rtype: float
+    """
+    peaks = 0
+    tracemalloc.start()
+    for start, dest in queries:
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        astar(grid, start, dest)
+        peaks += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    return peaks / 1024.0 / len(queries)
+
+
+def use(min_tiles, max_tiles):
+    pathfinding.DENSE_SEARCH_MIN_TILES = min_tiles
+    pathfinding.DENSE_SEARCH_MAX_TILES = max_tiles
+
+
+def main():
+    defaults = pathfinding.DENSE_SEARCH_MIN_TILES, pathfinding.DENSE_SEARCH_MAX_TILES
+    for size in (128, 512):
+        for name, grid in (('open field', open_field(size, size)), ('maze', maze(size + 1, size + 1))):
+            queries = random_queries(grid, QUERIES)
+            # the neighbor masks and the arrays are built once, not per search
+            for _, min_tiles, max_tiles in KINDS:
+                use(min_tiles, max_tiles)
+                astar(grid, *queries[0])
+
+            times = dict((label, []) for label, _, _ in KINDS)
+            for _ in range(REPEATS):
+                for label, min_tiles, max_tiles in KINDS:
+                    use(min_tiles, max_tiles)
+                    times[label].append(measure_time(grid, queries))
+
+            print('{0}x{0} {1}, {2} queries, best of {3}'.format(size, name, QUERIES, REPEATS))
+            for label, min_tiles, max_tiles in KINDS:
+                use(min_tiles, max_tiles)
+                peak = measure_memory(grid, queries)
+                print('  {:<13} {:>9.2f} ms {:>9.1f} KiB allocated per search'.format(label, min(times[label]), peak))
+            use(*defaults)
+
+
+if __name__ == '__main__':
+    main()
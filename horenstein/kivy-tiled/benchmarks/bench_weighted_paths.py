@@ -0,0 +1,58 @@
+"""Measure what weighing find_path's A* by tile costs adds to a search: no
+costs, every tile costing 1, and roads costing 1 across mud costing 3.
+
+Run from the kivy-tiled directory:
+
+    python benchmarks/bench_weighted_paths.py
+"""
+import random
+import timeit
+
+from maps import open_field, random_queries, rooms
+
+from grid import CostGrid
+from pathfinding import astar
+
+QUERIES = 50
+
+
+def mud_and_roads(grid, seed=0):
+    """Cover the grid in mud with a road every 8 rows and columns.
+    :rtype: CostGrid
+    """
+    rng = random.Random(seed)
+    costs = CostGrid(grid.width, grid.height)
+    for y in range(grid.height):
+        for x in range(grid.width):
+            if x % 8 and y % 8:
+                costs.set_cost(x, y, rng.choice((2.0, 3.0)))
+    return costs
+
+
+def measure(grid, queries, costs):
+    """Get the mean time per search and the mean path length.
+    :rtype: (float, float)
+    """
+    astar(grid, *queries[0], costs=costs)
+
+    steps = 0
+    start_time = timeit.default_timer()
+    for start, dest in queries:
+        steps += len(astar(grid, start, dest, costs=costs))
+    elapsed = (timeit.default_timer() - start_time) * 1000.0 / len(queries)
+    return elapsed, steps / float(len(queries))
+
+
+def main():
+    for name, grid in (('open field', open_field(256, 256)), ('rooms', rooms(256, 256))):
+        queries = random_queries(grid, QUERIES)
+        print('256x256 {}, {} queries'.format(name, QUERIES))
+        for label, costs in (('no costs', None),
+                             ('uniform', CostGrid(grid.width, grid.height)),
+                             ('mud, roads', mud_and_roads(grid))):
+            elapsed, steps = measure(grid, queries, costs)
+            print('  {:<11} {:>9.2f} ms {:>8.1f} tiles per path'.format(label, elapsed, steps))
+
+
+if __name__ == '__main__':
+    main()
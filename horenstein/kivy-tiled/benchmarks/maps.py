@@ -0,0 +1,86 @@
+"""Synthetic collision grids for the benchmarks.
+
+The benchmarks work on the CollisionGrid a KivyTiledMap compiles, so they can
+run without loading a .tmx file or opening a Kivy window.
+"""
+import os
+import random
+import sys
+
+# make the modules next to tiled.py importable when running from benchmarks/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grid import CollisionGrid
+
+
+def open_field(width, height, density=0.2, seed=0):
+    """A grid with a fraction of its tiles randomly blocked."""
+    rng = random.Random(seed)
+    cells = bytearray(1 if rng.random() < density else 0 for _ in range(width * height))
+    return CollisionGrid(width, height, cells)
+
+
+def random_walkable_tile(grid, rng):
+    while True:
+        x, y = rng.randrange(grid.width), rng.randrange(grid.height)
+        if grid.is_walkable(x, y):
+            return x, y
+
+
+def random_queries(grid, count, seed=0):
+    """Pairs of (start, dest) walkable tiles."""
+    rng = random.Random(seed)
+    return [(random_walkable_tile(grid, rng), random_walkable_tile(grid, rng)) for _ in range(count)]
+
+
+def maze(width, height, seed=0):
+    """A perfect maze with one tile wide corridors, carved by a depth first
+    walk over the tiles at odd coordinates.
+    """
+    rng = random.Random(seed)
+    cells = bytearray(b'\x01' * (width * height))
+    cells[width + 1] = 0
+    stack = [(1, 1)]
+    while stack:
+        x, y = stack[-1]
+        unvisited = [
+            (x + dx, y + dy) for dx, dy in ((0, -2), (0, 2), (-2, 0), (2, 0))
+            if 0 < x + dx < width - 1 and 0 < y + dy < height - 1 and cells[(y + dy) * width + x + dx]
+        ]
+        if not unvisited:
+            stack.pop()
+            continue
+        next_x, next_y = rng.choice(unvisited)
+        cells[((y + next_y) // 2) * width + (x + next_x) // 2] = 0
+        cells[next_y * width + next_x] = 0
+        stack.append((next_x, next_y))
+    return CollisionGrid(width, height, cells)
+
+
+def rooms(width, height, room_count=None, seed=0):
+    """Rectangular rooms joined by one tile wide corridors, each room to the
+    one placed before it, on an otherwise blocked grid.
+    """
+    rng = random.Random(seed)
+    room_count = room_count or width * height // 256
+    cells = bytearray(b'\x01' * (width * height))
+
+    def carve(x0, y0, x1, y1):
+        for y in range(min(y0, y1), max(y0, y1) + 1):
+            for x in range(min(x0, x1), max(x0, x1) + 1):
+                cells[y * width + x] = 0
+
+    centers = []
+    for _ in range(room_count):
+        room_width, room_height = rng.randint(4, 12), rng.randint(4, 12)
+        x = rng.randrange(1, width - room_width - 1)
+        y = rng.randrange(1, height - room_height - 1)
+        carve(x, y, x + room_width - 1, y + room_height - 1)
+        center = (x + room_width // 2, y + room_height // 2)
+        if centers:
+            # an L shaped corridor, horizontal then vertical
+            last_x, last_y = centers[-1]
+            carve(last_x, last_y, center[0], last_y)
+            carve(center[0], last_y, center[0], center[1])
+        centers.append(center)
+    return CollisionGrid(width, height, cells)
@@ -0,0 +1,285 @@
+"""Connected components of the walkable tiles of a collision grid.
+
+Every walkable tile is labelled with the component it belongs to, so
+whether a path exists between two tiles is a comparison of their labels
+instead of a search through everything reachable from the start.
+
+Labels are kept up to date as the grid changes. A tile becoming walkable
+joins the components around it, relabelling all but the biggest. A tile
+becoming collidable can only split its component between its neighbors,
+which are searched from side by side until they all meet up or the smaller
+pieces run out of tiles, and those pieces get new labels.
+"""
+import array
+import collections
+
+# label of the collidable tiles
+BLOCKED = -1
+
+# label of the walkable tiles not flooded yet while labelling from scratch
+_UNLABELLED = -2
+
+# past this many changed tiles labelling from scratch beats fixing each one up
+MAX_INCREMENTAL_CHANGES = 64
+
+
+class ComponentLabels(object):
+    """Connected component labels of the walkable tiles of a CollisionGrid.
+
+    :param grid: The collision grid, changes to it are picked up through a
+        listener.
+    :type grid: CollisionGrid
+    :param labels: Labels of the grid as it is, such as stored in a
+        compiled map, labelled from scratch if None.
+    :type labels: array.array | memoryview
+    :param sizes: Label to the number of tiles in the component, along with
+        labels.
+    :type sizes: dict
+    """
+
+    def __init__(self, grid, labels=None, sizes=None):
+        self.grid = grid
+
+        # tile index to its label, see BLOCKED; the tiles labelled BLOCKED are
+        # the collidable ones the labels are up to date with, changes to the
+        # grid are taken in one tile at a time
+        self.labels = None
+        # label to the number of tiles in the component
+        self.sizes = {}
+        self.full_updates = 0
+        self.incremental_updates = 0
+
+        self._next_label = 0
+        self._changes = []
+        if labels is None:
+            self._update()
+        else:
+            self.labels = labels
+            self.sizes = dict(sizes)
+            self._next_label = max(self.sizes) + 1 if self.sizes else 0
+        grid.add_listener(self._on_tile_changed)
+
+    def close(self):
+        """Stop following changes to the grid."""
+        self.grid.remove_listener(self._on_tile_changed)
+
+    def label(self, x, y):
+        """Get the label of the component a tile is in, BLOCKED if it's
+        collidable or off the grid.
+        :rtype: int
+        """
+        self._refresh()
+        if not self.grid.in_bounds(x, y):
+            return BLOCKED
+        return self.labels[y * self.grid.width + x]
+
+    def is_connected(self, start, dest):
+        """Check if there's a path between two tiles. A start on a
+        collidable tile can still step off it onto any of its neighbors.
+        :type start: (int, int)
+        :type dest: (int, int)
+        :rtype: bool
+        """
+        dest_label = self.label(dest[0], dest[1])
+        if dest_label == BLOCKED:
+            return tuple(start) == tuple(dest)
+
+        start_label = self.label(start[0], start[1])
+        if start_label != BLOCKED:
+            return start_label == dest_label
+        return any(self.label(x, y) == dest_label for x, y in self.grid.neighbors(start[0], start[1]))
+
+    def bounds(self, label):
+        """Get the rectangle of tiles a component covers.
+        :return: ``(x0, y0, x1, y1)``, both corners included, None if no tile
+            has the label.
+        :rtype: (int, int, int, int)
+        """
+        self._refresh()
+        width = self.grid.width
+        bounds = None
+        for y in range(self.grid.height):
+            row = self.labels[y * width:(y + 1) * width].tolist()
+            if label not in row:
+                continue
+            first = row.index(label)
+            last = width - 1 - row[::-1].index(label)
+            if bounds is None:
+                bounds = [first, y, last, y]
+            else:
+                bounds[0] = min(bounds[0], first)
+                bounds[2] = max(bounds[2], last)
+                bounds[3] = y
+        return tuple(bounds) if bounds is not None else None
+
+    def component_count(self):
+        self._refresh()
+        return len(self.sizes)
+
+    def _on_tile_changed(self, x, y, blocked):
+        if self._changes is not None:
+            self._changes.append((x, y))
+            if len(self._changes) > MAX_INCREMENTAL_CHANGES:
+                self._changes = None
+
+    def _refresh(self):
+        # None once too many tiles changed to fix each one up
+        if self._changes is None or self._changes:
+            self._update()
+
+    def _update(self):
+        if self.labels is None or self._changes is None:
+            self._label_all()
+            self.full_updates += 1
+        else:
+            # only how the tiles ended up matters
+            width = self.grid.width
+            changed = set(self._changes)
+            for x, y in changed:
+                index = y * width + x
+                blocked = bool(self.grid.cells[index])
+                if blocked != (self.labels[index] == BLOCKED):
+                    if blocked:
+                        self._split(index)
+                    else:
+                        self._join(index)
+            self.incremental_updates += len(changed)
+        self._changes = []
+
+    def _label_all(self):
+        grid = self.grid
+        cells = grid.cells
+        labels = self.labels = array.array('i', [_UNLABELLED]) * (grid.width * grid.height)
+        self.sizes = {}
+        for index in range(len(labels)):
+            if cells[index]:
+                labels[index] = BLOCKED
+        for index in range(len(labels)):
+            if labels[index] == _UNLABELLED:
+                label = self._new_label()
+                self.sizes[label] = self._relabel(index, label)
+
+    def _new_label(self):
+        label = self._next_label
+        self._next_label += 1
+        return label
+
+    def _neighbors(self, index):
+        """The walkable tiles next to a tile, as indices."""
+        width, labels = self.grid.width, self.labels
+        x = index % width
+        adjacent = []
+        if index >= width and labels[index - width] != BLOCKED:
+            adjacent.append(index - width)
+        if index + width < len(labels) and labels[index + width] != BLOCKED:
+            adjacent.append(index + width)
+        if x > 0 and labels[index - 1] != BLOCKED:
+            adjacent.append(index - 1)
+        if x < width - 1 and labels[index + 1] != BLOCKED:
+            adjacent.append(index + 1)
+        return adjacent
+
+    def _relabel(self, index, label):
+        """Flood the walkable tiles reachable from a tile with a label.
+        :return: The number of tiles flooded.
+        :rtype: int
+        """
+        labels = self.labels
+        labels[index] = label
+        queue = collections.deque([index])
+        count = 1
+        while queue:
+            node = queue.popleft()
+            for adjacent in self._neighbors(node):
+                if labels[adjacent] != label:
+                    labels[adjacent] = label
+                    queue.append(adjacent)
+                    count += 1
+        return count
+
+    def _join(self, index):
+        labels = self.labels
+        around = set(labels[adjacent] for adjacent in self._neighbors(index)) - set([BLOCKED])
+        if not around:
+            label = self._new_label()
+            labels[index] = label
+            self.sizes[label] = 1
+            return
+
+        # the biggest component keeps its label, the others are flooded with it
+        label = max(around, key=lambda other: self.sizes[other])
+        labels[index] = label
+        self.sizes[label] += 1
+        for adjacent in self._neighbors(index):
+            other = labels[adjacent]
+            if other != label:
+                self.sizes[label] += self.sizes.pop(other)
+                self._relabel(adjacent, label)
+
+    def _split(self, index):
+        labels = self.labels
+        label = labels[index]
+        labels[index] = BLOCKED
+        self.sizes[label] -= 1
+
+        starts = self._neighbors(index)
+        if not starts:
+            del self.sizes[label]
+            return
+        if len(starts) == 1:
+            return
+
+        # one breadth first search per neighbor, a step each in turn, merging
+        # searches that meet; a search running out of tiles first found a
+        # piece cut off from the rest
+        searches = [_Search(start) for start in starts]
+        owners = dict((start, search) for start, search in zip(starts, searches))
+        while len(searches) > 1:
+            for search in list(searches):
+                if search.merged_into is not None:
+                    continue
+                if search.queue:
+                    self._grow(search, owners, searches)
+                else:
+                    searches.remove(search)
+                    self._cut_off(search, label)
+                if len(searches) == 1:
+                    break
+            # searches that met are taken out of the list as they merge
+            searches = [search for search in searches if search.merged_into is None]
+
+    def _grow(self, search, owners, searches):
+        """Take a step of a search, merging the searches it meets into it and
+        taking them out of searches.
+        """
+        node = search.queue.popleft()
+        for adjacent in self._neighbors(node):
+            owner = owners.get(adjacent)
+            while owner is not None and owner.merged_into is not None:
+                owner = owner.merged_into
+            if owner is None:
+                owners[adjacent] = search
+                search.visited.append(adjacent)
+                search.queue.append(adjacent)
+            elif owner is not search:
+                owner.merged_into = search
+                search.visited.extend(owner.visited)
+                search.queue.extend(owner.queue)
+                searches.remove(owner)
+                if len(searches) == 1:
+                    return
+
+    def _cut_off(self, search, label):
+        """Give the piece a search ran out of tiles in a label of its own."""
+        piece = self._new_label()
+        for node in search.visited:
+            self.labels[node] = piece
+        self.sizes[piece] = len(search.visited)
+        self.sizes[label] -= len(search.visited)
+
+
+class _Search(object):
+    def __init__(self, start):
+        self.queue = collections.deque([start])
+        self.visited = [start]
+        self.merged_into = None
@@ -0,0 +1,747 @@
+"""Cooperative path finding for many agents sharing the same corridors.
+
+Agents planning on their own walk through each other. Here every agent
+plans in space and time, one move or wait per step, around the tiles and
+the moves the agents planned before it reserved, and reserves its own (see
+Silver, "Cooperative Pathfinding", 2005, for WHCA*).
+
+Searching the whole way in space-time is expensive and holds up everyone
+else, so each search only looks a window of steps ahead and finishes with
+the true distance from there to the destination. That distance comes from
+a reverse search from the destination, shared by every agent headed there
+and resumed whenever it hasn't reached a tile asked about yet. Agents plan
+again once they walked half of their window, within a budget of tiles
+searched and of time per call so a frame never takes too long. Searches
+going over it are broken off, the reverse searches carry on from where they
+were on the next call.
+
+Agents that arrived stay parked on their destination, but the others can
+still be planned through them: a parked agent in the way is planned again
+right after, to step aside and come back once they're through, and only
+when it's boxed in do they have to go around it. Agents that got no closer
+to their destination plan after plan are planned before the others, and the
+first few of them on every call, along with the agents standing on their
+way so those can be pushed out of it. Agents can still get stuck for good,
+such as ones meeting head on in a one tile wide corridor longer than the
+window, and are reported by stalled for the game to send them somewhere
+else or take them out.
+"""
+import collections
+import heapq
+import itertools
+import timeit
+
+from pathfinding import manhattan_distance
+
+# plans in a row an agent gets no closer to its destination over before it's
+# reported as stalled
+STALL_PLANS = 4
+
+# tiles each call to plan searches whatever its budget
+MIN_EXPANSIONS = 256
+
+# stalled agents planned on every call that doesn't run out of budget, the
+# ones that stalled first, along with the agents standing on their way
+LEADING_AGENTS = 8
+
+
+def _adjacent(width, cells, index):
+    """The walkable tiles next to a tile, by tile index."""
+    for adjacent in (index - width, index + width):
+        if 0 <= adjacent < len(cells) and not cells[adjacent]:
+            yield adjacent
+    x = index % width
+    if x > 0 and not cells[index - 1]:
+        yield index - 1
+    if x < width - 1 and not cells[index + 1]:
+        yield index + 1
+
+
+class _OutOfBudget(Exception):
+    pass
+
+
+class _Budget(object):
+    """Tiles to search and seconds left for a call to plan. The first
+    MIN_EXPANSIONS tiles are always searched, so the reverse searches get
+    somewhere on every call.
+    """
+
+    def __init__(self, expansions=None, seconds=None):
+        self.expansions = expansions
+        self.deadline = None if seconds is None else timeit.default_timer() + seconds
+        self.spent = 0
+
+    def is_spent(self):
+        if self.spent < MIN_EXPANSIONS:
+            return False
+        if self.expansions is not None and self.spent >= self.expansions:
+            return True
+        return self.deadline is not None and timeit.default_timer() >= self.deadline
+
+    def spend(self, interrupt=True):
+        """Count a tile searched, breaking the search off with _OutOfBudget
+        once the budget is spent. Searches that mustn't be interrupted
+        aren't counted.
+        """
+        if not interrupt:
+            return
+        self.spent += 1
+        if self.spent <= MIN_EXPANSIONS:
+            return
+        if self.expansions is not None and self.spent > self.expansions:
+            raise _OutOfBudget()
+        # the clock is only read now and then, it costs more than a tile
+        if self.deadline is not None and not self.spent % 64 and timeit.default_timer() >= self.deadline:
+            raise _OutOfBudget()
+
+
+class _Agent(object):
+    def __init__(self, agent_id, start, dest):
+        self.id = agent_id
+        self.dest = dest
+        # tile indices from the planner's current step on, the first one is
+        # where the agent is
+        self.path = collections.deque([start])
+        self.needs_plan = True
+        # the closest to its destination a plan got it, and the plans in a
+        # row since one got it any closer
+        self.closest = None
+        self.stalled = 0
+        # the step it first stalled at on the way to its destination, None if
+        # it didn't
+        self.stalled_since = None
+
+
+class CooperativePlanner(object):
+    """Conflict free paths for many agents on a CollisionGrid, WHCA* style.
+
+    Time goes forward one step at a time with advance, every agent moving to
+    a tile next to it or waiting where it is. No two agents are ever on the
+    same tile at the same step or swap tiles in one step, as long as they all
+    follow their paths.
+
+    :param grid: The collision grid, changes to it are picked up through a
+        listener.
+    :type grid: CollisionGrid
+    :param window: Steps each search looks ahead.
+    :type window: int
+    """
+
+    def __init__(self, grid, window=16):
+        self.grid = grid
+        self.window = window
+
+        # the current step
+        self.time = 0
+        # tiles taken off the open lists of the space-time searches
+        self.expansions = 0
+        self.plans = 0
+
+        # agent id to _Agent, in the order they were added
+        self._agents = collections.OrderedDict()
+        # step to tile index to the id of the agent on it, and the same by
+        # tile index then step
+        self._reserved = {}
+        self._visits = {}
+        # step to (tile index, tile index) to the id of the agent moving
+        # between them over the step after it
+        self._moves = {}
+        # tile index to (agent id, step) of the agent staying on it from
+        # that step on, at the end of its path
+        self._holds = {}
+        # the last step anything is reserved at
+        self._horizon = 0
+
+        # whether or not the agents parked on their destination can be planned
+        # through, and the ids of the agents boxed in where they are, during a
+        # call to plan
+        self._yielding = False
+        self._boxed = set()
+
+        # agents planned by the last call to plan that ran out of budget, None
+        # if it didn't
+        self._plans_per_call = None
+
+        # destination tile index to its _ReverseSearch
+        self._distances = {}
+        grid.add_listener(self._on_tile_changed)
+
+    def close(self):
+        """Stop following changes to the grid."""
+        self.grid.remove_listener(self._on_tile_changed)
+
+    def add_agent(self, agent_id, start, dest):
+        """Add an agent standing on a tile, to be planned on the next call to
+        plan.
+        :type start: (int, int)
+        :type dest: (int, int)
+        """
+        width = self.grid.width
+        agent = _Agent(agent_id, start[1] * width + start[0], dest[1] * width + dest[0])
+        self._agents[agent_id] = agent
+        self._reserve(agent)
+
+    def remove_agent(self, agent_id):
+        agent = self._agents.pop(agent_id)
+        self._release(agent)
+
+    def set_destination(self, agent_id, dest):
+        """Send an agent somewhere else, it's planned again on the next call
+        to plan.
+        :type dest: (int, int)
+        """
+        agent = self._agents[agent_id]
+        agent.dest = dest[1] * self.grid.width + dest[0]
+        agent.needs_plan = True
+        agent.closest = None
+        agent.stalled = 0
+        agent.stalled_since = None
+
+    def position(self, agent_id):
+        """Get the tile an agent is on at the current step.
+        :rtype: (int, int)
+        """
+        index = self._agents[agent_id].path[0]
+        return index % self.grid.width, index // self.grid.width
+
+    def get_path(self, agent_id):
+        """Get the tiles an agent planned to be on, one per step from the
+        current one.
+        :return: List of coordinate tuples, the agent waits on the last one.
+        :rtype: list
+        """
+        width = self.grid.width
+        return [(index % width, index // width) for index in self._agents[agent_id].path]
+
+    def is_done(self, agent_id):
+        agent = self._agents[agent_id]
+        return len(agent.path) == 1 and agent.path[0] == agent.dest
+
+    def stalled(self):
+        """Get the agents that got no closer to their destination for
+        STALL_PLANS plans in a row, which may never get there, such as ones
+        stuck behind an agent parked in a corridor.
+        :return: The ids of the agents.
+        :rtype: list
+        """
+        return [agent.id for agent in self._agents.values() if agent.stalled >= STALL_PLANS]
+
+    def plan(self, budget=None, time_budget=None):
+        """Plan the agents that need it, the stalled ones first, then the
+        ones closest to running out of path.
+
+        A search going over the budgets is broken off, and the agents left
+        over keep walking their old path or wait where they are until a
+        later call. The first agent's search is only broken off while it's
+        finding the true distances, which the next call carries on with, so
+        every call gets somewhere.
+
+        :param budget: Tiles to search at most, no limit if None.
+        :type budget: int
+        :param time_budget: Seconds to search for at most, no limit if None.
+        :type time_budget: float
+        :return: The ids of the agents planned.
+        :rtype: list
+        """
+        waiting, old_paths = self._take_off_waiting()
+
+        planned = []
+        budget = _Budget(budget, time_budget)
+        queue = collections.deque(waiting)
+        # the ids of the agents still to be planned in this call, and the ones
+        # pushed out of the way by another's path
+        pending = set(agent.id for agent in waiting)
+        pushed = set()
+        standing = dict((agent.path[0], agent.id) for agent in self._agents.values())
+        # searches left before agents boxed in stop moving the others away, and
+        # parked agents stop being planned through
+        bumps = len(waiting) * 2
+        self._yielding = True
+        self._boxed.clear()
+        while queue:
+            agent = queue.popleft()
+            if agent.id not in pending:
+                continue
+            pending.discard(agent.id)
+            if agent.id not in old_paths:
+                if budget.is_spent():
+                    # still on the path it had, which nothing planned since
+                    # went through
+                    agent.needs_plan = True
+                    continue
+                self._take_off(agent, old_paths)
+            boxed = False
+            if self._plan_agent(agent, old_paths[agent.id], budget, bool(planned)):
+                planned.append(agent.id)
+                # waiting where it is for the whole window
+                boxed = agent.needs_plan
+
+            # the agents standing on its way that are parked, or still to be
+            # planned, are planned right away to be gone in time
+            for other_id in self._in_the_way(agent, standing, pending if bumps > 0 else (), old_paths):
+                pushed.add(other_id)
+                self._bump(other_id, old_paths, pending, queue.appendleft)
+                bumps -= 1
+            if boxed:
+                self._boxed.add(agent.id)
+            if boxed and (bumps > 0 or agent.id in pushed):
+                # boxed in where it stands, the agents planned to step onto
+                # its tile have to go around it; when it was pushed they
+                # counted on it making way, so they always do
+                for other_id in self._crossing(agent.path[0], agent.id):
+                    self._bump(other_id, old_paths, pending, queue.append)
+                    bumps -= 1
+            self._yielding = bumps > 0
+
+        self._yielding = False
+        self._plans_per_call = len(planned) if budget.is_spent() else None
+        return planned
+
+    def _take_off_waiting(self):
+        """Pick the agents to plan in a call to plan, in order, and take the
+        ones likely to be planned within the budget off the table.
+
+        Unless the last call ran out of budget, the LEADING_AGENTS agents
+        that stalled first are planned along with the agents standing on
+        their way, which are taken off the table so the leaders can push
+        them out of it.
+
+        :return: The agents to plan, and dictionary of agent id to the path
+            it had for the ones taken off.
+        :rtype: (list, dict)
+        """
+        leaders = [] if self._plans_per_call is not None else sorted(
+            (agent for agent in self._agents.values() if agent.stalled_since is not None and not self.is_done(agent.id)),
+            key=self._priority)[:LEADING_AGENTS]
+        blocking = self._blocking(leaders)
+        chosen = set(agent.id for agent in itertools.chain(leaders, blocking))
+        waiting = [agent for agent in self._agents.values() if agent.id in chosen or self._is_waiting(agent)]
+        waiting.sort(key=self._priority)
+
+        # the agents likely to be planned within the budget are all taken off
+        # the table first, so one planned early can get another planned later
+        # to make way instead of waiting on it; the others keep their paths
+        # until it's their turn, so the ones planned before don't take the
+        # tiles they'd be left waiting on when the budget runs out
+        old_paths = {}
+        released = waiting if self._plans_per_call is None else waiting[:self._plans_per_call * 2 + 1]
+        for agent in itertools.chain(released, leaders, blocking):
+            if agent.id not in old_paths:
+                self._take_off(agent, old_paths)
+        return waiting, old_paths
+
+    def _plan_agent(self, agent, old_path, budget, interrupt_window):
+        """Plan an agent taken off the table and reserve its path. Going over
+        the budget keeps it on its old path or waiting where it is, and only
+        if neither is free any more is it planned by estimated distances.
+        :return: Whether or not the agent was planned.
+        :rtype: bool
+        """
+        try:
+            if budget.is_spent():
+                raise _OutOfBudget()
+            agent.needs_plan = False
+            agent.path = self._search(agent, budget, interrupt_window=interrupt_window)
+        except _OutOfBudget:
+            # keep walking the old path, or wait where it is, until a later
+            # call
+            agent.needs_plan = True
+            stay = collections.deque([old_path[0]])
+            kept = old_path if self._is_path_free(agent, old_path) else stay if self._is_path_free(agent, stay) else None
+            if kept is not None:
+                agent.path = kept
+                self._reserve(agent)
+                return False
+            agent.needs_plan = False
+            agent.path = self._search(agent, budget, interrupt_window=False, estimate_distances=True)
+        self._reserve(agent)
+        self.plans += 1
+        self._track_progress(agent)
+        return True
+
+    def _blocking(self, leaders):
+        """The agents standing on the way of the leading stalled agents."""
+        standing = dict((agent.path[0], agent) for agent in self._agents.values())
+        blocking = []
+        for leader in leaders:
+            for index in self._route(leader)[1:]:
+                other = standing.get(index)
+                if other is not None and other is not leader:
+                    blocking.append(other)
+        return blocking
+
+    def _route(self, agent):
+        """The tile indices of a shortest way from where an agent is to its
+        destination, going by the true distances and ignoring the others.
+        :rtype: list
+        """
+        grid = self.grid
+        search = self._reverse_search(agent)
+        index = agent.path[0]
+        distance = search.distance(index)
+        if distance is None:
+            return []
+
+        route = [index]
+        while distance:
+            distance -= 1
+            index = next(
+                adjacent for adjacent in _adjacent(grid.width, grid.cells, index)
+                if search.distance(adjacent) == distance
+            )
+            route.append(index)
+        return route
+
+    def _is_waiting(self, agent):
+        """Check if an agent needs planning, or is about to run out of path
+        short of its destination.
+        """
+        if agent.needs_plan:
+            return True
+        return len(agent.path) <= self.window // 2 and agent.path[-1] != agent.dest
+
+    def _priority(self, agent):
+        """The agents that stalled first go first, until they arrive, so the
+        others get out of their way instead of taking turns blocking each
+        other, then the ones closest to running out of path.
+        """
+        if agent.stalled_since is None:
+            return (1, 0, len(agent.path))
+        return (0, agent.stalled_since, len(agent.path))
+
+    def _bump(self, agent_id, old_paths, pending, enqueue):
+        """Take an agent off the table to plan it again in this call."""
+        agent = self._agents[agent_id]
+        self._take_off(agent, old_paths)
+        agent.needs_plan = True
+        pending.add(agent_id)
+        enqueue(agent)
+
+    def _is_parked(self, agent_id):
+        """Check if an agent is standing on its destination with nowhere else
+        to go.
+        """
+        agent = self._agents[agent_id]
+        return len(agent.path) == 1 and agent.path[0] == agent.dest
+
+    def _in_the_way(self, agent, standing, pending, old_paths):
+        """The ids of the agents standing on an agent's path that have to get
+        out of its way, the parked ones and the ones taken off the table to
+        be planned later in this call.
+        :param standing: Dictionary of tile index to the id of the agent on
+            it at the current step.
+        """
+        in_the_way = []
+        for index in itertools.islice(agent.path, 1, None):
+            other_id = standing.get(index, agent.id)
+            if other_id == agent.id or other_id in in_the_way:
+                continue
+            if (other_id in pending and other_id in old_paths) or self._is_parked(other_id):
+                in_the_way.append(other_id)
+        return in_the_way
+
+    def _take_off(self, agent, old_paths):
+        """Release an agent's path to plan it again, keeping only the tile
+        it's on now.
+        """
+        old_paths[agent.id] = agent.path
+        self._release(agent)
+        self._reserve_tile(agent.path[0], self.time, agent.id)
+
+    def advance(self):
+        """Move every agent one step along its path.
+        :return: Dictionary of agent id to the coordinate tuple of the tile
+            it's on now.
+        :rtype: dict
+        """
+        for index in self._reserved.pop(self.time, {}):
+            visits = self._visits[index]
+            del visits[self.time]
+            if not visits:
+                del self._visits[index]
+        self._moves.pop(self.time, None)
+        self.time += 1
+
+        width = self.grid.width
+        positions = {}
+        for agent in self._agents.values():
+            if len(agent.path) > 1:
+                agent.path.popleft()
+            positions[agent.id] = (agent.path[0] % width, agent.path[0] // width)
+        return positions
+
+    def stats(self):
+        return {
+            'agents': len(self._agents),
+            'plans': self.plans,
+            'expansions': self.expansions,
+            'stalled': len(self.stalled()),
+            'time': self.time,
+        }
+
+    def _on_tile_changed(self, x, y, blocked):
+        # the distances to the destinations may all have changed
+        self._distances.clear()
+        if blocked:
+            index = y * self.grid.width + x
+            for agent in self._agents.values():
+                if index in agent.path:
+                    agent.needs_plan = True
+
+    def _reserve(self, agent):
+        for step, index in enumerate(agent.path):
+            self._reserve_tile(index, self.time + step, agent.id)
+            if step:
+                self._moves.setdefault(self.time + step - 1, {})[(agent.path[step - 1], index)] = agent.id
+        end = self.time + len(agent.path) - 1
+        self._holds[agent.path[-1]] = (agent.id, end)
+        self._horizon = max(self._horizon, end)
+
+    def _reserve_tile(self, index, step, agent_id):
+        self._reserved.setdefault(step, {})[index] = agent_id
+        self._visits.setdefault(index, {})[step] = agent_id
+
+    def _release(self, agent):
+        for step, index in enumerate(agent.path):
+            reserved = self._reserved.get(self.time + step)
+            if reserved is not None and reserved.get(index) == agent.id:
+                del reserved[index]
+                visits = self._visits[index]
+                del visits[self.time + step]
+                if not visits:
+                    del self._visits[index]
+            if step:
+                moves = self._moves.get(self.time + step - 1)
+                move = (agent.path[step - 1], index)
+                if moves is not None and moves.get(move) == agent.id:
+                    del moves[move]
+        if self._holds.get(agent.path[-1], (None,))[0] == agent.id:
+            del self._holds[agent.path[-1]]
+
+    def _is_free(self, index, step, agent_id):
+        """Check if an agent can be on a tile at a step."""
+        owner = self._reserved.get(step, {}).get(index, agent_id)
+        if owner != agent_id:
+            return False
+        hold = self._holds.get(index)
+        if hold is None or hold[0] == agent_id or step < hold[1]:
+            return True
+        return self._yielding and hold[0] not in self._boxed and self._is_parked(hold[0])
+
+    def _crossing(self, index, agent_id):
+        """The ids of the other agents planned onto a tile after the current
+        step.
+        """
+        crossing = set(
+            other_id for step, other_id in self._visits.get(index, {}).items()
+            if step > self.time and other_id != agent_id
+        )
+        hold = self._holds.get(index)
+        if hold is not None and hold[0] != agent_id:
+            crossing.add(hold[0])
+        return crossing
+
+    def _is_path_free(self, agent, path):
+        """Check if an agent can still follow a path it planned before."""
+        for step, index in enumerate(path):
+            if step and (self.grid.cells[index] or not self._is_free(index, self.time + step, agent.id)):
+                return False
+            if step and self._moves.get(self.time + step - 1, {}).get((index, path[step - 1]), agent.id) != agent.id:
+                return False
+        return self._is_free_from(path[-1], self.time + len(path) - 1, agent.id)
+
+    def _is_free_from(self, index, step, agent_id):
+        """Check if an agent can stay on a tile from a step on."""
+        hold = self._holds.get(index)
+        if hold is not None and hold[0] != agent_id:
+            return False
+        return all(
+            other_id == agent_id for later, other_id in self._visits.get(index, {}).items()
+            if later >= step
+        )
+
+    def _track_progress(self, agent):
+        """Count the plans in a row that got an agent no closer to its
+        destination.
+        """
+        distance = self._reverse_search(agent).distance(agent.path[-1])
+        if distance is None:
+            return
+        if not distance:
+            agent.stalled_since = None
+        if agent.closest is None or distance < agent.closest or not distance:
+            agent.closest = distance
+            agent.stalled = 0
+            return
+
+        agent.stalled += 1
+        if agent.stalled >= STALL_PLANS and agent.stalled_since is None:
+            agent.stalled_since = self.time
+
+    def _reverse_search(self, agent):
+        search = self._distances.get(agent.dest)
+        if search is None:
+            search = self._distances[agent.dest] = _ReverseSearch(self.grid, agent.dest, agent.path[0])
+        return search
+
+    def _search(self, agent, budget, interrupt_window=True, estimate_distances=False):
+        """Plan an agent, counting the tiles the true distances took to find
+        as searched too.
+        :param budget: The _Budget of the call to plan, the search raises
+            _OutOfBudget once it's spent.
+        :param interrupt_window: Whether or not the space-time search can be
+            broken off, finding the true distances always can.
+        :param estimate_distances: Go by the Manhattan distance from the tiles
+            the true distance isn't found for within the budget instead of
+            breaking off, for a search that can't be.
+        :return: The tile indices of the path, one per step.
+        :rtype: collections.deque
+        """
+        reverse_search = self._reverse_search(agent)
+        reverse_expansions = reverse_search.expansions
+
+        def distance(index):
+            try:
+                return reverse_search.distance(index, budget)
+            except _OutOfBudget:
+                if not estimate_distances:
+                    raise
+                return reverse_search.estimate(index)
+
+        try:
+            return self._space_time_search(agent, distance, budget, interrupt_window)
+        finally:
+            self.expansions += reverse_search.expansions - reverse_expansions
+
+    def _space_time_search(self, agent, distance, budget, interrupt):
+        """Space-time A* from where the agent is now over the next window
+        steps, then on to the destination by its true distance.
+        """
+        start, start_step = agent.path[0], self.time
+        end_step = start_step + self.window
+
+        h = distance(start)
+        if h is None:
+            # nowhere to go, stay out of the way of the others
+            return collections.deque([start])
+
+        counter = itertools.count()
+        open_heap = [(h, h, next(counter), start, start_step)]
+        g_scores = {(start, start_step): 0}
+        came_from = {(start, start_step): None}
+        closed = set()
+
+        while open_heap:
+            f, h, _, index, step = heapq.heappop(open_heap)
+            node = (index, step)
+            if node in closed:
+                continue
+            closed.add(node)
+            self.expansions += 1
+            budget.spend(interrupt)
+
+            if (index == agent.dest or step == end_step) and self._is_free_from(index, step, agent.id):
+                path = collections.deque()
+                while node is not None:
+                    path.appendleft(node[0])
+                    node = came_from[node]
+                return path
+            if step == end_step:
+                continue
+
+            g = g_scores[node] + 1
+            for adjacent in self._successors(agent, index, step):
+                adjacent_node = (adjacent, step + 1)
+                if adjacent_node in closed or g >= g_scores.get(adjacent_node, g + 1):
+                    continue
+                h = distance(adjacent)
+                if h is None:
+                    continue
+                g_scores[adjacent_node] = g
+                came_from[adjacent_node] = node
+                heapq.heappush(open_heap, (g + h, h, next(counter), adjacent, step + 1))
+
+        # boxed in for the whole window, wait and try again next time
+        agent.needs_plan = True
+        return collections.deque([start])
+
+    def _successors(self, agent, index, step):
+        """The tiles an agent on a tile can be on at the step after, the ones
+        next to it or the tile itself, that no other agent reserved.
+        """
+        grid = self.grid
+        moves = self._moves.get(step, {})
+        for adjacent in _adjacent(grid.width, grid.cells, index):
+            # swapping tiles with an agent coming the other way
+            if moves.get((adjacent, index), agent.id) == agent.id and self._is_free(adjacent, step + 1, agent.id):
+                yield adjacent
+        if self._is_free(index, step + 1, agent.id):
+            yield index
+
+
+class _ReverseSearch(object):
+    """A* out of a destination towards where the first agent headed there
+    started, the Reverse Resumable A* of WHCA*. Asking about a tile it
+    hasn't closed yet carries on with the search until it has, the tiles it
+    closed on the way are kept for the next agents.
+    """
+
+    def __init__(self, grid, dest, origin):
+        self.grid = grid
+        self.expansions = 0
+
+        width = grid.width
+        self._dest = (dest % width, dest // width)
+        self._origin = (origin % width, origin // width)
+        self._counter = itertools.count()
+        self._g_scores = {dest: 0}
+        self._closed = {}
+        self._open = []
+        if not grid.cells[dest]:
+            h = self._heuristic(dest)
+            self._open.append((h, h, next(self._counter), dest))
+
+    def _heuristic(self, index):
+        width = self.grid.width
+        return manhattan_distance(index % width, index // width, self._origin[0], self._origin[1])
+
+    def estimate(self, index):
+        """Get at most the number of moves from a tile to the destination,
+        without searching.
+        """
+        width = self.grid.width
+        return manhattan_distance(index % width, index // width, self._dest[0], self._dest[1])
+
+    def distance(self, index, budget=None):
+        """Get the number of moves from a tile to the destination, None if it
+        can't be reached.
+        :param budget: _Budget to spend the tiles searched from, the search
+            is broken off with _OutOfBudget once it's spent and carries on
+            from there the next time.
+        """
+        closed = self._closed
+        if index in closed:
+            return closed[index]
+
+        grid = self.grid
+        width, cells = grid.width, grid.cells
+        g_scores, open_heap = self._g_scores, self._open
+        while open_heap:
+            if budget is not None:
+                budget.spend()
+            node = heapq.heappop(open_heap)[3]
+            if node in closed:
+                continue
+            g = closed[node] = g_scores[node]
+            self.expansions += 1
+
+            g += 1
+            for adjacent in _adjacent(width, cells, node):
+                if adjacent not in closed and g < g_scores.get(adjacent, g + 1):
+                    g_scores[adjacent] = g
+                    h = self._heuristic(adjacent)
+                    heapq.heappush(open_heap, (g + h, h, next(self._counter), adjacent))
+            if node == index:
+                return g - 1
+        return None
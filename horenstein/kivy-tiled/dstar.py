@@ -0,0 +1,182 @@
+"""D* Lite, for agents that keep walking one path while the map changes.
+
+The search runs backwards, from the destination to the agent, and keeps
+the distance of every tile it looked at to the destination. When tiles
+change only the distances that led through them are searched again, and as
+the agent moves on the keys of the tiles still to search are corrected with
+an offset instead of being worked out again. Repairing a path after a crop
+grows on it usually touches a handful of tiles around the crop rather than
+the whole route.
+
+See Koenig and Likhachev, "D* Lite" (2002), the optimized version.
+"""
+import heapq
+import itertools
+
+from pathfinding import manhattan_distance
+
+INFINITY = float('inf')
+
+
+class DStarLite(object):
+    """Incremental shortest path from a moving start to a fixed destination
+    on a CollisionGrid.
+
+    :param grid: The collision grid to search, changes to it are picked up
+        through a listener and repaired on the next find_path.
+    :type grid: CollisionGrid
+    :param start: The tile coordinates the agent is on.
+    :type start: (int, int)
+    :param dest: The tile coordinates to reach.
+    :type dest: (int, int)
+    """
+
+    def __init__(self, grid, start, dest):
+        self.grid = grid
+        self.start = tuple(start)
+        self.dest = tuple(dest)
+
+        # tiles taken off the open list, the first find_path searches the
+        # route, the later ones only what changed
+        self.expansions = 0
+
+        # distance to the destination and the one-step lookahead on it, a
+        # tile missing from either is at INFINITY
+        self._g = {}
+        self._rhs = {self.dest: 0}
+        # added to the keys for every move of the start, instead of working
+        # out the keys of the open list again
+        self._key_offset = 0
+
+        # heap of (key, tie, counter, tile), entries not in _queued are stale
+        self._open = []
+        self._queued = {}
+        self._counter = itertools.count()
+
+        self._changes = set()
+        self._push(self.dest)
+        grid.add_listener(self._on_tile_changed)
+
+    def close(self):
+        """Stop following changes to the grid."""
+        self.grid.remove_listener(self._on_tile_changed)
+
+    def has_changes(self):
+        """Check if tiles changed since the last find_path.
+        :rtype: bool
+        """
+        return bool(self._changes)
+
+    def move_to(self, tile):
+        """Move the start, such as when the agent took a step along the
+        path.
+        :type tile: (int, int)
+        """
+        tile = tuple(tile)
+        self._key_offset += manhattan_distance(self.start[0], self.start[1], tile[0], tile[1])
+        self.start = tile
+
+    def find_path(self):
+        """Find the shortest path from the start to the destination,
+        repairing the previous search around the tiles changed since.
+        :return: List of coordinate tuples from start to dest (both included)
+            or an empty list if there is no path.
+        :rtype: list
+        """
+        changes, self._changes = self._changes, set()
+        for x, y in changes:
+            # the cost of stepping onto the tile changed for all the tiles
+            # around it
+            for adjacent in self._adjacent(x, y):
+                self._update(adjacent)
+        self._search()
+
+        g = self._g.get
+        if g(self.start, INFINITY) == INFINITY:
+            return []
+
+        node = self.start
+        path = [node]
+        while node != self.dest:
+            # the tiles around the path were all searched, each step goes
+            # one closer to the destination
+            node = min(self._adjacent(node[0], node[1]), key=lambda tile: self._cost(tile) + g(tile, INFINITY))
+            path.append(node)
+        return path
+
+    def _on_tile_changed(self, x, y, blocked):
+        self._changes.add((x, y))
+
+    def _adjacent(self, x, y):
+        """The tiles next to a tile, collidable or not, in the order of
+        CollisionGrid.neighbors.
+        """
+        grid = self.grid
+        return [
+            (adjacent_x, adjacent_y)
+            for adjacent_x, adjacent_y in ((x, y - 1), (x, y + 1), (x - 1, y), (x + 1, y))
+            if 0 <= adjacent_x < grid.width and 0 <= adjacent_y < grid.height
+        ]
+
+    def _cost(self, tile):
+        """The cost of stepping onto a tile."""
+        return 1 if self.grid.is_walkable(tile[0], tile[1]) else INFINITY
+
+    def _key(self, tile):
+        distance = min(self._g.get(tile, INFINITY), self._rhs.get(tile, INFINITY))
+        return (distance + manhattan_distance(self.start[0], self.start[1], tile[0], tile[1]) + self._key_offset,
+                distance)
+
+    def _push(self, tile):
+        counter = next(self._counter)
+        self._queued[tile] = counter
+        key = self._key(tile)
+        heapq.heappush(self._open, (key[0], key[1], counter, tile))
+
+    def _top(self):
+        """The entry of the open list with the smallest key, None if it's
+        empty.
+        """
+        open_heap = self._open
+        while open_heap and self._queued.get(open_heap[0][3]) != open_heap[0][2]:
+            heapq.heappop(open_heap)
+        return open_heap[0] if open_heap else None
+
+    def _update(self, tile):
+        g, rhs = self._g, self._rhs
+        if tile != self.dest:
+            rhs[tile] = min(self._cost(adjacent) + g.get(adjacent, INFINITY) for adjacent in self._adjacent(*tile))
+        self._queued.pop(tile, None)
+        if g.get(tile, INFINITY) != rhs.get(tile, INFINITY):
+            self._push(tile)
+
+    def _search(self):
+        g, rhs = self._g, self._rhs
+        start = self.start
+        while True:
+            top = self._top()
+            if top is None:
+                break
+            start_key = self._key(start)
+            if (top[0], top[1]) >= start_key and g.get(start, INFINITY) == rhs.get(start, INFINITY):
+                break
+
+            tile = top[3]
+            key = self._key(tile)
+            if (top[0], top[1]) < key:
+                # queued before the start moved on
+                self._push(tile)
+                continue
+
+            heapq.heappop(self._open)
+            del self._queued[tile]
+            self.expansions += 1
+            if g.get(tile, INFINITY) > rhs.get(tile, INFINITY):
+                g[tile] = rhs[tile]
+                for adjacent in self._adjacent(*tile):
+                    self._update(adjacent)
+            else:
+                g[tile] = INFINITY
+                self._update(tile)
+                for adjacent in self._adjacent(*tile):
+                    self._update(adjacent)
@@ -0,0 +1,265 @@
+"""Flow fields for many agents heading to the same tiles.
+
+A FlowField holds the distance from every tile to the nearest of a set of
+target tiles, found with one breadth first search from all the targets at
+once (the moves all cost the same, so that's Dijkstra) over the collision
+grid. From there the next step of an agent anywhere on the map is the
+neighbor closest to a target, without searching anything.
+
+The search runs on NumPy arrays a whole wavefront at a time. When tiles of
+the grid change, only the distances that depended on them are fixed up.
+"""
+import collections
+import heapq
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# distance of the tiles that can't reach any target
+UNREACHABLE = 2 ** 31 - 1
+
+# past this many changed tiles searching again beats fixing each one up
+MAX_INCREMENTAL_CHANGES = 64
+
+
+class FlowField(object):
+    """Distances to the nearest target tile on a CollisionGrid. Requires
+    numpy.
+
+    :param grid: The collision grid, changes to it are picked up through a
+        listener.
+    :type grid: CollisionGrid
+    :param targets: Coordinate tuples of the tiles to head to.
+    :type targets: list
+    """
+
+    def __init__(self, grid, targets):
+        if numpy is None:
+            raise ImportError('FlowField requires numpy')
+        self.grid = grid
+        self.targets = set(tuple(target) for target in targets)
+
+        # height x width array of int32 distances, see UNREACHABLE
+        self.distances = None
+        self.full_updates = 0
+        self.incremental_updates = 0
+
+        self._changes = []
+        self._update()
+        grid.add_listener(self._on_tile_changed)
+
+    def close(self):
+        """Stop following changes to the grid."""
+        self.grid.remove_listener(self._on_tile_changed)
+
+    def distance(self, x, y):
+        """Get the number of moves from a tile to the nearest target.
+        :return: The distance, None if no target can be reached.
+        :rtype: int | None
+        """
+        self._refresh()
+        if not self.grid.in_bounds(x, y):
+            return None
+        distance = int(self.distances[y, x])
+        return None if distance == UNREACHABLE else distance
+
+    def next_step(self, x, y):
+        """Get the neighbor of a tile one move closer to a target.
+        :return: The coordinate tuple of the next tile, None on a target or
+            if no target can be reached.
+        :rtype: (int, int) | None
+        """
+        self._refresh()
+        distances = self.distances
+        best = distances[y, x] if self.grid.in_bounds(x, y) else UNREACHABLE
+        step = None
+        # north, south, west and east first on ties, like CollisionGrid.neighbors
+        for adjacent_x, adjacent_y in ((x, y - 1), (x, y + 1), (x - 1, y), (x + 1, y)):
+            if self.grid.in_bounds(adjacent_x, adjacent_y) and distances[adjacent_y, adjacent_x] < best:
+                best = distances[adjacent_y, adjacent_x]
+                step = (adjacent_x, adjacent_y)
+        return step
+
+    def next_steps(self, positions):
+        """Get the next step of many tiles at once.
+        :param positions: The tile coordinates, one row each.
+        :type positions: numpy.ndarray | list
+        :return: Array of the next tiles, the tile itself where it's a target
+            or can't reach one.
+        :rtype: numpy.ndarray
+        """
+        self._refresh()
+        positions = numpy.asarray(positions, dtype=int).reshape(-1, 2)
+        padded = numpy.pad(self.distances, 1, constant_values=UNREACHABLE)
+        x, y = positions[:, 0] + 1, positions[:, 1] + 1
+
+        # argmin takes the first of equal distances, so the tile itself only
+        # loses to a closer neighbor
+        offsets = numpy.array(((0, 0), (0, -1), (0, 1), (-1, 0), (1, 0)))
+        candidates = padded[y[:, None] + offsets[:, 1], x[:, None] + offsets[:, 0]]
+        best = numpy.argmin(candidates, axis=1)
+        return positions + offsets[best]
+
+    def path_from(self, x, y):
+        """Follow the field from a tile to the nearest target.
+        :return: List of coordinate tuples from x,y to the target (both
+            included), an empty list if no target can be reached.
+        :rtype: list
+        """
+        if self.distance(x, y) is None:
+            return []
+        path = [(x, y)]
+        step = self.next_step(x, y)
+        while step is not None:
+            path.append(step)
+            step = self.next_step(*step)
+        return path
+
+    def set_targets(self, targets):
+        self.targets = set(tuple(target) for target in targets)
+        self._changes = None
+        self._update()
+
+    def _on_tile_changed(self, x, y, blocked):
+        if self._changes is not None:
+            self._changes.append((x, y))
+            if len(self._changes) > MAX_INCREMENTAL_CHANGES:
+                self._changes = None
+
+    def _refresh(self):
+        # None once too many tiles changed to fix each one up
+        if self._changes is None or self._changes:
+            self._update()
+
+    def _update(self):
+        if self.distances is None or self._changes is None:
+            self._search()
+            self.full_updates += 1
+        else:
+            # only how the tiles ended up matters, the tiles now collidable
+            # go first so no distance is passed on through one of them
+            width = self.grid.width
+            changed = set(self._changes)
+            flat = self.distances.reshape(-1)
+            for x, y in changed:
+                if not self.grid.is_walkable(x, y):
+                    self._block(flat, y * width + x)
+            for x, y in changed:
+                if self.grid.is_walkable(x, y):
+                    self._unblock(flat, y * width + x)
+            self.incremental_updates += len(changed)
+        self._changes = []
+
+    def _search(self):
+        """Breadth first search from every target at once, a whole wavefront
+        per step. The grid gets a collidable border so the neighbors of a
+        tile are always at the same offsets.
+        """
+        grid = self.grid
+        width, height = grid.width, grid.height
+        padded_width = width + 2
+
+        walkable = numpy.zeros((height + 2, padded_width), dtype=bool)
+        walkable[1:-1, 1:-1] = numpy.frombuffer(bytes(grid.cells), dtype=numpy.uint8)[:width * height].reshape(height, width) == 0
+        walkable = walkable.reshape(-1)
+
+        distances = numpy.full(walkable.size, UNREACHABLE, dtype=numpy.int32)
+        frontier = numpy.array(
+            [(y + 1) * padded_width + x + 1 for x, y in self.targets if grid.is_walkable(x, y)], dtype=numpy.intp)
+        distances[frontier] = 0
+
+        offsets = numpy.array((-padded_width, padded_width, -1, 1), dtype=numpy.intp)
+        distance = 0
+        while frontier.size:
+            distance += 1
+            adjacent = (frontier[:, None] + offsets).reshape(-1)
+            adjacent = numpy.unique(adjacent[walkable[adjacent] & (distances[adjacent] == UNREACHABLE)])
+            distances[adjacent] = distance
+            frontier = adjacent
+
+        self.distances = distances.reshape(height + 2, padded_width)[1:-1, 1:-1].copy()
+
+    def _neighbors(self, index):
+        width = self.grid.width
+        return [y * width + x for x, y in self.grid.neighbors(index % width, index // width)]
+
+    def _unblock(self, flat, index):
+        """Give a tile that became walkable its distance and pass the
+        shorter distances it opens up on.
+        """
+        width = self.grid.width
+        if (index % width, index // width) in self.targets:
+            flat[index] = 0
+        else:
+            distance = int(min([flat[adjacent] for adjacent in self._neighbors(index)] + [UNREACHABLE - 1])) + 1
+            flat[index] = min(distance, UNREACHABLE)
+        if flat[index] == UNREACHABLE:
+            return
+
+        queue = collections.deque([index])
+        while queue:
+            node = queue.popleft()
+            distance = int(flat[node]) + 1
+            for adjacent in self._neighbors(node):
+                if flat[adjacent] > distance:
+                    flat[adjacent] = distance
+                    queue.append(adjacent)
+
+    def _block(self, flat, index):
+        """Clear the distances that led through a tile that became
+        collidable and find them again from the tiles around them.
+        """
+        if flat[index] == UNREACHABLE:
+            return
+        self._reseed(flat, self._clear_lost(flat, index))
+
+    def _clear_lost(self, flat, index):
+        """Clear the distance of a tile and of the tiles that have no other
+        neighbor one move closer to a target left.
+        :return: Dictionary of the cleared tiles, but index, to the distance
+            they had.
+        :rtype: dict
+        """
+        width = self.grid.width
+
+        # going out one distance at a time so every neighbor closer is
+        # decided first
+        lost = {index: int(flat[index])}
+        flat[index] = UNREACHABLE
+        queue = collections.deque([index])
+        while queue:
+            node = queue.popleft()
+            distance = lost[node] + 1
+            for adjacent in self._neighbors(node):
+                if adjacent in lost or flat[adjacent] != distance:
+                    continue
+                if (adjacent % width, adjacent // width) in self.targets:
+                    continue
+                if any(flat[other] == distance - 1 for other in self._neighbors(adjacent)):
+                    continue
+                lost[adjacent] = distance
+                flat[adjacent] = UNREACHABLE
+                queue.append(adjacent)
+        del lost[index]
+        return lost
+
+    def _reseed(self, flat, lost):
+        """Search the cleared tiles again, starting from the tiles around
+        them that kept their distance.
+        """
+        heap = []
+        for node in lost:
+            best = int(min([flat[adjacent] for adjacent in self._neighbors(node)] + [UNREACHABLE - 1])) + 1
+            if best < UNREACHABLE:
+                heap.append((best, node))
+        heapq.heapify(heap)
+        while heap:
+            distance, node = heapq.heappop(heap)
+            if distance >= flat[node]:
+                continue
+            flat[node] = distance
+            for adjacent in self._neighbors(node):
+                if adjacent in lost and flat[adjacent] > distance + 1:
+                    heapq.heappush(heap, (distance + 1, adjacent))
@@ -0,0 +1,322 @@
+"""Compact lookup data compiled from the layers of tile maps.
+
+KivyTiledMap compiles the collidable tiles of its collision layer into a
+CollisionGrid when the map loads, so checking a move is an index into a
+bytearray instead of a layer and property lookup. The tiles having each
+property are indexed the same way so finding them is a dictionary hit, and
+the cost of walking on each tile goes in a CostGrid of floats.
+"""
+import array
+
+
+# bits of the neighbors in CollisionGrid.neighbor_masks
+NORTH = 1
+SOUTH = 2
+WEST = 4
+EAST = 8
+
+# collidable flags to walkable ones
+_WALKABLE = bytes([1] + [0] * 255)
+
+
+class CollisionGrid(object):
+    """Row-major grid holding one byte per tile, non-zero when the tile is
+    collidable.
+
+    Listeners added with add_listener are called with ``(x, y, blocked)``
+    every time a tile changes.
+
+    Searches walk the grid through neighbor_masks, one byte per tile with a
+    bit set for each walkable neighbor, see neighbor_offsets. The masks are
+    built on first use and only the ones around a tile are redone when it
+    changes.
+    """
+
+    def __init__(self, width, height, cells=None):
+        self.width = width
+        self.height = height
+        self.cells = bytearray(width * height) if cells is None else cells
+        self._masks = None
+        self._listeners = []
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def is_walkable(self, x, y):
+        """Check if the tile is on the grid and not collidable.
+        :rtype: bool
+        """
+        if x < 0 or x >= self.width or y < 0 or y >= self.height:
+            return False
+        return not self.cells[y * self.width + x]
+
+    def set_blocked(self, x, y, blocked):
+        """Mark a single tile as collidable or not, notifying listeners if
+        that changed anything.
+        """
+        index = y * self.width + x
+        value = 1 if blocked else 0
+        if self.cells[index] != value:
+            self.cells[index] = value
+            if self._masks is not None:
+                self._update_masks(x, y, index, not value)
+            self._notify(x, y, bool(value))
+
+    def update_cells(self, cells):
+        """Replace the whole grid, notifying listeners of every tile that
+        changed.
+        """
+        old_cells = self.cells
+        self.cells = cells
+        self._masks = None
+        if not self._listeners:
+            return
+
+        width = self.width
+        for index, (old, new) in enumerate(zip(old_cells, cells)):
+            if bool(old) != bool(new):
+                self._notify(index % width, index // width, bool(new))
+
+    def snapshot(self):
+        """Copy the grid into one whose cells can't change, so it can be
+        searched from other threads while this one keeps changing.
+        :rtype: CollisionGrid
+        """
+        snapshot = CollisionGrid(self.width, self.height, bytes(self.cells))
+        if self._masks is not None:
+            snapshot._masks = bytes(self._masks)
+        return snapshot
+
+    def neighbor_masks(self):
+        """Get the walkable neighbors of every tile as a bit mask.
+        :return: One byte per tile, row-major, see neighbor_offsets for the
+            bits.
+        :rtype: bytearray
+        """
+        if self._masks is None:
+            self._masks = build_neighbor_masks(self.width, self.height, self.cells)
+        return self._masks
+
+    def neighbor_offsets(self):
+        """Get the bit of each neighbor in neighbor_masks with the offset
+        to its tile index, north, south, west and east.
+        :rtype: tuple
+        """
+        width = self.width
+        return ((NORTH, -width), (SOUTH, width), (WEST, -1), (EAST, 1))
+
+    def _update_masks(self, x, y, index, walkable):
+        # the tile is the southern neighbor of the one north of it, and so on
+        masks, width = self._masks, self.width
+        for bit, adjacent, in_bounds in (
+                (SOUTH, index - width, y > 0), (NORTH, index + width, y < self.height - 1),
+                (EAST, index - 1, x > 0), (WEST, index + 1, x < width - 1)):
+            if in_bounds:
+                if walkable:
+                    masks[adjacent] |= bit
+                else:
+                    masks[adjacent] &= ~bit
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        self._listeners.remove(callback)
+
+    def _notify(self, x, y, blocked):
+        for callback in list(self._listeners):
+            callback(x, y, blocked)
+
+    def neighbors(self, x, y):
+        """Get the walkable tiles north, south, west and east of x,y, in that
+        order.
+        :return: A list of coordinate tuples adjacent to x,y.
+        :rtype: list
+        """
+        if not self.in_bounds(x, y):
+            return [tile for tile in ((x, y - 1), (x, y + 1), (x - 1, y), (x + 1, y)) if self.is_walkable(*tile)]
+
+        mask = self.neighbor_masks()[y * self.width + x]
+        adjacent_tiles = []
+        if mask & NORTH:
+            adjacent_tiles.append((x, y - 1))
+        if mask & SOUTH:
+            adjacent_tiles.append((x, y + 1))
+        if mask & WEST:
+            adjacent_tiles.append((x - 1, y))
+        if mask & EAST:
+            adjacent_tiles.append((x + 1, y))
+        return adjacent_tiles
+
+
+def build_neighbor_masks(width, height, cells):
+    """Work out the walkable neighbors of every tile of a grid at once.
+
+    The walkable flags are read into one big integer, a byte per tile, so
+    shifting it by a row or a tile lines every tile up with a neighbor and
+    the four masks are a handful of integer operations.
+
+    :type cells: bytearray
+    :return: One byte per tile, see CollisionGrid.neighbor_masks.
+    :rtype: bytearray
+    """
+    size = width * height
+    if not size:
+        return bytearray()
+    walkable = int.from_bytes(bytes(cells).translate(_WALKABLE), 'little')
+    # 1 in every byte of a tile that has a neighbor west, or east, on its row
+    has_west = int.from_bytes((b'\x00' + b'\x01' * (width - 1)) * height, 'little')
+    has_east = int.from_bytes((b'\x01' * (width - 1) + b'\x00') * height, 'little')
+
+    row_bits = 8 * width
+    north = (walkable << row_bits) & ((1 << (8 * size)) - 1)
+    south = walkable >> row_bits
+    west = (walkable << 8) & has_west
+    east = (walkable >> 8) & has_east
+    masks = north * NORTH | south * SOUTH | west * WEST | east * EAST
+    return bytearray(masks.to_bytes(size, 'little'))
+
+
+class CostGrid(object):
+    """Row-major grid holding the cost of stepping onto each tile as a flat
+    array of floats, 1.0 for plain floor.
+
+    :ivar minimum: No tile costs less, so it scales the distance estimates
+        of weighted searches. Raising the cost of the cheapest tile doesn't
+        raise it, which leaves the estimates low but still correct.
+    :ivar version: Bumped on every change, for copies of the grid to tell
+        they're out of date.
+    """
+
+    def __init__(self, width, height, costs=None):
+        self.width = width
+        self.height = height
+        self.costs = array.array('d', [1.0]) * (width * height) if costs is None else costs
+        self.minimum = min(self.costs) if len(self.costs) else 1.0
+        self.version = 0
+
+    def get_cost(self, x, y):
+        return self.costs[y * self.width + x]
+
+    def set_cost(self, x, y, cost):
+        """Change the cost of stepping onto a tile.
+        :type cost: float
+        """
+        if cost <= 0:
+            raise ValueError('Tile costs have to be positive, got {}'.format(cost))
+        self.costs[y * self.width + x] = cost
+        self.minimum = min(self.minimum, cost)
+        self.version += 1
+
+    def snapshot(self):
+        """Copy the grid, for searching from other threads.
+        :rtype: CostGrid
+        """
+        snapshot = CostGrid(self.width, self.height, array.array('d', self.costs))
+        snapshot.version = self.version
+        return snapshot
+
+
+def build_collision_cells(tiled_map, layer, property_name='Collidable'):
+    """Flag every tile of the layer whose properties contain property_name.
+
+    Properties are looked up once per gid rather than once per tile.
+
+    :param tiled_map: The map the layer belongs to.
+    :type tiled_map: pytmx.TiledMap
+    :param layer: The layer to compile, None for a map without one.
+    :type layer: pytmx.TiledTileLayer
+    :rtype: bytearray
+    """
+    width = tiled_map.width
+    cells = bytearray(width * tiled_map.height)
+    if layer is None:
+        return cells
+
+    flags = {0: 0}
+    for y, row in enumerate(layer.data):
+        offset = y * width
+        for x, gid in enumerate(row):
+            flag = flags.get(gid)
+            if flag is None:
+                properties = tiled_map.get_tile_properties_by_gid(gid)
+                flag = flags[gid] = 1 if properties and property_name in properties else 0
+            if flag:
+                cells[offset + x] = 1
+    return cells
+
+
+def tile_cost(properties, property_name='Cost'):
+    """Read the cost of a tile from its properties, 1.0 if it has none.
+    :type properties: dict
+    :rtype: float
+    """
+    if not properties or property_name not in properties:
+        return 1.0
+    try:
+        cost = float(properties[property_name])
+    except (TypeError, ValueError):
+        raise ValueError('Tile property {} has to be a number, got {!r}'.format(property_name, properties[property_name]))
+    if cost <= 0:
+        raise ValueError('Tile property {} has to be positive, got {}'.format(property_name, cost))
+    return cost
+
+
+def build_cost_cells(tiled_map, layer, property_name='Cost', rows=None):
+    """Read the cost of every tile of the layer from property_name.
+
+    Costs are looked up once per gid rather than once per tile.
+
+    :param tiled_map: The map the layer belongs to.
+    :type tiled_map: pytmx.TiledMap
+    :param layer: The layer to read, None for a map without one.
+    :type layer: pytmx.TiledTileLayer
+    :param rows: The rows of gids to read instead of the layer's data, such
+        as ChunkStreamer.iter_rows of a streamed layer.
+    :type rows: iterable
+    :return: Array of one float per tile, None if no tile of the map's
+        tilesets has the property, so maps without costs don't carry a grid
+        of them.
+    :rtype: array.array
+    """
+    if layer is None or not any(property_name in properties for properties in tiled_map.tile_properties.values()):
+        return None
+
+    width = tiled_map.width
+    costs = array.array('d', [1.0]) * (width * tiled_map.height)
+    costs_by_gid = {0: 1.0}
+    for y, row in enumerate(layer.data if rows is None else rows):
+        offset = y * width
+        for x, gid in enumerate(row):
+            cost = costs_by_gid.get(gid)
+            if cost is None:
+                cost = costs_by_gid[gid] = tile_cost(tiled_map.get_tile_properties_by_gid(gid), property_name)
+            if cost != 1.0:
+                costs[offset + x] = cost
+    return costs
+
+
+def build_property_index(tiled_map, layer):
+    """Map each tile property name found in the layer to the coordinates of
+    the tiles having it, in the same row by row order the layer iterates in.
+
+    :param tiled_map: The map the layer belongs to.
+    :type tiled_map: pytmx.TiledMap
+    :type layer: pytmx.TiledTileLayer
+    :return: Dictionary of property name to a list of coordinate tuples.
+    :rtype: dict
+    """
+    index = {}
+    names_by_gid = {0: ()}
+    for y, row in enumerate(layer.data):
+        for x, gid in enumerate(row):
+            names = names_by_gid.get(gid)
+            if names is None:
+                properties = tiled_map.get_tile_properties_by_gid(gid)
+                names = names_by_gid[gid] = tuple(properties) if properties else ()
+            for name in names:
+                tiles = index.get(name)
+                if tiles is None:
+                    tiles = index[name] = []
+                tiles.append((x, y))
+    return index
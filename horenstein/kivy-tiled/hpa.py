@@ -0,0 +1,319 @@
+"""Hierarchical path finding (HPA*) for big tile maps.
+
+The map is split into square clusters. Where two clusters touch, every run
+of tiles walkable on both sides of the border becomes one or two entrances,
+and the tiles on either side of an entrance are the nodes of an abstract
+graph. Nodes of the same cluster are linked by the length of the shortest
+path between them that stays inside the cluster.
+
+A query links the start and destination to the nodes of their clusters,
+searches the abstract graph, a handful of nodes per cluster instead of every
+tile, and refines the abstract path into tiles one edge at a time, keeping
+the tiles between entrances for the next queries crossing the same cluster.
+Paths found this way are near, but not always exactly, the shortest.
+
+When a tile of the collision grid changes only its cluster, and the border
+it's on if any, is rebuilt before the next query.
+"""
+import collections
+import heapq
+import itertools
+
+from pathfinding import astar, manhattan_distance
+
+# runs of entrance tiles at least this long get an entrance at both ends
+# instead of a single one in the middle
+LONG_ENTRANCE = 6
+
+
+class HierarchicalPathfinder(object):
+    """Two level path finder on a CollisionGrid.
+
+    :param grid: The collision grid to search, changes to it are picked up
+        through a listener.
+    :type grid: CollisionGrid
+    :param cluster_size: Width and height of the clusters in tiles.
+    :type cluster_size: int
+    """
+
+    def __init__(self, grid, cluster_size=16):
+        self.grid = grid
+        self.cluster_size = cluster_size
+        self.clusters_x = (grid.width + cluster_size - 1) // cluster_size
+        self.clusters_y = (grid.height + cluster_size - 1) // cluster_size
+
+        # border key to a dictionary linking the tiles on both sides of its
+        # entrances, a border key is ('x', cx, cy) for the border between
+        # clusters cx,cy and cx+1,cy and ('y', cx, cy) for cx,cy and cx,cy+1
+        self._borders = {}
+        # cluster to a dictionary of node to {node: cost} inside the cluster
+        self._clusters = {}
+        # cluster to a dictionary of (node, node) to the tiles between them
+        self._refined = {}
+
+        self.cluster_rebuilds = 0
+        self._dirty_borders = set()
+        for cy in range(self.clusters_y):
+            for cx in range(self.clusters_x):
+                if cx + 1 < self.clusters_x:
+                    self._dirty_borders.add(('x', cx, cy))
+                if cy + 1 < self.clusters_y:
+                    self._dirty_borders.add(('y', cx, cy))
+        self._dirty_clusters = set(itertools.product(range(self.clusters_x), range(self.clusters_y)))
+        self._rebuild()
+
+        # clusters rebuilt because tiles changed after the graph was built
+        self.cluster_rebuilds = 0
+        grid.add_listener(self._on_tile_changed)
+
+    def close(self):
+        """Stop following changes to the grid."""
+        self.grid.remove_listener(self._on_tile_changed)
+
+    def find_path(self, start, dest):
+        """Find a path between two tiles, refined all the way.
+        :return: List of coordinate tuples from start to dest (both included)
+            or an empty list if there is no path.
+        :rtype: list
+        """
+        waypoints = self.find_abstract_path(start, dest)
+        if not waypoints:
+            return []
+
+        path = [waypoints[0]]
+        for node, next_node in zip(waypoints, waypoints[1:]):
+            tiles = self._refine(node, next_node)
+            # an edge that can't be walked fails the whole search rather than
+            # leaving a path that stops short of dest
+            if not tiles:
+                return []
+            path.extend(tiles[1:])
+        return path
+
+    def find_abstract_path(self, start, dest):
+        """Search the abstract graph between two tiles.
+        :return: List of the waypoints from start to dest (both included) or
+            an empty list if there is no path.
+        :rtype: list
+        """
+        start = tuple(start)
+        dest = tuple(dest)
+        if start == dest:
+            return [start]
+        if not self.grid.is_walkable(dest[0], dest[1]):
+            return []
+        self._rebuild()
+
+        return self._search_abstract(start, dest, self._link_endpoints(start, dest))
+
+    def _link_endpoints(self, start, dest):
+        """Link the start and destination to the nodes of their clusters, for
+        this query only: the links are kept apart from the cluster graph, so
+        there's nothing to take out of it afterwards.
+        :return: Dictionary of node to a list of (node, cost) it's linked to.
+        :rtype: dict
+        """
+        # a start on a collidable tile can still step off it, so it's linked
+        # through its neighbors instead
+        if self.grid.is_walkable(start[0], start[1]):
+            sources = [(start, start, 0)]
+        else:
+            sources = [(start, adjacent, 1) for adjacent in self.grid.neighbors(start[0], start[1])]
+        sources.append((dest, dest, 0))
+
+        links = collections.defaultdict(list)
+        for endpoint, source, base_cost in sources:
+            cluster = self._cluster_of(source)
+            distances = self._distances(source, self._cluster_bounds(cluster))
+            for node in self._clusters[cluster]:
+                cost = distances.get(node)
+                if cost is not None and node != endpoint:
+                    links[endpoint].append((node, base_cost + cost))
+                    links[node].append((endpoint, base_cost + cost))
+            if endpoint == start and dest in distances:
+                links[start].append((dest, base_cost + distances[dest]))
+        return links
+
+    def _search_abstract(self, start, dest, links):
+        """A* over the abstract graph and the links of a query, see
+        find_abstract_path.
+        """
+        dest_x, dest_y = dest
+        counter = itertools.count()
+        h = manhattan_distance(start[0], start[1], dest_x, dest_y)
+        open_heap = [(h, h, next(counter), start)]
+        g_scores = {start: 0}
+        came_from = {start: None}
+        closed = set()
+
+        while open_heap:
+            node = heapq.heappop(open_heap)[3]
+            if node == dest:
+                return _trace(came_from, node)
+            if node in closed:
+                continue
+            closed.add(node)
+
+            for adjacent, cost in self._abstract_neighbors(node, links):
+                if adjacent in closed:
+                    continue
+                g = g_scores[node] + cost
+                if g < g_scores.get(adjacent, g + 1):
+                    g_scores[adjacent] = g
+                    came_from[adjacent] = node
+                    h = manhattan_distance(adjacent[0], adjacent[1], dest_x, dest_y)
+                    heapq.heappush(open_heap, (g + h, h, next(counter), adjacent))
+
+        return []
+
+    def _abstract_neighbors(self, node, links):
+        cluster = self._cluster_of(node)
+        for adjacent, cost in self._clusters[cluster].get(node, {}).items():
+            yield adjacent, cost
+        for key in self._cluster_borders(cluster):
+            partner = self._borders[key].get(node)
+            if partner is not None:
+                yield partner, 1
+        for adjacent, cost in links.get(node, ()):
+            yield adjacent, cost
+
+    def _refine(self, node, next_node):
+        cluster = self._cluster_of(node)
+        next_cluster = self._cluster_of(next_node)
+        if cluster != next_cluster:
+            # an entrance, the two tiles are next to each other
+            if manhattan_distance(node[0], node[1], next_node[0], next_node[1]) == 1:
+                return [node, next_node]
+            # a collidable start linked through a neighbor in the next cluster
+            bounds, next_bounds = self._cluster_bounds(cluster), self._cluster_bounds(next_cluster)
+            bounds = (min(bounds[0], next_bounds[0]), min(bounds[1], next_bounds[1]),
+                      max(bounds[2], next_bounds[2]), max(bounds[3], next_bounds[3]))
+            return astar(self.grid, node, next_node, bounds=bounds)
+
+        # only paths between entrances are worth keeping, the start and
+        # destination change with every query
+        nodes = self._clusters[cluster]
+        cacheable = node in nodes and next_node in nodes
+        refined = self._refined[cluster]
+        if cacheable and (node, next_node) in refined:
+            return refined[(node, next_node)]
+
+        tiles = astar(self.grid, node, next_node, bounds=self._cluster_bounds(cluster))
+        if cacheable and tiles:
+            refined[(node, next_node)] = tiles
+        return tiles
+
+    def _on_tile_changed(self, x, y, blocked):
+        size = self.cluster_size
+        cx, cy = x // size, y // size
+        self._dirty_clusters.add((cx, cy))
+
+        # tiles on the edge of a cluster can open or close entrances
+        if x % size == 0 and cx > 0:
+            self._dirty_borders.add(('x', cx - 1, cy))
+        if x % size == size - 1 and cx + 1 < self.clusters_x:
+            self._dirty_borders.add(('x', cx, cy))
+        if y % size == 0 and cy > 0:
+            self._dirty_borders.add(('y', cx, cy - 1))
+        if y % size == size - 1 and cy + 1 < self.clusters_y:
+            self._dirty_borders.add(('y', cx, cy))
+
+    def _rebuild(self):
+        for key in self._dirty_borders:
+            self._build_border(key)
+            # the clusters on both sides gained or lost nodes
+            axis, cx, cy = key
+            self._dirty_clusters.add((cx, cy))
+            self._dirty_clusters.add((cx + 1, cy) if axis == 'x' else (cx, cy + 1))
+        self._dirty_borders.clear()
+
+        for cluster in self._dirty_clusters:
+            self._build_cluster(cluster)
+        self.cluster_rebuilds += len(self._dirty_clusters)
+        self._dirty_clusters.clear()
+
+    def _build_border(self, key):
+        axis, cx, cy = key
+        size = self.cluster_size
+        if axis == 'x':
+            x = (cx + 1) * size - 1
+            pairs = [((x, y), (x + 1, y)) for y in range(cy * size, min((cy + 1) * size, self.grid.height))]
+        else:
+            y = (cy + 1) * size - 1
+            pairs = [((x, y), (x, y + 1)) for x in range(cx * size, min((cx + 1) * size, self.grid.width))]
+
+        is_walkable = self.grid.is_walkable
+        links = {}
+        run = []
+        for pair in pairs + [None]:
+            if pair is not None and is_walkable(*pair[0]) and is_walkable(*pair[1]):
+                run.append(pair)
+                continue
+            if run:
+                entrances = (run[0], run[-1]) if len(run) >= LONG_ENTRANCE else (run[len(run) // 2],)
+                for tile, other_tile in entrances:
+                    links[tile] = other_tile
+                    links[other_tile] = tile
+                run = []
+        self._borders[key] = links
+
+    def _build_cluster(self, cluster):
+        nodes = set()
+        for key in self._cluster_borders(cluster):
+            nodes.update(node for node in self._borders[key] if self._cluster_of(node) == cluster)
+
+        bounds = self._cluster_bounds(cluster)
+        edges = {}
+        for node in sorted(nodes):
+            distances = self._distances(node, bounds)
+            edges[node] = dict((other, distances[other]) for other in nodes if other != node and other in distances)
+        self._clusters[cluster] = edges
+        self._refined[cluster] = {}
+
+    def _cluster_borders(self, cluster):
+        cx, cy = cluster
+        keys = []
+        if cx + 1 < self.clusters_x:
+            keys.append(('x', cx, cy))
+        if cx > 0:
+            keys.append(('x', cx - 1, cy))
+        if cy + 1 < self.clusters_y:
+            keys.append(('y', cx, cy))
+        if cy > 0:
+            keys.append(('y', cx, cy - 1))
+        return keys
+
+    def _cluster_of(self, tile):
+        return tile[0] // self.cluster_size, tile[1] // self.cluster_size
+
+    def _cluster_bounds(self, cluster):
+        size = self.cluster_size
+        x0, y0 = cluster[0] * size, cluster[1] * size
+        return x0, y0, min(x0 + size, self.grid.width) - 1, min(y0 + size, self.grid.height) - 1
+
+    def _distances(self, source, bounds):
+        """Breadth first search from source without leaving bounds.
+        :return: Dictionary of reachable tile to its distance.
+        :rtype: dict
+        """
+        x0, y0, x1, y1 = bounds
+        distances = {source: 0}
+        queue = collections.deque([source])
+        while queue:
+            node = queue.popleft()
+            distance = distances[node] + 1
+            for adjacent in self.grid.neighbors(node[0], node[1]):
+                if adjacent not in distances and x0 <= adjacent[0] <= x1 and y0 <= adjacent[1] <= y1:
+                    distances[adjacent] = distance
+                    queue.append(adjacent)
+        return distances
+
+
+def _trace(came_from, node):
+    """The nodes from the start of a search to a node."""
+    nodes = []
+    while node is not None:
+        nodes.append(node)
+        node = came_from[node]
+    nodes.reverse()
+    return nodes
@@ -0,0 +1,303 @@
+"""Jump Point Search for maps where every move costs the same.
+
+Most of the tiles A* adds to its open set lie on straight runs of floor that
+can't be part of a shorter path. JPS skips along those runs and only stops
+on jump points: tiles next to the corner of an obstacle, tiles of vertical
+runs a horizontal run branching off leads to one, and the destination. The
+paths found are as short as the ones A* finds, but may turn elsewhere.
+
+Where every run stops doesn't depend on the query, so it's worked out for
+the whole grid up front (as JPS+ does) and each jump is a table lookup.
+When tiles change, only the rows and columns around them are worked out
+again, before the next search.
+
+The tables cost a pass over every row and column of the grid, a few hundred
+milliseconds at 256x256, and pay for themselves only where runs are long:
+maps of rooms, corridors and wide open floor, searched many times. On maps
+cluttered with small obstacles nearly every tile is a jump point and JPS is
+no faster than A*.
+"""
+import heapq
+import itertools
+
+from pathfinding import manhattan_distance
+
+
+class JumpPointSearch(object):
+    """Jump Point Search on a CollisionGrid.
+
+    :param grid: The collision grid to search, changes to it are picked up
+        through a listener.
+    :type grid: CollisionGrid
+    """
+
+    def __init__(self, grid):
+        self.grid = grid
+
+        # tile index to the x of the next jump point going left or right on
+        # its row and the y of the next one going up or down its column, -1
+        # if the run hits a wall first
+        self._left = None
+        self._right = None
+        self._up = None
+        self._down = None
+        # tile index to the index of the first tile of the horizontal and the
+        # vertical run it's on, -1 for collidable tiles
+        self._rows = None
+        self._columns = None
+
+        # tables built from scratch, changed tiles only patch them
+        self.table_builds = 0
+        # tiles changed since the tables were last updated, None to build
+        # them from scratch
+        self._dirty_tiles = None
+        grid.add_listener(self._on_tile_changed)
+
+    def close(self):
+        """Stop following changes to the grid."""
+        self.grid.remove_listener(self._on_tile_changed)
+
+    def build_tables(self):
+        """Bring the jump tables up to date now, such as on a loading
+        screen, instead of in the next search.
+        """
+        if self._dirty_tiles is None or self._dirty_tiles:
+            self._update_tables()
+
+    def find_path(self, start, dest):
+        """Find the shortest path between two tiles.
+
+        :type start: (int, int)
+        :type dest: (int, int)
+        :return: List of coordinate tuples from start to dest (both included)
+            or an empty list if there is no path.
+        :rtype: list
+        """
+        grid = self.grid
+        start = tuple(start)
+        dest = tuple(dest)
+        dest_x, dest_y = dest
+
+        if start != dest and not grid.is_walkable(dest_x, dest_y):
+            return []
+        self.build_tables()
+
+        counter = itertools.count()
+        h = manhattan_distance(start[0], start[1], dest_x, dest_y)
+        open_heap = [(h, h, next(counter), start)]
+        g_scores = {start: 0}
+        came_from = {start: None}
+        closed = set()
+
+        while open_heap:
+            node = heapq.heappop(open_heap)[3]
+            if node == dest:
+                jump_points = []
+                while node is not None:
+                    jump_points.append(node)
+                    node = came_from[node]
+                jump_points.reverse()
+                return _fill_path(jump_points)
+
+            if node in closed:
+                continue
+            closed.add(node)
+
+            x, y = node
+            for direction_x, direction_y in self._directions(node, came_from[node]):
+                jump_point = self._jump(x + direction_x, y + direction_y, direction_x, direction_y, dest)
+                if jump_point is None or jump_point in closed:
+                    continue
+                g = g_scores[node] + manhattan_distance(x, y, jump_point[0], jump_point[1])
+                if g < g_scores.get(jump_point, g + 1):
+                    g_scores[jump_point] = g
+                    came_from[jump_point] = node
+                    h = manhattan_distance(jump_point[0], jump_point[1], dest_x, dest_y)
+                    heapq.heappush(open_heap, (g + h, h, next(counter), jump_point))
+
+        return []
+
+    def _directions(self, node, parent):
+        """The directions worth jumping in from a node, pruned by the direction
+        it was reached from.
+        """
+        x, y = node
+        if parent is None:
+            return [(adjacent[0] - x, adjacent[1] - y) for adjacent in self.grid.neighbors(x, y)]
+
+        # moving horizontally the turns are checked at every jump point, moving
+        # vertically only going on or turning into a horizontal run can help
+        direction_x = (x > parent[0]) - (x < parent[0])
+        direction_y = (y > parent[1]) - (y < parent[1])
+        if direction_x:
+            directions = ((0, -1), (0, 1), (direction_x, 0))
+        else:
+            directions = ((-1, 0), (1, 0), (0, direction_y))
+        return [(dx, dy) for dx, dy in directions if self.grid.is_walkable(x + dx, y + dy)]
+
+    def _jump(self, x, y, direction_x, direction_y, dest):
+        """Get the jump point reached going from x,y in a direction, None if
+        the run hits a wall without passing one.
+        """
+        grid = self.grid
+        if not grid.is_walkable(x, y):
+            return None
+
+        width = grid.width
+        index = y * width + x
+        dest_x, dest_y = dest
+        dest_index = dest_y * width + dest_x
+
+        if direction_x:
+            stop = (self._right if direction_x > 0 else self._left)[index]
+            # the destination is on this run, before any jump point
+            if self._rows[dest_index] == self._rows[index] and (dest_x - x) * direction_x >= 0 and \
+                    (stop == -1 or (stop - dest_x) * direction_x >= 0):
+                return dest
+            return None if stop == -1 else (stop, y)
+
+        stop = (self._down if direction_y > 0 else self._up)[index]
+        if (dest_y - y) * direction_y >= 0 and (stop == -1 or (stop - dest_y) * direction_y >= 0):
+            if dest_x == x and self._columns[dest_index] == self._columns[index]:
+                return dest
+            # a horizontal run off the destination's row may lead to it, stop
+            # there as the search on every row would
+            row_index = dest_y * width + x
+            if self._columns[row_index] == self._columns[index]:
+                return x, dest_y
+        return None if stop == -1 else (x, stop)
+
+    def _on_tile_changed(self, x, y, blocked):
+        if self._dirty_tiles is not None:
+            self._dirty_tiles.add((x, y))
+            # past a point patching the tables costs more than building them
+            if len(self._dirty_tiles) > self.grid.width + self.grid.height:
+                self._dirty_tiles = None
+
+    def _update_tables(self):
+        grid = self.grid
+        if self._left is None or self._dirty_tiles is None:
+            size = grid.width * grid.height
+            self._left, self._right, self._rows = [-1] * size, [-1] * size, [-1] * size
+            self._up, self._down, self._columns = [-1] * size, [-1] * size, [-1] * size
+            for y in range(grid.height):
+                self._build_row(y)
+            for x in range(grid.width):
+                self._build_column(x)
+            self.table_builds += 1
+        else:
+            # a tile only changes the jump points of the rows around it, the
+            # columns around it and the columns next to any jump point those
+            # rows gained or lost
+            rows = set(y + dy for x, y in self._dirty_tiles for dy in (-1, 0, 1) if 0 <= y + dy < grid.height)
+            columns = set(x + dx for x, y in self._dirty_tiles for dx in (-1, 0, 1))
+            for y in rows:
+                for x in self._build_row(y):
+                    columns.update((x - 1, x + 1))
+            for x in columns:
+                if 0 <= x < grid.width:
+                    self._build_column(x)
+        self._dirty_tiles = set()
+
+    def _is_walkable(self, x, y):
+        grid = self.grid
+        return 0 <= x < grid.width and 0 <= y < grid.height and not grid.cells[y * grid.width + x]
+
+    def _build_row(self, y):
+        """Work out the horizontal jump points and runs of a row.
+        :return: The x of the tiles whose jump points changed.
+        :rtype: list
+        """
+        is_walkable = self._is_walkable
+        cells, width = self.grid.cells, self.grid.width
+        offset = y * width
+
+        def forced(x, direction_x):
+            # a tile above or below that's only reachable around a corner
+            return (is_walkable(x, y - 1) and not is_walkable(x - direction_x, y - 1)) or \
+                (is_walkable(x, y + 1) and not is_walkable(x - direction_x, y + 1))
+
+        left, right, rows = [-1] * width, [-1] * width, [-1] * width
+        stop = -1
+        for x in range(width - 1, -1, -1):
+            if cells[offset + x]:
+                stop = -1
+                continue
+            if forced(x, 1):
+                stop = x
+            right[x] = stop
+        stop = run = -1
+        for x in range(width):
+            if cells[offset + x]:
+                stop = run = -1
+                continue
+            if run == -1:
+                run = offset + x
+            rows[x] = run
+            if forced(x, -1):
+                stop = x
+            left[x] = stop
+
+        changed = [
+            x for x in range(width)
+            if left[x] != self._left[offset + x] or right[x] != self._right[offset + x]
+        ]
+        self._left[offset:offset + width] = left
+        self._right[offset:offset + width] = right
+        self._rows[offset:offset + width] = rows
+        return changed
+
+    def _build_column(self, x):
+        """Work out the vertical jump points and runs of a column, from the
+        horizontal ones of the rows it crosses.
+        """
+        is_walkable = self._is_walkable
+        cells, width, height = self.grid.cells, self.grid.width, self.grid.height
+        left, right = self._left, self._right
+
+        def stops(y, direction_y):
+            # every step down a vertical run looks down both horizontal runs
+            # branching off it
+            return (is_walkable(x - 1, y) and not is_walkable(x - 1, y - direction_y)) or \
+                (is_walkable(x + 1, y) and not is_walkable(x + 1, y - direction_y)) or \
+                (x > 0 and left[y * width + x - 1] != -1) or \
+                (x + 1 < width and right[y * width + x + 1] != -1)
+
+        up, down, columns = self._up, self._down, self._columns
+        stop = -1
+        for y in range(height - 1, -1, -1):
+            index = y * width + x
+            down[index] = -1
+            if cells[index]:
+                stop = -1
+                continue
+            if stops(y, 1):
+                stop = y
+            down[index] = stop
+        stop = run = -1
+        for y in range(height):
+            index = y * width + x
+            up[index] = columns[index] = -1
+            if cells[index]:
+                stop = run = -1
+                continue
+            if run == -1:
+                run = index
+            columns[index] = run
+            if stops(y, -1):
+                stop = y
+            up[index] = stop
+
+
+def _fill_path(jump_points):
+    """Expand a list of jump points into every tile between them."""
+    path = [jump_points[0]]
+    for x, y in jump_points[1:]:
+        last_x, last_y = path[-1]
+        step_x = (x > last_x) - (x < last_x)
+        step_y = (y > last_y) - (y < last_y)
+        while (last_x, last_y) != (x, y):
+            last_x += step_x
+            last_y += step_y
+            path.append((last_x, last_y))
+    return path
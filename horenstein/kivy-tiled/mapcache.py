@@ -0,0 +1,391 @@
+"""Compiled binary copies of .tmx maps, so loading a level doesn't have to
+parse XML.
+
+A compiled map is laid out as::
+
+    magic | format version (uint32) | header size (uint32) | JSON header | padding | payload
+
+The payload holds the gids of every tile layer as row-major uint32 arrays,
+followed by the collision grid with one byte per tile and, when they were
+compiled in, the int32 connected component label of every tile. The header holds the
+rest of what pytmx would have parsed: map, tileset and layer attributes, the
+gid table, tile properties and the property index of every layer, plus the
+size, mtime and sha1 of the .tmx it was compiled from.
+
+Loading memory-maps the file copy-on-write, layer rows, the collision grid
+and the component labels are views into the mapping and pages are only read
+when touched.
+
+Compile maps ahead of time with:
+
+    python mapcache.py path/to/map.tmx [...]
+
+which writes the compiled copy next to the .tmx, for shipping with it.
+KivyTiledMap uses that copy when there is one, and otherwise writes its own
+to a cache directory (see default_cache_dir) the first time it parses a
+map, so read-only asset directories are never written to.
+"""
+import array
+import hashlib
+import itertools
+import json
+import mmap
+import os
+import struct
+import sys
+
+import pytmx
+
+from components import ComponentLabels
+from grid import CollisionGrid, build_collision_cells, build_property_index
+
+MAGIC = b'KTMC'
+FORMAT_VERSION = 3
+
+_PREAMBLE = struct.Struct('<4sII')
+
+# the typecode holding the gids, uint32 on every platform kivy runs on
+GID_TYPECODE = 'I'
+
+# the typecode holding the component labels
+LABEL_TYPECODE = 'i'
+
+MAP_ATTRIBUTES = ('version', 'orientation', 'renderorder', 'width', 'height', 'tilewidth', 'tileheight', 'background_color', 'properties')
+TILESET_ATTRIBUTES = ('firstgid', 'source', 'name', 'tilewidth', 'tileheight', 'spacing', 'margin', 'tilecount', 'columns', 'offset', 'trans', 'properties')
+LAYER_ATTRIBUTES = ('id', 'name', 'width', 'height', 'opacity', 'visible', 'offsetx', 'offsety', 'properties')
+
+
+def default_cache_dir():
+    """Get the directory KivyTiledMap writes compiled maps to by default,
+    kivy-tiled in the user's cache directory.
+    :rtype: str
+    """
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'kivy-tiled')
+
+
+def cache_path_for(map_file_path, cache_dir=None):
+    """Get where the compiled copy of a map goes.
+    :param cache_dir: Directory for compiled maps, None to put them next to
+        the .tmx file. Maps compiled into a directory get a hash of their
+        full path in the name, so maps of the same name don't share one.
+    :rtype: str
+    """
+    name = os.path.basename(map_file_path)
+    if cache_dir is None:
+        return os.path.join(os.path.dirname(map_file_path), name + 'c')
+    key = hashlib.sha1(os.path.abspath(map_file_path).encode('utf-8')).hexdigest()[:12]
+    root, extension = os.path.splitext(name)
+    return os.path.join(cache_dir, '{}-{}{}c'.format(root, key, extension))
+
+
+def compile_map(tiled_map, map_file_path, cache_path=None, collision_layer_name='Meta', collision_property='Collidable',
+                collision_cells=None, property_indexes=None, component_labels=None):
+    """Write the compiled copy of a parsed map.
+
+    :param tiled_map: The map parsed from map_file_path.
+    :type tiled_map: pytmx.TiledMap
+    :param collision_cells: Collision grid cells, compiled from the map if
+        not given.
+    :param property_indexes: Dictionary of layer name to property index,
+        built from the map for any layer not in it.
+    :param component_labels: The ComponentLabels of the collision grid to
+        store, True to label it here, which takes a while on big maps, or
+        None to leave them out and have loads label the grid themselves.
+    :raises ValueError: If the map has anything but tile layers or its tile
+        properties can't be stored.
+    :return: The path of the compiled map.
+    :rtype: str
+    """
+    cache_path = cache_path or cache_path_for(map_file_path)
+    header = {
+        'byteorder': sys.byteorder,
+        'source': _fingerprint(map_file_path),
+        'map': _attributes(tiled_map, MAP_ATTRIBUTES),
+    }
+    header.update(_gid_tables(tiled_map))
+
+    header['layers'], payload = _compile_layers(tiled_map, property_indexes or {})
+    offset = sum(len(chunk) for chunk in payload)
+    header['collision'], lookups = _compile_lookups(
+        tiled_map, offset, collision_layer_name, collision_property, collision_cells, component_labels)
+    payload.extend(lookups)
+
+    try:
+        header_bytes = json.dumps(header, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    except TypeError as e:
+        raise ValueError('The map has properties that can\'t be compiled: {}'.format(e))
+
+    # start the payload 8 byte aligned so the arrays can be used in place
+    padding = -(_PREAMBLE.size + len(header_bytes)) % 8
+
+    directory = os.path.dirname(cache_path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    temporary_path = cache_path + '.tmp'
+    with open(temporary_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b'\0' * padding)
+        for chunk in payload:
+            f.write(chunk)
+    os.replace(temporary_path, cache_path)
+    return cache_path
+
+
+def _gid_tables(tiled_map):
+    """Get the header entries of the gid tables, tile properties and
+    tilesets of a map.
+    :rtype: dict
+    """
+    return {
+        'maxgid': tiled_map.maxgid,
+        'gidmap': [[tiled_gid, [[gid, list(flags)] for gid, flags in gids]] for tiled_gid, gids in tiled_map.gidmap.items() if gids],
+        'tile_properties': [[gid, properties] for gid, properties in tiled_map.tile_properties.items()],
+        'tilesets': [_attributes(tileset, TILESET_ATTRIBUTES) for tileset in tiled_map.tilesets],
+    }
+
+
+def _compile_layers(tiled_map, property_indexes):
+    """Get the header entries and payload chunks of the gids of every layer.
+    :raises ValueError: If the map has anything but tile layers.
+    :return: The layer headers and the payload chunks.
+    :rtype: (list, list)
+    """
+    layer_headers = []
+    payload = []
+    offset = 0
+    for layer in tiled_map.layers:
+        if not isinstance(layer, pytmx.TiledTileLayer):
+            raise ValueError('Only maps with just tile layers can be compiled, "{}" is not one'.format(layer.name))
+
+        gids = array.array(GID_TYPECODE, itertools.chain.from_iterable(layer.data))
+        index = property_indexes.get(layer.name)
+        if index is None:
+            index = build_property_index(tiled_map, layer)
+
+        layer_header = _attributes(layer, LAYER_ATTRIBUTES)
+        layer_header['offset'] = offset
+        layer_header['property_index'] = dict((name, list(itertools.chain.from_iterable(tiles))) for name, tiles in index.items())
+        layer_headers.append(layer_header)
+
+        payload.append(gids.tobytes())
+        offset += len(payload[-1])
+    return layer_headers, payload
+
+
+def _compile_lookups(tiled_map, offset, collision_layer_name, collision_property, collision_cells, component_labels):
+    """Get the header entry and payload chunks of the collision grid and the
+    component labels, see compile_map.
+    :param offset: Where the chunks start in the payload.
+    :return: The collision header and the payload chunks.
+    :rtype: (dict, list)
+    """
+    width, height = tiled_map.width, tiled_map.height
+    if collision_cells is None:
+        try:
+            collision_layer = tiled_map.get_layer_by_name(collision_layer_name)
+        except ValueError:
+            collision_layer = None
+        collision_cells = build_collision_cells(tiled_map, collision_layer, collision_property)
+    collision = {'layer': collision_layer_name, 'property': collision_property, 'offset': offset}
+    payload = [bytes(collision_cells[:width * height])]
+    offset += len(payload[-1])
+
+    if component_labels is True:
+        component_labels = ComponentLabels(CollisionGrid(width, height, bytearray(collision_cells[:width * height])))
+    if component_labels is not None:
+        # the sizes are brought up to date along with the labels
+        component_labels.component_count()
+        payload.append(b'\0' * (-offset % 4))
+        offset += len(payload[-1])
+        collision['components'] = {
+            'offset': offset,
+            'sizes': [[label, size] for label, size in component_labels.sizes.items()],
+        }
+        payload.append(array.array(LABEL_TYPECODE, component_labels.labels).tobytes())
+    return collision, payload
+
+
+def load_compiled_map(map_file_path, cache_path=None):
+    """Open the compiled copy of a map if it's still up to date.
+    :return: The compiled map, None if there isn't a usable one.
+    :rtype: CompiledMap | None
+    """
+    cache_path = cache_path or cache_path_for(map_file_path)
+    try:
+        with open(cache_path, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    except (IOError, OSError, ValueError):
+        return None
+
+    compiled = CompiledMap(mapping)
+    if not compiled.is_valid() or not compiled.is_compiled_from(map_file_path):
+        return None
+    return compiled
+
+
+class CompiledMap(object):
+    """A memory-mapped compiled map, see load_compiled_map."""
+
+    def __init__(self, mapping):
+        self._mapping = mapping
+        self.header = None
+        self._payload_offset = 0
+
+        if len(mapping) < _PREAMBLE.size:
+            return
+        magic, version, header_size = _PREAMBLE.unpack_from(mapping, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            return
+
+        header_end = _PREAMBLE.size + header_size
+        try:
+            self.header = json.loads(mapping[_PREAMBLE.size:header_end].decode('utf-8'))
+        except ValueError:
+            return
+        self._payload_offset = header_end + (-header_end % 8)
+
+    def is_valid(self):
+        if self.header is None or self.header.get('byteorder') != sys.byteorder:
+            return False
+        return array.array(GID_TYPECODE).itemsize == 4 and array.array(LABEL_TYPECODE).itemsize == 4
+
+    def is_compiled_from(self, map_file_path):
+        """Check that the .tmx file hasn't changed since the map was
+        compiled. Files touched without changing only cost hashing them.
+        :rtype: bool
+        """
+        source = self.header['source']
+        try:
+            stat = os.stat(map_file_path)
+        except OSError:
+            return False
+
+        if stat.st_size != source['size']:
+            return False
+        if stat.st_mtime == source['mtime']:
+            return True
+        return _sha1(map_file_path) == source['sha1']
+
+    def restore(self, tiled_map):
+        """Fill in an empty pytmx.TiledMap with the compiled map's data.
+        :type tiled_map: pytmx.TiledMap
+        """
+        header = self.header
+        for name, value in header['map'].items():
+            setattr(tiled_map, name, value)
+
+        # the gid tables are added to the ones pytmx.TiledMap starts with
+        tiled_map.maxgid = header['maxgid']
+        for tiled_gid, gids in header['gidmap']:
+            for gid, flags in gids:
+                flags = pytmx.TileFlags(*flags)
+                tiled_map.gidmap[tiled_gid].append((gid, flags))
+                tiled_map.imagemap[(tiled_gid, flags)] = (gid, flags)
+                tiled_map.tiledgidmap[gid] = tiled_gid
+        tiled_map.tile_properties = dict((gid, properties) for gid, properties in header['tile_properties'])
+
+        for tileset_header in header['tilesets']:
+            tileset = _new_element(pytmx.TiledTileset, tiled_map, tileset_header)
+            if isinstance(tileset.offset, list):
+                tileset.offset = tuple(tileset.offset)
+            tiled_map.add_tileset(tileset)
+
+        for layer_index, layer_header in enumerate(header['layers']):
+            layer = _new_element(pytmx.TiledTileLayer, tiled_map, layer_header, exclude=('offset', 'property_index'))
+            gids = self.get_layer_gids(layer_index)
+            layer.data = [gids[y * layer.width:(y + 1) * layer.width] for y in range(layer.height)]
+            tiled_map.add_layer(layer)
+
+    def get_layer_gids(self, layer_index):
+        """Get the gids of a layer as a flat, row-major and writable view of
+        the mapping.
+        :rtype: memoryview
+        """
+        layer_header = self.header['layers'][layer_index]
+        start = self._payload_offset + layer_header['offset']
+        size = layer_header['width'] * layer_header['height'] * 4
+        return memoryview(self._mapping)[start:start + size].cast(GID_TYPECODE)
+
+    def get_collision_cells(self, layer_name, property_name):
+        """Get the collision grid cells, as a writable view of the mapping.
+        :return: The cells, None if they were compiled for another layer or
+            property.
+        """
+        collision = self.header['collision']
+        if collision['layer'] != layer_name or collision['property'] != property_name:
+            return None
+
+        width, height = self.header['map']['width'], self.header['map']['height']
+        start = self._payload_offset + collision['offset']
+        return memoryview(self._mapping)[start:start + width * height]
+
+    def get_component_labels(self, layer_name, property_name):
+        """Get the connected component labels of the collision grid, the
+        labels as a writable view of the mapping.
+        :return: The labels and the dictionary of label to component size,
+            None if they weren't compiled in or were for another layer or
+            property.
+        :rtype: (memoryview, dict) | None
+        """
+        collision = self.header['collision']
+        components = collision.get('components')
+        if components is None or collision['layer'] != layer_name or collision['property'] != property_name:
+            return None
+
+        width, height = self.header['map']['width'], self.header['map']['height']
+        start = self._payload_offset + components['offset']
+        labels = memoryview(self._mapping)[start:start + width * height * 4].cast(LABEL_TYPECODE)
+        return labels, dict((label, size) for label, size in components['sizes'])
+
+    def get_property_indexes(self):
+        """Get the property index of every layer.
+        :return: Dictionary of layer name to property index.
+        :rtype: dict
+        """
+        indexes = {}
+        for layer_header in self.header['layers']:
+            index = indexes[layer_header['name']] = {}
+            for name, coordinates in layer_header['property_index'].items():
+                index[name] = list(zip(coordinates[0::2], coordinates[1::2]))
+        return indexes
+
+
+def _attributes(element, names):
+    attributes = {}
+    for name in names:
+        if hasattr(element, name):
+            attributes[name] = getattr(element, name)
+    return attributes
+
+
+def _new_element(cls, parent, attributes, exclude=()):
+    """Create a pytmx element without the XML node its constructor parses."""
+    element = cls.__new__(cls)
+    pytmx.TiledElement.__init__(element)
+    element.parent = parent
+    for name, value in attributes.items():
+        if name not in exclude:
+            setattr(element, name, value)
+    return element
+
+
+def _fingerprint(map_file_path):
+    stat = os.stat(map_file_path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime, 'sha1': _sha1(map_file_path)}
+
+
+def _sha1(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+if __name__ == '__main__':
+    for map_file_path in sys.argv[1:]:
+        print('{} -> {}'.format(map_file_path, compile_map(
+            pytmx.TiledMap(map_file_path), map_file_path, component_labels=True)))
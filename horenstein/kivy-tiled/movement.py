@@ -0,0 +1,250 @@
+"""Moving many agents along tile paths at once.
+
+An Animation per step per agent means thousands of Clock callbacks a frame
+once there are thousands of agents. PathFollowers keeps every agent's path
+in one NumPy array instead, with how far along it each agent has got, and a
+single advance call moves all of them: the tile each one is on and the
+point between that and the next tile it's at are worked out for the whole
+array at once, as are the checks of the tiles they step onto.
+"""
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class PathFollowers(object):
+    """Agents walking tile paths at a constant speed on a CollisionGrid.
+    Requires numpy.
+
+    Each agent is an int, an index into positions and tiles, reused once the
+    agent is removed.
+
+    :param grid: The collision grid, an agent about to step onto a tile
+        that became collidable stops on the tile before it.
+    :type grid: CollisionGrid
+    :param speed: Tiles walked a second.
+    :type speed: float
+    :param capacity: Agents to make room for up front, more are made room
+        for as they're added.
+    :type capacity: int
+    :ivar positions: Array of the (x, y) tile coordinates of each agent,
+        fractional between two tiles.
+    :ivar tiles: Array of the tile each agent is on or stepping onto, the
+        same tile TileMovement.current_tile is.
+    """
+
+    def __init__(self, grid, speed=2.0, capacity=64):
+        if numpy is None:
+            raise ImportError('PathFollowers requires numpy')
+        self.grid = grid
+        self.speed = speed
+
+        self.positions = numpy.zeros((capacity, 2))
+        self.tiles = numpy.zeros((capacity, 2), dtype=numpy.int32)
+
+        # the paths of all the agents one after the other, rows of (x, y)
+        self._points = numpy.zeros((capacity * 16, 2), dtype=numpy.int32)
+        self._points_used = 0
+        # points of paths replaced or removed, dropped when the array fills
+        self._points_unused = 0
+
+        # per agent: where its path starts in _points and how many tiles it
+        # has, the tiles walked so far, the last index of its path checked
+        # to be walkable, its speed and whether it's still walking
+        self._offsets = numpy.zeros(capacity, dtype=numpy.int64)
+        self._lengths = numpy.zeros(capacity, dtype=numpy.int64)
+        self._travelled = numpy.zeros(capacity)
+        self._checked = numpy.zeros(capacity, dtype=numpy.int64)
+        self._speeds = numpy.zeros(capacity)
+        self._moving = numpy.zeros(capacity, dtype=bool)
+
+        self._count = 0
+        self._free = []
+
+    def add(self, path, speed=None):
+        """Add an agent walking a path.
+        :param path: Coordinate tuples of the tiles from the one the agent is
+            on to its destination, as find_path returns them.
+        :type path: list
+        :param speed: Tiles walked a second, the speed of the followers if
+            None.
+        :type speed: float
+        :rtype: int
+        """
+        if self._free:
+            agent = self._free.pop()
+        else:
+            if self._count == len(self._offsets):
+                self._grow_agents()
+            agent = self._count
+            self._count += 1
+        self._lengths[agent] = 0
+        self._speeds[agent] = self.speed if speed is None else speed
+        self.set_path(agent, path)
+        return agent
+
+    def set_path(self, agent, path):
+        """Have an agent walk a different path, such as to a new
+        destination, starting from the tile it's on.
+
+        An agent between two tiles carries on from where it is: a path
+        starting on either of them is walked from that point, turning back
+        if it goes to the tile the agent is leaving.
+
+        :type agent: int
+        :type path: list
+        """
+        if not len(path):
+            raise ValueError('Agents need a path with at least the tile they are on')
+        path = numpy.asarray(path, dtype=numpy.int32).reshape(-1, 2)
+        path, travelled = self._join_step(agent, path)
+        self._points_unused += self._lengths[agent]
+        self._lengths[agent] = 0
+        if self._points_used + len(path) > len(self._points):
+            self._make_room(len(path))
+
+        offset = self._points_used
+        self._points[offset:offset + len(path)] = path
+        self._points_used += len(path)
+
+        self._offsets[agent] = offset
+        self._lengths[agent] = len(path)
+        self._travelled[agent] = travelled
+        self._moving[agent] = True
+        if travelled:
+            # half way through the first step, onto a tile already checked
+            self._checked[agent] = 1
+            self.positions[agent] = path[0] + (path[1] - path[0]) * travelled
+            self.tiles[agent] = path[1]
+        else:
+            self._checked[agent] = 0
+            self.positions[agent] = path[0]
+            self.tiles[agent] = path[0]
+
+    def _join_step(self, agent, path):
+        """Join a new path for an agent onto the step it's in the middle of,
+        if any.
+        :return: The path to walk, starting with the two tiles of the step,
+            and how far along the first step of it the agent is.
+        :rtype: (numpy.ndarray, float)
+        """
+        length = self._lengths[agent]
+        travelled = self._travelled[agent]
+        step = int(travelled)
+        fraction = float(travelled - step)
+        if not length or not fraction or step + 1 >= length:
+            return path, 0.0
+
+        offset = self._offsets[agent]
+        leaving, entering = self._points[offset + step], self._points[offset + step + 1]
+        if (path[0] == leaving).all():
+            other = entering
+        elif (path[0] == entering).all():
+            other, fraction = leaving, 1.0 - fraction
+        else:
+            return path, 0.0
+
+        # fraction is now how far from path[0] towards other the agent is
+        if len(path) > 1 and (path[1] == other).all():
+            return path, fraction
+        return numpy.concatenate((other[None], path)), 1.0 - fraction
+
+    def remove(self, agent):
+        """Remove an agent, its index is given to the next one added."""
+        self._points_unused += self._lengths[agent]
+        self._lengths[agent] = 0
+        self._moving[agent] = False
+        self._free.append(agent)
+
+    def is_moving(self, agent):
+        """Check if an agent is still walking its path.
+        :rtype: bool
+        """
+        return bool(self._moving[agent])
+
+    def tile(self, agent):
+        """Get the tile an agent is on or stepping onto.
+        :rtype: (int, int)
+        """
+        return int(self.tiles[agent, 0]), int(self.tiles[agent, 1])
+
+    def advance(self, dt):
+        """Move every walking agent along its path.
+        :param dt: Seconds since the last advance. Agents go a tile at most
+            per advance, so none steps onto a tile without checking it.
+        :type dt: float
+        :return: Arrays of the agents that moved, of the ones among them that
+            reached their destination and of the ones that stopped at a tile
+            that became collidable.
+        :rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        """
+        agents = numpy.flatnonzero(self._moving[:self._count])
+        if not len(agents):
+            return agents, agents, agents
+
+        offsets = self._offsets[agents]
+        last = self._lengths[agents] - 1
+        travelled = numpy.minimum(
+            self._travelled[agents] + numpy.minimum(self._speeds[agents] * dt, 1.0), last)
+        step = travelled.astype(numpy.int64)
+        target = numpy.minimum(step + 1, last)
+
+        # agents starting a step this advance check the tile they step onto
+        blocked = numpy.zeros(len(agents), dtype=bool)
+        starting = numpy.flatnonzero(target > self._checked[agents])
+        if len(starting):
+            points = self._points[offsets[starting] + target[starting]]
+            cells = numpy.frombuffer(self.grid.cells, dtype=numpy.uint8)
+            blocked[starting] = cells[points[:, 1] * self.grid.width + points[:, 0]] != 0
+            step[blocked] = target[blocked] - 1
+            travelled[blocked] = step[blocked]
+            target[blocked] = step[blocked]
+        self._checked[agents] = target
+
+        # between the tile stepped off and the tile stepped onto
+        start_points = self._points[offsets + step]
+        end_points = self._points[offsets + numpy.minimum(step + 1, last)]
+        fraction = (travelled - step)[:, None]
+        self.positions[agents] = start_points + (end_points - start_points) * fraction
+        self.tiles[agents] = self._points[offsets + target]
+        self._travelled[agents] = travelled
+
+        arrived = (travelled >= last) & ~blocked
+        self._moving[agents[arrived | blocked]] = False
+        return agents, agents[arrived], agents[blocked]
+
+    def _grow_agents(self):
+        capacity = len(self._offsets) * 2
+        for name in ('positions', 'tiles'):
+            old = getattr(self, name)
+            new = numpy.zeros((capacity, 2), dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+        for name in ('_offsets', '_lengths', '_travelled', '_checked', '_speeds', '_moving'):
+            old = getattr(self, name)
+            new = numpy.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _make_room(self, count):
+        """Drop the points of old paths, growing the array of them when
+        that doesn't leave room for count more.
+        """
+        used = self._points_used - self._points_unused
+        size = len(self._points)
+        while used + count > size // 2:
+            size *= 2
+
+        agents = numpy.flatnonzero(self._lengths[:self._count])
+        lengths = self._lengths[agents]
+        points = numpy.zeros((size, 2), dtype=numpy.int32)
+        if len(agents):
+            # every point of the kept paths, in the order of the agents
+            starts = numpy.cumsum(lengths) - lengths
+            indices = numpy.repeat(self._offsets[agents] - starts, lengths) + numpy.arange(lengths.sum())
+            points[:len(indices)] = self._points[indices]
+            self._offsets[agents] = starts
+        self._points = points
+        self._points_used = int(lengths.sum())
+        self._points_unused = 0
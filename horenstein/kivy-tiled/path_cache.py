@@ -0,0 +1,143 @@
+"""Least recently used cache of the paths found on a collision grid.
+
+Agents tend to ask for the same routes over and over, spawn point to waiting
+area and back. Paths are kept as arrays of tile indices, and every tile on a
+path points back at it, so when a tile changes only the paths crossing it
+are dropped.
+"""
+import array
+import collections
+
+# tile indices fit in 32 bits on any map that fits in memory
+INDEX_TYPECODE = 'I'
+
+
+class PathCache(object):
+    """Paths between pairs of tiles on a CollisionGrid, kept valid as it
+    changes.
+
+    A tile becoming collidable drops the paths going through it. A tile
+    becoming walkable drops the cached "no path" results, but keeps the
+    paths found before, which are still walkable though a shorter one may
+    now exist.
+
+    :param grid: The collision grid the paths were found on, changes to it
+        are picked up through a listener.
+    :type grid: CollisionGrid
+    :param max_entries: How many paths to keep.
+    :type max_entries: int
+    """
+
+    def __init__(self, grid, max_entries=1024):
+        self.grid = grid
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        # (start, dest) to the path's tile indices, least recently used first,
+        # None when there's no path
+        self._paths = collections.OrderedDict()
+        # tile index to the keys of the paths crossing it
+        self._keys_by_tile = {}
+        # the keys of the pairs without a path
+        self._unreachable = set()
+        grid.add_listener(self._on_tile_changed)
+
+    def close(self):
+        """Stop following changes to the grid."""
+        self.grid.remove_listener(self._on_tile_changed)
+
+    def get(self, start, dest):
+        """Get the cached path between two tiles.
+        :return: List of coordinate tuples from start to dest, an empty list
+            if there is no path or None if it isn't cached.
+        :rtype: list | None
+        """
+        key = (tuple(start), tuple(dest))
+        indices = self._paths.pop(key, False)
+        if indices is False:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._paths[key] = indices  # most recently used
+        if indices is None:
+            return []
+        width = self.grid.width
+        return [(index % width, index // width) for index in indices]
+
+    def put(self, start, dest, path):
+        """Cache the path found between two tiles.
+        :param path: List of coordinate tuples from start to dest, empty if
+            there is no path.
+        :type path: list
+        """
+        key = (tuple(start), tuple(dest))
+        self._remove(key)
+
+        width = self.grid.width
+        indices = array.array(INDEX_TYPECODE, [y * width + x for x, y in path]) if path else None
+        self._paths[key] = indices
+        if indices is None:
+            self._unreachable.add(key)
+        for index in indices or ():
+            keys = self._keys_by_tile.get(index)
+            if keys is None:
+                keys = self._keys_by_tile[index] = set()
+            keys.add(key)
+
+        while len(self._paths) > self.max_entries:
+            self._remove(next(iter(self._paths)))
+            self.evictions += 1
+
+    def find_path(self, start, dest, search):
+        """Get the path between two tiles from the cache, or from search
+        caching what it finds.
+        :param search: Called with start and dest on a miss.
+        :rtype: list
+        """
+        path = self.get(start, dest)
+        if path is None:
+            path = search(start, dest)
+            self.put(start, dest, path)
+        return path
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'hit_rate': self.hits / float(lookups) if lookups else 0.0,
+            'paths': len(self._paths),
+        }
+
+    def clear(self):
+        self._paths.clear()
+        self._keys_by_tile.clear()
+        self._unreachable.clear()
+
+    def _remove(self, key):
+        self._unreachable.discard(key)
+        indices = self._paths.pop(key, None)
+        for index in indices or ():
+            keys = self._keys_by_tile.get(index)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tile[index]
+
+    def _on_tile_changed(self, x, y, blocked):
+        if blocked:
+            keys = self._keys_by_tile.get(y * self.grid.width + x, ())
+        else:
+            # any path that wasn't there may be now
+            keys = self._unreachable
+
+        for key in list(keys):
+            self._remove(key)
+            self.invalidations += 1
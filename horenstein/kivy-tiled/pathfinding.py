@@ -0,0 +1,243 @@
+"""Path finding over the walkable tiles of a tile map.
+
+Nothing in here touches Kivy, the searches run on the CollisionGrid that
+KivyTiledMap.get_collision_grid compiles. That keeps them usable from
+benchmarks and scripts that don't have a window.
+"""
+import array
+import heapq
+import itertools
+import threading
+
+# grids of fewer tiles are searched with dictionaries of g scores and
+# parents. From this many on, where a search through a maze can take
+# hundreds of thousands of tiles, arrays of them reused from one search to
+# the next search about 1.4 times as fast; on smaller grids they're only a
+# little faster, not worth keeping arrays the size of the grid around for
+# every thread that searches, see benchmarks/bench_search_memory.py
+DENSE_SEARCH_MIN_TILES = 1 << 18
+
+# grids of more tiles are searched with dictionaries again, the arrays take
+# 16 bytes a tile for each thread searching (24 once it searched both with
+# and without tile costs)
+DENSE_SEARCH_MAX_TILES = 1 << 22
+
+# the _SearchScratch of each thread
+_scratches = threading.local()
+
+
+def manhattan_distance(x1, y1, x2, y2):
+    """Distance between two tiles when only moving up, down, left or right."""
+    return abs(x1 - x2) + abs(y1 - y2)
+
+
+def astar(grid, start, dest, bounds=None, costs=None):
+    """Find the shortest path between two tiles with A*.
+
+    The open set is a binary heap ordered on ``g + h`` using the Manhattan
+    distance as the heuristic. Ties are broken on the smaller ``h`` and then
+    on insertion order, so the same query on the same map always returns the
+    same path.
+
+    Tiles are searched as integer indices, their walkable neighbors read off
+    the grid's neighbor masks, so expanding one doesn't build a list of
+    neighbor tuples. The g scores and parents are kept in dictionaries, or
+    on big grids in arrays reused from one search to the next, see
+    DENSE_SEARCH_MIN_TILES.
+
+    :param grid: The collision grid to search.
+    :type grid: CollisionGrid
+    :param start: The tile coordinates to start from.
+    :type start: (int, int)
+    :param dest: The tile coordinates to reach.
+    :type dest: (int, int)
+    :param bounds: Optional rectangle of tiles ``(x0, y0, x1, y1)``, both
+        corners included, the path has to stay within.
+    :type bounds: (int, int, int, int)
+    :param costs: Optional cost of stepping onto each tile, for the cheapest
+        path rather than the shortest. The distance estimate is then scaled
+        by the cheapest tile's cost.
+    :type costs: CostGrid
+    :return: List of coordinate tuples from start to dest (both included) or
+        an empty list if there is no path.
+    :rtype: list
+    """
+    start = tuple(start)
+    dest = tuple(dest)
+    dest_x, dest_y = dest
+
+    # there is no point exploring the whole map to reach a blocked tile
+    if start != dest and not grid.is_walkable(dest_x, dest_y):
+        return []
+    if start == dest:
+        return [start]
+    if not grid.in_bounds(*start):
+        return []
+
+    # tiles are plain indices into the grid's neighbor masks from here on
+    width = grid.width
+    start_index = start[1] * width + start[0]
+    dest_index = dest_y * width + dest_x
+    size = width * grid.height
+    if DENSE_SEARCH_MIN_TILES <= size <= DENSE_SEARCH_MAX_TILES:
+        return _search_dense(grid, start_index, dest_index, bounds, costs, _scratch(size))
+    return _search_sparse(grid, start_index, dest_index, bounds, costs)
+
+
+def _scratch(size):
+    """The _SearchScratch of the current thread, for grids of a size."""
+    scratch = getattr(_scratches, 'scratch', None)
+    if scratch is None or len(scratch.stamps) != size:
+        scratch = _scratches.scratch = _SearchScratch(size)
+    return scratch
+
+
+class _SearchScratch(object):
+    """Arrays indexed by tile holding the g scores and parents of a search,
+    reused from one search to the next.
+
+    Rather than clearing them, each search gets a new pair of stamps, an
+    entry only counts when its tile is stamped with one of the current
+    search's.
+    """
+
+    def __init__(self, size):
+        self.stamps = array.array('I', [0]) * size
+        self.parents = array.array('i', [0]) * size
+        # typecode to the g scores, made on first use
+        self._g_scores = {}
+        self._stamp = 0
+
+    def g_scores(self, weighted):
+        """Get the g scores of searches with tile costs or without. Those
+        without are whole numbers, which Python reads out of an array of
+        integers faster than out of one of floats.
+        :rtype: array.array
+        """
+        typecode = 'd' if weighted else 'q'
+        g_scores = self._g_scores.get(typecode)
+        if g_scores is None:
+            g_scores = self._g_scores[typecode] = array.array(typecode, [0]) * len(self.stamps)
+        return g_scores
+
+    def next_stamps(self):
+        """Get the stamps of a new search, for tiles seen and tiles closed.
+        :rtype: (int, int)
+        """
+        self._stamp += 2
+        if self._stamp >= 2 ** 32 - 2:
+            # wrapped around, old stamps could pass for new ones
+            self.stamps = array.array('I', [0]) * len(self.stamps)
+            self._stamp = 2
+        return self._stamp, self._stamp + 1
+
+
+def _search_dense(grid, start_index, dest_index, bounds, costs, scratch):
+    width = grid.width
+    masks = grid.neighbor_masks()
+    offsets = grid.neighbor_offsets()
+    dest_y, dest_x = divmod(dest_index, width)
+    stamps, g_scores, parents = scratch.stamps, scratch.g_scores(costs is not None), scratch.parents
+    seen, closed = scratch.next_stamps()
+    tile_costs, scale = (None, 1) if costs is None else (costs.costs, costs.minimum)
+
+    counter = itertools.count()
+    start_y, start_x = divmod(start_index, width)
+    h = (abs(start_x - dest_x) + abs(start_y - dest_y)) * scale
+    open_heap = [(h, h, next(counter), start_index)]
+    stamps[start_index] = seen
+    g_scores[start_index] = 0
+    parents[start_index] = -1
+
+    while open_heap:
+        index = heapq.heappop(open_heap)[3]
+        if index == dest_index:
+            return _reconstruct_path(parents, index, width)
+
+        # stale heap entries are skipped instead of being removed on update
+        if stamps[index] == closed:
+            continue
+        stamps[index] = closed
+
+        index_g = g_scores[index]
+        mask = masks[index]
+        for bit, offset in offsets:
+            if not mask & bit:
+                continue
+            adjacent = index + offset
+            stamp = stamps[adjacent]
+            # the scaled manhattan distance is consistent, closed nodes are
+            # final
+            if stamp == closed:
+                continue
+            g = index_g + (1 if tile_costs is None else tile_costs[adjacent])
+            if stamp == seen and g >= g_scores[adjacent]:
+                continue
+            y, x = divmod(adjacent, width)
+            if bounds is not None and not (bounds[0] <= x <= bounds[2] and bounds[1] <= y <= bounds[3]):
+                continue
+            stamps[adjacent] = seen
+            g_scores[adjacent] = g
+            parents[adjacent] = index
+            h = (abs(x - dest_x) + abs(y - dest_y)) * scale
+            heapq.heappush(open_heap, (g + h, h, next(counter), adjacent))
+
+    # if we got here no path was found
+    return []
+
+
+def _search_sparse(grid, start_index, dest_index, bounds, costs):
+    """The same search keeping its g scores and parents in dictionaries, for
+    grids too small for the arrays to pay off or too big to hold them.
+    """
+    width = grid.width
+    masks = grid.neighbor_masks()
+    offsets = grid.neighbor_offsets()
+    dest_y, dest_x = divmod(dest_index, width)
+    tile_costs, scale = (None, 1) if costs is None else (costs.costs, costs.minimum)
+
+    counter = itertools.count()
+    start_y, start_x = divmod(start_index, width)
+    h = (abs(start_x - dest_x) + abs(start_y - dest_y)) * scale
+    open_heap = [(h, h, next(counter), start_index)]
+    g_scores = {start_index: 0}
+    parents = {start_index: -1}
+    closed = set()
+
+    while open_heap:
+        index = heapq.heappop(open_heap)[3]
+        if index == dest_index:
+            return _reconstruct_path(parents, index, width)
+
+        if index in closed:
+            continue
+        closed.add(index)
+
+        index_g = g_scores[index]
+        mask = masks[index]
+        for bit, offset in offsets:
+            if not mask & bit:
+                continue
+            adjacent = index + offset
+            if adjacent in closed:
+                continue
+            y, x = divmod(adjacent, width)
+            if bounds is not None and not (bounds[0] <= x <= bounds[2] and bounds[1] <= y <= bounds[3]):
+                continue
+            g = index_g + (1 if tile_costs is None else tile_costs[adjacent])
+            if g < g_scores.get(adjacent, g + 1):
+                g_scores[adjacent] = g
+                parents[adjacent] = index
+                h = (abs(x - dest_x) + abs(y - dest_y)) * scale
+                heapq.heappush(open_heap, (g + h, h, next(counter), adjacent))
+
+    return []
+
+
+def _reconstruct_path(parents, index, width):
+    path = []
+    while index != -1:
+        path.append((index % width, index // width))
+        index = parents[index]
+    path.reverse()
+    return path
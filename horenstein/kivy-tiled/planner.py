@@ -0,0 +1,193 @@
+"""Path finding off the main thread.
+
+Searching a big map can take longer than a frame. PathPlanner runs the
+searches on a background thread against a snapshot of the collision grid,
+which can't change under them, and hands the paths back on the main thread
+through the Kivy Clock. Tiles changed on the grid are applied to the
+snapshot between searches, so the jump tables and clusters built on it are
+patched rather than built again. A path found before a change that blocks
+it is searched for again instead of being handed back.
+"""
+import queue
+import threading
+
+from kivy.clock import Clock
+from kivy.logger import Logger
+
+from grid import CollisionGrid
+from searches import ALGORITHMS, GridSearches
+
+
+class PlanRequest(object):
+    """A path requested from a PathPlanner.
+
+    :ivar path: The path found, None until it has been and an empty list if
+        there is none or the search failed.
+    :ivar generation: The number of grid changes the snapshot searched had
+        taken in, see PathPlanner.is_current.
+    """
+
+    def __init__(self, start, dest, algorithm, callback, snapshot):
+        self.start = start
+        self.dest = dest
+        self.algorithm = algorithm
+        self.callback = callback
+        self.snapshot = snapshot
+        self.path = None
+        self.generation = None
+        self.costs_version = None
+        self.cancelled = False
+
+    def cancel(self):
+        """Drop the request, the callback won't be called. A search already
+        running finishes but its path is thrown away.
+        """
+        self.cancelled = True
+
+
+class PathPlanner(object):
+    """Finds paths on a background thread.
+
+    :param grid: The collision grid to search snapshots of.
+    :type grid: CollisionGrid
+    :param hpa_cluster_size: Cluster size of the 'hpa' algorithm.
+    :type hpa_cluster_size: int
+    :param costs: Tile costs of the 'astar' algorithm, snapshotted along with
+        the grid.
+    :type costs: CostGrid
+    """
+
+    def __init__(self, grid, hpa_cluster_size=16, costs=None):
+        self.grid = grid
+        self.hpa_cluster_size = hpa_cluster_size
+        self.costs = costs
+
+        self.planned = 0
+        self.cancelled = 0
+        # paths blocked by a change made while they were searched for
+        self.replanned = 0
+        self.failed = 0
+
+        self._snapshot = None
+        # changes to the grid the snapshot hasn't taken in yet, as
+        # (x, y, blocked), and a costs snapshot to swap in, handed over to
+        # the planning thread under the lock
+        self._lock = threading.Lock()
+        self._changes = []
+        self._costs = None
+        self._costs_version = None
+        # number of changes made to the grid so far
+        self._generation = 0
+
+        self._queue = queue.Queue()
+        self._thread = None
+        grid.add_listener(self._on_tile_changed)
+
+    def request(self, start, dest, callback, algorithm='astar'):
+        """Find a path between two tiles in the background.
+
+        :param callback: Called on the main thread with the request once the
+            path is found, unless the request was cancelled first.
+        :type callback: callable
+        :param algorithm: One of ALGORITHMS.
+        :type algorithm: str
+        :rtype: PlanRequest
+        """
+        if algorithm not in ALGORITHMS:
+            raise ValueError('Unknown path finding algorithm "{}", use one of {}'.format(algorithm, ALGORITHMS))
+        with self._lock:
+            if self._snapshot is None:
+                # a copy only the planning thread changes, unlike
+                # CollisionGrid.snapshot which can't be changed at all
+                grid = CollisionGrid(self.grid.width, self.grid.height, bytearray(self.grid.cells))
+                costs = self.costs.snapshot() if self.costs is not None else None
+                self._snapshot = GridSearches(grid, self.hpa_cluster_size, costs)
+                self._changes = []
+                self._costs_version = costs.version if costs is not None else None
+            elif self.costs is not None and self.costs.version != self._costs_version:
+                self._costs = self.costs.snapshot()
+                self._costs_version = self._costs.version
+
+        request = PlanRequest(tuple(start), tuple(dest), algorithm, callback, self._snapshot)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._plan_loop, name='PathPlanner')
+            self._thread.daemon = True
+            self._thread.start()
+        self._queue.put(request)
+        return request
+
+    def is_current(self, request):
+        """Check that the grid hasn't changed since the request's snapshot.
+        :rtype: bool
+        """
+        if self.costs is not None and request.costs_version != self.costs.version:
+            return False
+        return request.generation == self._generation
+
+    def close(self):
+        """Stop following the grid and stop the planning thread."""
+        self.grid.remove_listener(self._on_tile_changed)
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread = None
+
+    def _on_tile_changed(self, x, y, blocked):
+        with self._lock:
+            self._generation += 1
+            if self._snapshot is not None:
+                self._changes.append((x, y, blocked))
+
+    def _update_snapshot(self, snapshot):
+        """Take the changes to the grid in, on the planning thread. The
+        searches built on the snapshot's grid patch themselves through its
+        listeners.
+        :return: The number of grid changes the snapshot is up to date with.
+        """
+        with self._lock:
+            changes, self._changes = self._changes, []
+            costs, self._costs = self._costs, None
+            generation = self._generation
+        for x, y, blocked in changes:
+            snapshot.grid.set_blocked(x, y, blocked)
+        if costs is not None:
+            snapshot.costs = costs
+        return generation
+
+    def _plan_loop(self):
+        while True:
+            request = self._queue.get()
+            if request is None:
+                return
+            if request.cancelled:
+                self.cancelled += 1
+                continue
+
+            snapshot = request.snapshot
+            try:
+                request.generation = self._update_snapshot(snapshot)
+                request.costs_version = snapshot.costs.version if snapshot.costs is not None else None
+                request.path = snapshot.find_path(request.algorithm, request.start, request.dest)
+            except Exception:
+                # a search that fails mustn't take the thread and every
+                # request after it down with it
+                Logger.exception('PathPlanner: searching {} to {} failed'.format(request.start, request.dest))
+                request.path = []
+                self.failed += 1
+            Clock.schedule_once(lambda dt, request=request: self._deliver(request))
+
+    def _deliver(self, request):
+        if request.cancelled:
+            self.cancelled += 1
+            return
+
+        # the grid changed while searching, a path it blocked is searched for
+        # again on the snapshot as it is now
+        if request.path and not self.is_current(request):
+            grid = self.grid
+            if not all(grid.is_walkable(x, y) for x, y in request.path[1:]):
+                self.replanned += 1
+                self._queue.put(request)
+                return
+
+        self.planned += 1
+        request.callback(request)
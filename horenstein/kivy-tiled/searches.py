@@ -0,0 +1,45 @@
+"""The find_path algorithms behind one interface, for code that searches a
+grid of its own, like the planning thread and the batch worker processes.
+"""
+from hpa import HierarchicalPathfinder
+from jps import JumpPointSearch
+from pathfinding import astar
+
+ALGORITHMS = ('astar', 'jps', 'hpa')
+
+
+class GridSearches(object):
+    """Runs any of ALGORITHMS on a grid, building the jump tables and
+    clusters the first time they're needed.
+
+    :type grid: CollisionGrid
+    :param hpa_cluster_size: Cluster size of the 'hpa' algorithm.
+    :type hpa_cluster_size: int
+    :param costs: Tile costs of the 'astar' algorithm, the others treat every
+        tile as costing the same.
+    :type costs: CostGrid
+    """
+
+    def __init__(self, grid, hpa_cluster_size=16, costs=None):
+        self.grid = grid
+        self.hpa_cluster_size = hpa_cluster_size
+        self.costs = costs
+        self._searches = {}
+
+    def find_path(self, algorithm, start, dest):
+        """Find a path between two tiles.
+        :rtype: list
+        """
+        if algorithm == 'astar':
+            return astar(self.grid, start, dest, costs=self.costs)
+
+        search = self._searches.get(algorithm)
+        if search is None:
+            if algorithm == 'jps':
+                search = JumpPointSearch(self.grid)
+            elif algorithm == 'hpa':
+                search = HierarchicalPathfinder(self.grid, self.hpa_cluster_size)
+            else:
+                raise ValueError('Unknown path finding algorithm "{}", use one of {}'.format(algorithm, ALGORITHMS))
+            self._searches[algorithm] = search
+        return search.find_path(start, dest)
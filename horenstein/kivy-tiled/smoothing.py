@@ -0,0 +1,144 @@
+"""Smoothing tile paths into straight lines.
+
+Paths on the grid go from tile to tile, so walking one takes a step per
+tile even down a straight corridor. String pulling keeps only the tiles the
+path has to turn at: from the tile it's on, an entity heads for the
+farthest tile further along the path it can walk to in a straight line, and
+then on from there.
+
+An entity takes up a whole tile, so a line can be walked if every tile its
+body overlaps on the way is walkable, not only the tiles the line between
+the tile centers crosses. Going diagonally between two tiles then needs the
+tiles beside the corner too, and no line cuts a corner the path went
+around.
+"""
+
+
+def line_of_sight(grid, start, dest, costs=None):
+    """Check if a tile wide entity can walk from the center of one tile to
+    the center of another in a straight line.
+    :param grid: The collision grid.
+    :type grid: CollisionGrid
+    :type start: (int, int)
+    :type dest: (int, int)
+    :param costs: Tile costs, a line then also has to stay on tiles costing
+        the same as the start so it never cuts across terrain the path went
+        around.
+    :type costs: CostGrid
+    :rtype: bool
+    """
+    for x, y in swept_tiles(start, dest):
+        if not grid.is_walkable(x, y):
+            return False
+        if costs is not None and costs.get_cost(x, y) != costs.get_cost(start[0], start[1]):
+            return False
+    return True
+
+
+def swept_tiles(start, dest):
+    """Get the tiles a tile wide entity overlaps walking from the center of
+    one tile to the center of another in a straight line.
+    :type start: (int, int)
+    :type dest: (int, int)
+    :return: Coordinate tuples of the tiles, column by column.
+    :rtype: list
+    """
+    (x0, y0), (x1, y1) = sorted((tuple(start), tuple(dest)))
+    dx, dy = x1 - x0, y1 - y0
+    if dx == 0:
+        return [(x0, y) for y in range(min(y0, y1), max(y0, y1) + 1)]
+
+    tiles = []
+    for x in range(x0, x1 + 1):
+        # the body overlaps column x while its center is less than a tile
+        # away from it, over which the center's y goes from y(x - 1) to
+        # y(x + 1); a row is overlapped when that comes less than a tile
+        # from it. y(x) = (y0 * dx + (x - x0) * dy) / dx, kept in integers
+        first = y0 * dx + (max(x - 1, x0) - x0) * dy
+        last = y0 * dx + (min(x + 1, x1) - x0) * dy
+        low, high = min(first, last), max(first, last)
+        for y in range(low // dx, -(-high // dx) + 1):
+            tiles.append((x, y))
+    return tiles
+
+
+def sweep_order(start, dest):
+    """Get the tiles swept_tiles gives in the order a tile wide entity
+    walking the line comes to overlap them.
+    :type start: (int, int)
+    :type dest: (int, int)
+    :return: Tuples of how far along the line, from 0 to 1, the entity first
+        touches each tile and the tile's coordinate tuple.
+    :rtype: list
+    """
+    (x0, y0), (x1, y1) = start, dest
+    entries = []
+    for tile in swept_tiles(start, dest):
+        entry = 0.0
+        for begin, end, at in ((x0, x1, tile[0]), (y0, y1, tile[1])):
+            # along each axis the body touches the tile once the center is a
+            # tile away from it
+            if begin != end:
+                length = float(end - begin)
+                entry = max(entry, min((at - 1 - begin) / length, (at + 1 - begin) / length))
+        entries.append((entry, tile))
+    entries.sort()
+    return entries
+
+
+def farthest_visible(grid, start, path, costs=None):
+    """Find how far along a path an entity on a tile can walk in a straight
+    line, with every tile of the path up to there in line of sight too.
+    :param start: The tile the entity is on, next to path[0].
+    :type start: (int, int)
+    :param path: Coordinate tuples of the tiles still to walk.
+    :type path: list
+    :param costs: See line_of_sight.
+    :type costs: CostGrid
+    :return: The index in path of the tile to head for, 0 when only the next
+        tile is.
+    :rtype: int
+    """
+    start = tuple(start)
+    if not path or not line_of_sight(grid, start, path[0], costs):
+        return 0
+
+    # down a straight run the line covers the tiles of the run and nothing
+    # else, so only the next tile of it needs looking at each time
+    step = (path[0][0] - start[0], path[0][1] - start[1])
+    cost = costs.get_cost(start[0], start[1]) if costs is not None else None
+    index = 0
+    while index + 1 < len(path):
+        x, y = path[index + 1]
+        if (x - path[index][0], y - path[index][1]) != step or not grid.is_walkable(x, y):
+            break
+        if costs is not None and costs.get_cost(x, y) != cost:
+            break
+        index += 1
+
+    while index + 1 < len(path) and line_of_sight(grid, start, path[index + 1], costs):
+        index += 1
+    return index
+
+
+def smooth_path(grid, path, costs=None):
+    """Pull a path of tiles straight, keeping the tiles it turns at.
+    :param path: Coordinate tuples of the tiles from start to dest, as
+        find_path returns them.
+    :type path: list
+    :param costs: See line_of_sight.
+    :type costs: CostGrid
+    :return: Coordinate tuples of the start, the turns and dest, each in a
+        straight line of sight of the one before.
+    :rtype: list
+    """
+    if len(path) < 2:
+        return list(path)
+
+    smoothed = [tuple(path[0])]
+    index = 1
+    while index < len(path):
+        index += farthest_visible(grid, smoothed[-1], path[index:], costs)
+        smoothed.append(tuple(path[index]))
+        index += 1
+    return smoothed
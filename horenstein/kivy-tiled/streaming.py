@@ -0,0 +1,204 @@
+"""Chunk streamed layer data for maps too big to keep in memory.
+
+A streaming KivyTiledMap leaves its layers in the compiled copy of the map
+(see mapcache) and reads them in square chunks as they're needed. Chunks
+around the view and around moving entities are prefetched on a background
+thread, and the least recently used ones are dropped once the chunks in
+memory go over a budget.
+"""
+import array
+import collections
+import queue
+import threading
+
+from mapcache import GID_TYPECODE
+
+
+class ChunkStreamer(object):
+    """Loads the layers of a compiled map chunk by chunk.
+
+    :param layer_gids: One flat, row-major view of the gids of each layer.
+    :type layer_gids: list
+    """
+
+    def __init__(self, layer_gids, width, height, chunk_size=64, max_bytes=32 * 1024 * 1024):
+        self.width = width
+        self.height = height
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+        self.chunk_bytes = chunk_size * chunk_size * array.array(GID_TYPECODE).itemsize
+
+        # chunks loaded on the calling thread because they weren't prefetched
+        self.sync_loads = 0
+        self.prefetched = 0
+        self.evictions = 0
+
+        self._layer_gids = layer_gids
+        # (layer index, chunk x, chunk y) to the chunk's gids, least recently used first
+        self._chunks = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._thread = None
+
+    def get_gid(self, layer_index, x, y):
+        size = self.chunk_size
+        chunk = self.get_chunk(layer_index, x // size, y // size)
+        return chunk[(y % size) * size + x % size]
+
+    def set_gid(self, layer_index, x, y, gid):
+        """Change a gid, in the loaded chunk if there is one and in the
+        compiled map so it survives the chunk being evicted.
+        """
+        size = self.chunk_size
+        key = (layer_index, x // size, y // size)
+        with self._lock:
+            self._layer_gids[layer_index][y * self.width + x] = gid
+            chunk = self._chunks.get(key)
+            if chunk is not None:
+                chunk[(y % size) * size + x % size] = gid
+
+    def get_chunk(self, layer_index, chunk_x, chunk_y):
+        """Get the gids of a chunk as a flat, row-major array of
+        chunk_size x chunk_size, loading it right away if it isn't yet.
+        :rtype: array.array
+        """
+        key = (layer_index, chunk_x, chunk_y)
+        with self._lock:
+            chunk = self._chunks.get(key)
+            if chunk is not None:
+                self._chunks.move_to_end(key)
+                return chunk
+
+        self.sync_loads += 1
+        return self._load(key)
+
+    def prefetch(self, x0, y0, x1, y1):
+        """Load the chunks covering the tiles from x0,y0 to x1,y1 (inclusive)
+        of every layer on the background thread.
+        """
+        size = self.chunk_size
+        first_x, last_x = max(0, x0) // size, min(self.width - 1, x1) // size
+        first_y, last_y = max(0, y0) // size, min(self.height - 1, y1) // size
+
+        with self._lock:
+            keys = [
+                (layer_index, chunk_x, chunk_y)
+                for layer_index in range(len(self._layer_gids))
+                for chunk_y in range(first_y, last_y + 1)
+                for chunk_x in range(first_x, last_x + 1)
+            ]
+            keys = [key for key in keys if key not in self._chunks and key not in self._pending]
+            self._pending.update(keys)
+
+        if not keys:
+            return
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._prefetch_loop, name='ChunkStreamer')
+            self._thread.daemon = True
+            self._thread.start()
+        for key in keys:
+            self._queue.put(key)
+
+    def iter_rows(self, layer_index):
+        """Read a whole layer once, such as to build a lookup from it, row
+        by row straight out of the compiled map instead of loading its
+        chunks.
+        :return: Iterator of flat views of the gids of each row.
+        """
+        gids, width = self._layer_gids[layer_index], self.width
+        for y in range(self.height):
+            yield gids[y * width:(y + 1) * width]
+
+    def loaded_bytes(self):
+        return len(self._chunks) * self.chunk_bytes
+
+    def close(self):
+        """Stop the prefetch thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread = None
+
+    def _prefetch_loop(self):
+        while True:
+            key = self._queue.get()
+            if key is None:
+                return
+            self._load(key)
+            self.prefetched += 1
+
+    def _load(self, key):
+        layer_index, chunk_x, chunk_y = key
+        size = self.chunk_size
+        gids = self._layer_gids[layer_index]
+
+        # copy the rows of the chunk out of the compiled map, padding the
+        # chunks on the right and bottom edges of the map with empty tiles
+        chunk = array.array(GID_TYPECODE, bytes(self.chunk_bytes))
+        x0 = chunk_x * size
+        x1 = min(x0 + size, self.width)
+        for row in range(min(size, self.height - chunk_y * size)):
+            start = (chunk_y * size + row) * self.width
+            row_gids = array.array(GID_TYPECODE)
+            row_gids.frombytes(gids[start + x0:start + x1].cast('B'))
+            chunk[row * size:row * size + x1 - x0] = row_gids
+
+        with self._lock:
+            self._pending.discard(key)
+            # another thread may have beaten us to it
+            loaded = self._chunks.get(key)
+            if loaded is not None:
+                return loaded
+            self._chunks[key] = chunk
+            self._evict()
+        return chunk
+
+    def _evict(self):
+        while len(self._chunks) > 1 and len(self._chunks) * self.chunk_bytes > self.max_bytes:
+            self._chunks.popitem(last=False)
+            self.evictions += 1
+
+
+class StreamedLayerData(object):
+    """Stands in for the ``data`` of a pytmx layer, so ``data[y][x]`` reads
+    and writes go through a ChunkStreamer.
+    """
+
+    def __init__(self, streamer, layer_index):
+        self.streamer = streamer
+        self.layer_index = layer_index
+        self._rows = [StreamedRow(self, y) for y in range(streamer.height)]
+
+    def __getitem__(self, y):
+        return self._rows[y]
+
+    def __len__(self):
+        return self.streamer.height
+
+    def __iter__(self):
+        return iter(self._rows)
+
+
+class StreamedRow(object):
+    def __init__(self, data, y):
+        self.streamer = data.streamer
+        self.layer_index = data.layer_index
+        self.y = y
+
+    def __getitem__(self, x):
+        if x < 0:
+            x += self.streamer.width
+        if not 0 <= x < self.streamer.width:
+            raise IndexError('tile x {} out of range'.format(x))
+        return self.streamer.get_gid(self.layer_index, x, self.y)
+
+    def __setitem__(self, x, gid):
+        self.streamer.set_gid(self.layer_index, x, self.y, gid)
+
+    def __len__(self):
+        return self.streamer.width
+
+    def __iter__(self):
+        for x in range(self.streamer.width):
+            yield self.streamer.get_gid(self.layer_index, x, self.y)
@@ -0,0 +1,215 @@
+"""Maps made from strings for the tests.
+
+Each string is a row of tiles: '.' for walkable and '#' for collidable
+tiles, a digit for a walkable tile costing that much to step onto and 'S'
+for a walkable tile with the SpawnPoint property.
+"""
+import collections
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+# make the modules next to tiled.py importable when running from test/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pathfinding
+from components import ComponentLabels
+from grid import CollisionGrid, CostGrid
+from path_cache import PathCache
+from tiled import KivyTiledMap
+
+# the gids the tiles of a row are written to a .tmx with, see write_tmx;
+# pytmx numbers them again as it loads, see pytmx_gid
+FLOOR_GID = 1
+WALL_GID = 2
+SPAWN_GID = 3
+COST_GIDS = dict((str(cost), 2 + cost) for cost in range(2, 10))
+
+
+def make_grid(rows):
+    """A CollisionGrid from rows of tiles."""
+    cells = bytearray(1 if tile == '#' else 0 for row in rows for tile in row)
+    return CollisionGrid(len(rows[0]), len(rows), cells)
+
+
+def make_costs(rows):
+    """A CostGrid from rows of tiles, every tile but the digits costing 1."""
+    grid = CostGrid(len(rows[0]), len(rows))
+    for y, row in enumerate(rows):
+        for x, tile in enumerate(row):
+            if tile.isdigit():
+                grid.set_cost(x, y, float(tile))
+    return grid
+
+
+def bfs_distances(grid, start):
+    """The steps from a tile to every tile reachable from it, the reference
+    the searches are checked against.
+    :return: Dictionary of coordinate tuple to steps.
+    :rtype: dict
+    """
+    distances = {start: 0}
+    queue = collections.deque([start])
+    while queue:
+        tile = queue.popleft()
+        for adjacent in grid.neighbors(*tile):
+            if adjacent not in distances:
+                distances[adjacent] = distances[tile] + 1
+                queue.append(adjacent)
+    return distances
+
+
+def dense_astar(grid, start, dest, **kwargs):
+    """astar searching with the arrays it keeps for big grids, whatever the
+    size of the grid.
+    """
+    min_tiles = pathfinding.DENSE_SEARCH_MIN_TILES
+    pathfinding.DENSE_SEARCH_MIN_TILES = 0
+    try:
+        return pathfinding.astar(grid, start, dest, **kwargs)
+    finally:
+        pathfinding.DENSE_SEARCH_MIN_TILES = min_tiles
+
+
+def is_walkable_path(grid, path):
+    """Check that every tile of a path is walkable and next to the one
+    before it.
+    :rtype: bool
+    """
+    for index, (x, y) in enumerate(path):
+        if not grid.is_walkable(x, y):
+            return False
+        if index and abs(x - path[index - 1][0]) + abs(y - path[index - 1][1]) != 1:
+            return False
+    return True
+
+
+def path_cost(costs, path):
+    """The cost of walking a path, every tile but the first one paying its
+    cost.
+    :type costs: CostGrid
+    :rtype: float
+    """
+    return sum(costs.get_cost(x, y) for x, y in path[1:])
+
+
+class GridMap(object):
+    """The parts of a KivyTiledMap that find_path and MovementSystem use, on
+    a grid made from rows of tiles.
+    """
+
+    def __init__(self, rows):
+        self.grid = make_grid(rows)
+        self.width, self.height = self.grid.width, self.grid.height
+        self.components = ComponentLabels(self.grid)
+        self.path_cache = PathCache(self.grid)
+
+    def get_collision_grid(self):
+        return self.grid
+
+    def get_cost_grid(self):
+        return None
+
+    def is_reachable(self, start_x, start_y, dest_x, dest_y):
+        return self.components.is_connected((start_x, start_y), (dest_x, dest_y))
+
+    def get_path_cache(self, algorithm='astar'):
+        return self.path_cache
+
+
+class GridTileMap(object):
+    """The parts of a TileMap that MovementSystem uses."""
+    scaled_tile_size = (32, 32)
+
+    def __init__(self, tiled_map):
+        self.tiled_map = tiled_map
+        self.tile_map_size = (tiled_map.width, tiled_map.height)
+
+
+class ImagelessTiledMap(KivyTiledMap):
+    """A KivyTiledMap that doesn't load its tile images, which takes a
+    window, and keeps its compiled copies next to the .tmx file.
+    """
+
+    def __init__(self, map_file_path, *args, **kwargs):
+        self.map_cache_dir = os.path.dirname(map_file_path)
+        super(ImagelessTiledMap, self).__init__(map_file_path, *args, **kwargs)
+
+    def loadTileImages(self, ts):
+        pass
+
+
+def pytmx_gid(tiled_map, gid):
+    """The gid pytmx gave a tile of a .tmx file, for set_tile_gid.
+    :param gid: One of the gids the tiles are written with, see write_tmx.
+    :rtype: int
+    """
+    return tiled_map.register_gid(gid) if gid else 0
+
+
+def write_tmx(map_file_path, rows):
+    """Write a map of rows of tiles to a .tmx file, a Ground layer of floor
+    tiles under a Meta layer of the tiles of the rows, with the properties
+    KivyTiledMap reads.
+    """
+    width, height = len(rows[0]), len(rows)
+    tiles = [
+        '  <tile id="{}"><properties><property name="Collidable" value="True"/></properties></tile>'.format(
+            WALL_GID - 1),
+        '  <tile id="{}"><properties><property name="SpawnPoint" value="True"/></properties></tile>'.format(
+            SPAWN_GID - 1),
+    ]
+    for cost, gid in sorted(COST_GIDS.items()):
+        tiles.append('  <tile id="{}"><properties><property name="Cost" value="{}"/></properties></tile>'.format(
+            gid - 1, cost))
+
+    gids = {'.': 0, '#': WALL_GID, 'S': SPAWN_GID}
+    meta = []
+    for row in rows:
+        meta.append(','.join(str(gids[tile] if tile in gids else COST_GIDS[tile]) for tile in row))
+
+    with open(map_file_path, 'w') as map_file:
+        map_file.write('\n'.join([
+            '<?xml version="1.0" encoding="UTF-8"?>',
+            '<map version="1.0" orientation="orthogonal" width="{0}" height="{1}" tilewidth="32" tileheight="32">'.format(
+                width, height),
+            ' <tileset firstgid="1" name="tiles" tilewidth="32" tileheight="32">',
+            '  <image source="tiles.png" width="128" height="128"/>',
+        ] + tiles + [
+            ' </tileset>',
+            ' <layer name="Ground" width="{}" height="{}">'.format(width, height),
+            '  <data encoding="csv">',
+            ',\n'.join([','.join([str(FLOOR_GID)] * width)] * height),
+            '  </data>',
+            ' </layer>',
+            ' <layer name="Meta" width="{}" height="{}">'.format(width, height),
+            '  <data encoding="csv">',
+            ',\n'.join(meta),
+            '  </data>',
+            ' </layer>',
+            '</map>',
+            '',
+        ]))
+
+
+class MapTestCase(unittest.TestCase):
+    """Writes the maps of each test to a directory of its own."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_map(self, rows, name='map.tmx'):
+        """Write rows of tiles to a .tmx file, see write_tmx.
+        :return: The path of the file.
+        :rtype: str
+        """
+        map_file_path = os.path.join(self.directory, name)
+        write_tmx(map_file_path, rows)
+        return map_file_path
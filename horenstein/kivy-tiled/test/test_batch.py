@@ -0,0 +1,99 @@
+import random
+import unittest
+
+# first, it makes the modules next to tiled.py importable
+from helpers import bfs_distances, is_walkable_path, make_costs, make_grid, path_cost
+
+from batch import BatchPlanner
+
+ROWS = [
+    '.........#..',
+    '.#######.#..',
+    '.#.....#....',
+    '.#.###.#.##.',
+    '...#...#..#.',
+    '####.###..#.',
+    '.........#..',
+]
+
+
+class BatchPlannerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.grid = make_grid(ROWS)
+        cls.planner = BatchPlanner(cls.grid, workers=2, hpa_cluster_size=4)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.planner.close()
+
+    def setUp(self):
+        self.grid.update_cells(make_grid(ROWS).cells)
+
+    def pairs(self, count, seed=0):
+        rng = random.Random(seed)
+        tiles = [(x, y) for y in range(self.grid.height) for x in range(self.grid.width) if self.grid.is_walkable(x, y)]
+        return [(rng.choice(tiles), rng.choice(tiles)) for _ in range(count)]
+
+    def check(self, pairs, paths, shortest=True):
+        self.assertEqual(len(paths), len(pairs))
+        for (start, dest), path in zip(pairs, paths):
+            distance = bfs_distances(self.grid, start).get(dest)
+            if distance is None:
+                self.assertEqual(path, [])
+                continue
+            self.assertEqual((path[0], path[-1]), (start, dest))
+            self.assertTrue(is_walkable_path(self.grid, path))
+            if shortest:
+                self.assertEqual(len(path) - 1, distance)
+            else:
+                self.assertGreaterEqual(len(path) - 1, distance)
+
+    def test_paths_in_the_order_asked(self):
+        pairs = self.pairs(60)
+        for algorithm in ('astar', 'jps', 'hpa'):
+            self.check(pairs, self.planner.find_paths(pairs, algorithm, chunk_size=7), algorithm != 'hpa')
+
+    def test_changes_reach_the_workers(self):
+        pairs = [((0, 6), (8, 6)), ((0, 0), (4, 4))]
+        self.check(pairs, self.planner.find_paths(pairs, 'jps'))
+
+        # the short way along the bottom row is cut off, and the room in the
+        # middle walled off
+        self.grid.set_blocked(6, 6, True)
+        self.grid.set_blocked(4, 5, True)
+        self.grid.set_blocked(1, 4, True)
+        paths = self.planner.find_paths(pairs, 'jps')
+        self.check(pairs, paths)
+        self.assertNotIn((6, 6), paths[0])
+        self.assertEqual(paths[1], [])
+
+    def test_nothing_to_find(self):
+        self.assertEqual(self.planner.find_paths([]), [])
+
+    def test_unknown_algorithm(self):
+        with self.assertRaises(ValueError):
+            self.planner.find_paths([((0, 0), (1, 0))], 'dijkstra')
+
+
+class WeightedBatchTest(unittest.TestCase):
+    def test_costs_reach_the_workers(self):
+        costs = make_costs([
+            '.999.',
+            '.....',
+            '.....',
+        ])
+        planner = BatchPlanner(make_grid(['.....'] * 3), workers=1, costs=costs)
+        self.addCleanup(planner.close)
+
+        path, = planner.find_paths([((0, 0), (4, 0))])
+        self.assertEqual(path_cost(costs, path), 6)
+
+        # the way along the middle row gets dearer than the bottom one
+        costs.set_cost(2, 1, 9)
+        path, = planner.find_paths([((0, 0), (4, 0))])
+        self.assertEqual(path_cost(costs, path), 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+
+import pytmx
+
+# first, it makes the modules next to tiled.py importable
+from helpers import WALL_GID, ImagelessTiledMap, MapTestCase, make_grid, pytmx_gid
+
+from grid import build_neighbor_masks
+
+ROWS = [
+    '..#....',
+    '.S#.2#.',
+    '...#...',
+    '#......',
+]
+
+
+class CollisionGridTest(unittest.TestCase):
+    def test_neighbor_masks_follow_set_blocked(self):
+        grid = make_grid(ROWS)
+        grid.neighbor_masks()
+        for x, y, blocked in ((1, 1, True), (2, 0, False), (6, 3, True), (0, 3, False), (3, 2, False)):
+            grid.set_blocked(x, y, blocked)
+            self.assertEqual(grid.neighbor_masks(), build_neighbor_masks(grid.width, grid.height, grid.cells))
+
+    def test_listeners_hear_of_changes_only(self):
+        grid = make_grid(ROWS)
+        changes = []
+        grid.add_listener(lambda *change: changes.append(change))
+        grid.set_blocked(2, 0, True)
+        grid.set_blocked(0, 0, True)
+        grid.set_blocked(0, 0, False)
+        self.assertEqual(changes, [(0, 0, True), (0, 0, False)])
+
+    def test_neighbors(self):
+        grid = make_grid(ROWS)
+        self.assertEqual(grid.neighbors(1, 0), [(1, 1), (0, 0)])
+        self.assertEqual(grid.neighbors(3, 1), [(3, 0), (4, 1)])
+        self.assertEqual(grid.neighbors(-1, 0), [(0, 0)])
+
+
+class KivyTiledMapCollisionTest(MapTestCase):
+    def setUp(self):
+        super(KivyTiledMapCollisionTest, self).setUp()
+        map_file_path = self.write_map(ROWS)
+        self.tiled_map = ImagelessTiledMap(map_file_path, use_cache=False)
+        self.parsed = pytmx.TiledMap(map_file_path)
+        self.meta = self.parsed.layers.index(self.parsed.get_layer_by_name('Meta'))
+
+    def has_property(self, x, y, property_name):
+        properties = self.parsed.get_tile_properties(x, y, self.meta)
+        return bool(properties) and property_name in properties
+
+    def test_valid_move_matches_the_tile_properties(self):
+        for y in range(len(ROWS)):
+            for x in range(len(ROWS[0])):
+                self.assertEqual(self.tiled_map.valid_move(x, y), not self.has_property(x, y, 'Collidable'), (x, y))
+
+    def test_valid_move_out_of_bounds(self):
+        for x, y in ((-1, 0), (0, -1), (7, 0), (0, 4)):
+            self.assertFalse(self.tiled_map.valid_move(x, y))
+
+    def test_tile_has_property_matches_the_tile_properties(self):
+        for property_name in ('Collidable', 'SpawnPoint', 'Cost'):
+            for y in range(len(ROWS)):
+                for x in range(len(ROWS[0])):
+                    self.assertEqual(
+                        self.tiled_map.tile_has_property(x, y, property_name),
+                        self.has_property(x, y, property_name), (x, y, property_name))
+
+    def test_set_tile_gid_updates_the_grid(self):
+        self.tiled_map.set_tile_gid(0, 0, pytmx_gid(self.tiled_map, WALL_GID))
+        self.assertFalse(self.tiled_map.valid_move(0, 0))
+        self.assertTrue(self.tiled_map.tile_has_property(0, 0, 'Collidable'))
+
+        self.tiled_map.set_tile_gid(2, 0, 0)
+        self.assertTrue(self.tiled_map.valid_move(2, 0))
+        self.assertFalse(self.tiled_map.tile_has_property(2, 0, 'Collidable'))
+
+    def test_set_collidable_keeps_the_tile(self):
+        self.tiled_map.set_collidable(1, 1)
+        self.assertFalse(self.tiled_map.valid_move(1, 1))
+        self.assertTrue(self.tiled_map.tile_has_property(1, 1, 'SpawnPoint'))
+
+        self.tiled_map.set_collidable(1, 1, False)
+        self.assertTrue(self.tiled_map.valid_move(1, 1))
+
+    def test_replacing_the_layer_data_rebuilds_the_grid(self):
+        layer = self.tiled_map.get_layer_by_name('Meta')
+        layer.data = [[pytmx_gid(self.tiled_map, WALL_GID)] * len(ROWS[0]) for _ in ROWS]
+        self.assertFalse(self.tiled_map.valid_move(0, 0))
+        self.assertEqual(sum(self.tiled_map.get_collision_grid().cells), len(ROWS) * len(ROWS[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import random
+import unittest
+
+# first, it makes the modules next to tiled.py importable
+from helpers import ImagelessTiledMap, MapTestCase, bfs_distances, make_grid
+
+from components import BLOCKED, ComponentLabels
+
+ROWS = [
+    '....#.....',
+    '.##.#.###.',
+    '.#..#...#.',
+    '.#.####.#.',
+    '...#..#...',
+    '####..####',
+    '..........',
+]
+
+
+def bfs_components(grid):
+    """The tiles of each connected component, found with a BFS from every
+    walkable tile not reached yet.
+    """
+    found = set()
+    components = []
+    for y in range(grid.height):
+        for x in range(grid.width):
+            if grid.is_walkable(x, y) and (x, y) not in found:
+                component = set(bfs_distances(grid, (x, y)))
+                found.update(component)
+                components.append(sorted(component))
+    return sorted(components)
+
+
+def labelled_components(labels):
+    """The tiles of each connected component, whatever their labels."""
+    grid = labels.grid
+    tiles = {}
+    for y in range(grid.height):
+        for x in range(grid.width):
+            label = labels.label(x, y)
+            if label != BLOCKED:
+                tiles.setdefault(label, []).append((x, y))
+    return sorted(sorted(component) for component in tiles.values())
+
+
+class ComponentLabelsTest(unittest.TestCase):
+    def setUp(self):
+        self.grid = make_grid(ROWS)
+        self.labels = ComponentLabels(self.grid)
+        self.addCleanup(self.labels.close)
+
+    def assertMatchesBfs(self):
+        expected = bfs_components(self.grid)
+        self.assertEqual(labelled_components(self.labels), expected)
+        self.assertEqual(self.labels.component_count(), len(expected))
+        for component in expected:
+            label = self.labels.label(*component[0])
+            self.assertEqual(self.labels.sizes[label], len(component))
+            xs, ys = [x for x, y in component], [y for x, y in component]
+            self.assertEqual(self.labels.bounds(label), (min(xs), min(ys), max(xs), max(ys)))
+
+    def test_labels_at_creation(self):
+        self.assertMatchesBfs()
+        self.assertEqual(self.labels.component_count(), 3)
+        self.assertEqual(self.labels.label(1, 1), BLOCKED)
+        self.assertEqual(self.labels.label(-1, 0), BLOCKED)
+
+    def test_is_connected(self):
+        self.assertTrue(self.labels.is_connected((0, 0), (2, 2)))
+        self.assertTrue(self.labels.is_connected((4, 4), (0, 6)))
+        self.assertFalse(self.labels.is_connected((0, 0), (9, 6)))
+        # off a collidable tile onto its neighbors
+        self.assertTrue(self.labels.is_connected((1, 1), (0, 0)))
+        self.assertTrue(self.labels.is_connected((1, 1), (1, 1)))
+        self.assertFalse(self.labels.is_connected((0, 0), (1, 1)))
+
+    def test_split_and_merge(self):
+        # cutting the bottom row under the room splits it in three
+        self.grid.set_blocked(4, 6, True)
+        self.grid.set_blocked(5, 6, True)
+        self.assertMatchesBfs()
+        self.assertEqual(self.labels.component_count(), 5)
+        self.assertFalse(self.labels.is_connected((0, 6), (9, 6)))
+
+        # and opening the room to both sides joins it with them
+        self.grid.set_blocked(3, 4, False)
+        self.grid.set_blocked(6, 4, False)
+        self.assertMatchesBfs()
+        self.assertEqual(self.labels.component_count(), 3)
+        self.assertTrue(self.labels.is_connected((0, 0), (9, 0)))
+        self.assertEqual(self.labels.full_updates, 1)
+
+    def test_joining_and_splitting_through_a_tile(self):
+        self.grid.set_blocked(5, 3, False)
+        self.assertMatchesBfs()
+        self.assertEqual(self.labels.component_count(), 2)
+        self.grid.set_blocked(5, 3, True)
+        self.assertMatchesBfs()
+        self.assertEqual(self.labels.component_count(), 3)
+
+    def test_random_changes(self):
+        rng = random.Random(0)
+        for _ in range(60):
+            for _ in range(rng.randint(1, 4)):
+                x, y = rng.randrange(self.grid.width), rng.randrange(self.grid.height)
+                self.grid.set_blocked(x, y, self.grid.is_walkable(x, y))
+            self.assertMatchesBfs()
+        self.assertEqual(self.labels.full_updates, 1)
+
+    def test_many_changes_label_again(self):
+        for y in range(self.grid.height):
+            for x in range(self.grid.width):
+                self.grid.set_blocked(x, y, self.grid.is_walkable(x, y))
+        self.assertMatchesBfs()
+        self.assertEqual(self.labels.full_updates, 2)
+
+
+class LoadedLabelsTest(MapTestCase):
+    def test_labels_at_load(self):
+        map_file_path = self.write_map(ROWS)
+        # the second load restores the labels from the compiled copy
+        for tiled_map in (ImagelessTiledMap(map_file_path), ImagelessTiledMap(map_file_path)):
+            grid = tiled_map.get_collision_grid()
+            labels = tiled_map.get_component_labels()
+            self.assertEqual(labelled_components(labels), bfs_components(grid))
+
+            grid.set_blocked(4, 6, True)
+            grid.set_blocked(5, 6, True)
+            grid.set_blocked(3, 4, False)
+            self.assertEqual(labelled_components(labels), bfs_components(grid))
+            self.assertFalse(tiled_map.is_reachable(0, 6, 9, 6))
+            self.assertTrue(tiled_map.is_reachable(0, 0, 4, 4))
+
+
+if __name__ == '__main__':
+    unittest.main()
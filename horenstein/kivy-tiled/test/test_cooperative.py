@@ -0,0 +1,143 @@
+import random
+import unittest
+
+# first, it makes the modules next to tiled.py importable
+from helpers import bfs_distances, make_grid
+
+from cooperative import CooperativePlanner
+
+
+class CooperativePlannerTest(unittest.TestCase):
+    def make_planner(self, rows, agents, window=16):
+        """A planner on rows of tiles with agents, a dictionary of agent id
+        to (start, dest).
+        """
+        self.grid = make_grid(rows)
+        planner = CooperativePlanner(self.grid, window=window)
+        self.addCleanup(planner.close)
+        for agent_id, (start, dest) in sorted(agents.items()):
+            planner.add_agent(agent_id, start, dest)
+        return planner
+
+    def run_steps(self, planner, steps):
+        """Plan and advance, checking every step that the agents keep to the
+        walkable tiles, move a tile at most and never meet.
+        :return: Dictionary of agent id to the tiles it was on.
+        :rtype: dict
+        """
+        positions = dict((agent_id, planner.position(agent_id)) for agent_id in planner._agents)
+        tiles = dict((agent_id, [tile]) for agent_id, tile in positions.items())
+        for _ in range(steps):
+            planner.plan()
+            new_positions = planner.advance()
+            self.assertEqual(len(set(new_positions.values())), len(new_positions), 'agents on the same tile')
+            by_tile = dict((tile, agent_id) for agent_id, tile in positions.items())
+            for agent_id, (x, y) in new_positions.items():
+                old_x, old_y = positions[agent_id]
+                self.assertTrue(self.grid.is_walkable(x, y))
+                self.assertLessEqual(abs(x - old_x) + abs(y - old_y), 1)
+                other_id = by_tile.get((x, y))
+                if other_id is not None and other_id != agent_id:
+                    self.assertNotEqual(new_positions[other_id], (old_x, old_y), 'agents swapping tiles')
+                tiles[agent_id].append((x, y))
+            positions = new_positions
+            if all(planner.is_done(agent_id) for agent_id in positions):
+                break
+        return tiles
+
+    def test_single_agent_takes_the_shortest_path(self):
+        rows = [
+            '........',
+            '.######.',
+            '........',
+        ]
+        planner = self.make_planner(rows, {0: ((0, 2), (7, 0))})
+        tiles = self.run_steps(planner, 20)
+        self.assertTrue(planner.is_done(0))
+        self.assertEqual(len(tiles[0]) - 1, bfs_distances(self.grid, (0, 2))[(7, 0)])
+
+    def test_passing_in_a_corridor_with_a_bay(self):
+        rows = [
+            '####.####',
+            '.........',
+        ]
+        planner = self.make_planner(rows, {0: ((0, 1), (8, 1)), 1: ((8, 1), (0, 1))})
+        # meeting head on, the one that stalled backs into the bay
+        tiles = self.run_steps(planner, 60)
+        self.assertTrue(planner.is_done(0))
+        self.assertTrue(planner.is_done(1))
+        self.assertIn((4, 0), tiles[0] + tiles[1])
+        self.assertEqual(planner.stalled(), [])
+
+    def test_parked_agent_steps_aside(self):
+        rows = [
+            '###.###',
+            '.......',
+        ]
+        planner = self.make_planner(rows, {0: ((3, 1), (3, 1)), 1: ((0, 1), (6, 1))})
+        self.assertTrue(planner.is_done(0))
+        tiles = self.run_steps(planner, 30)
+        self.assertTrue(planner.is_done(0))
+        self.assertTrue(planner.is_done(1))
+        self.assertIn((3, 0), tiles[0])
+
+    def test_many_agents(self):
+        rows = [
+            '............',
+            '..##....##..',
+            '..##....##..',
+            '............',
+            '....####....',
+            '............',
+            '..##....##..',
+            '............',
+        ]
+        grid = make_grid(rows)
+        walkable = [(x, y) for y in range(grid.height) for x in range(grid.width) if grid.is_walkable(x, y)]
+        rng = random.Random(0)
+        tiles = rng.sample(walkable, 24)
+        planner = self.make_planner(rows, dict((agent_id, (tiles[agent_id], tiles[12 + agent_id])) for agent_id in range(12)))
+        self.run_steps(planner, 100)
+        self.assertTrue(all(planner.is_done(agent_id) for agent_id in range(12)))
+
+    def test_tile_blocked_on_the_way(self):
+        rows = [
+            '.......',
+            '.......',
+        ]
+        planner = self.make_planner(rows, {0: ((0, 0), (6, 0))})
+        self.run_steps(planner, 2)
+        self.grid.set_blocked(4, 0, True)
+        tiles = self.run_steps(planner, 20)
+        self.assertTrue(planner.is_done(0))
+        self.assertNotIn((4, 0), tiles[0])
+
+    def test_stalled_head_on_in_a_long_corridor(self):
+        starts = {0: (0, 0), 1: (11, 0)}
+        planner = self.make_planner(['.' * 12], {0: (starts[0], starts[1]), 1: (starts[1], starts[0])}, window=4)
+        self.run_steps(planner, 60)
+        self.assertFalse(planner.is_done(0))
+        stalled = planner.stalled()
+        self.assertTrue(stalled)
+        self.assertEqual(planner.stats()['stalled'], len(stalled))
+
+        # sent somewhere else it's no longer stalled, and taken out the way
+        # clears for the other one
+        agent_id = stalled[0]
+        other_id = 1 - agent_id
+        planner.set_destination(agent_id, starts[agent_id])
+        self.assertNotIn(agent_id, planner.stalled())
+        planner.remove_agent(agent_id)
+        self.run_steps(planner, 60)
+        self.assertTrue(planner.is_done(other_id))
+        self.assertEqual(planner.stalled(), [])
+
+    def test_removed_agent_frees_its_tiles(self):
+        planner = self.make_planner(['.....'], {0: ((2, 0), (2, 0)), 1: ((0, 0), (4, 0))})
+        planner.remove_agent(0)
+        self.run_steps(planner, 10)
+        self.assertTrue(planner.is_done(1))
+
+
+if __name__ == '__main__':
+    unittest.main()
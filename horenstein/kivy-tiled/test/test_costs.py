@@ -0,0 +1,146 @@
+import heapq
+import random
+import unittest
+
+# first, it makes the modules next to tiled.py importable
+from helpers import (
+    COST_GIDS, FLOOR_GID, ImagelessTiledMap, MapTestCase, dense_astar, is_walkable_path, make_costs, make_grid,
+    path_cost, pytmx_gid)
+
+from grid import CostGrid, tile_cost
+from pathfinding import astar
+from tiled import find_path
+
+ROWS = [
+    '..........',
+    '.######...',
+    '.#....#...',
+    '.#.##.#9..',
+    '...#..#9..',
+    '.###..9...',
+    '..........',
+]
+
+
+def dijkstra_costs(grid, costs, start):
+    """The cheapest cost from a tile to every tile reachable from it, the
+    reference the weighted searches are checked against.
+    :return: Dictionary of coordinate tuple to cost.
+    :rtype: dict
+    """
+    best = {start: 0.0}
+    heap = [(0.0, start)]
+    while heap:
+        cost, tile = heapq.heappop(heap)
+        if cost > best[tile]:
+            continue
+        for adjacent in grid.neighbors(*tile):
+            adjacent_cost = cost + costs.get_cost(*adjacent)
+            if adjacent_cost < best.get(adjacent, float('inf')):
+                best[adjacent] = adjacent_cost
+                heapq.heappush(heap, (adjacent_cost, adjacent))
+    return best
+
+
+def random_rows(rng, width, height):
+    """Rows of a map with walls and tiles of random costs."""
+    return [
+        ''.join(rng.choice('......#2359') for _ in range(width))
+        for _ in range(height)
+    ]
+
+
+class WeightedSearchTest(unittest.TestCase):
+    def assertCheapest(self, grid, costs, start, dest, reference):
+        for search in (astar, dense_astar):
+            path = search(grid, start, dest, costs=costs)
+            if dest not in reference:
+                self.assertEqual(path, [])
+                continue
+            self.assertTrue(is_walkable_path(grid, path))
+            self.assertEqual((path[0], path[-1]), (start, dest))
+            self.assertAlmostEqual(path_cost(costs, path), reference[dest])
+
+    def test_prefers_the_road(self):
+        grid, costs = make_grid(['.' * 10] * 3), make_costs(['.' * 10, '.' * 2 + '9' * 6 + '.' * 2, '.' * 10])
+        path = astar(grid, (0, 1), (9, 1), costs=costs)
+        self.assertEqual(len(path) - 1, 11)
+        self.assertFalse(set(path) & set((x, 1) for x in range(2, 8)))
+
+        # plain floor everywhere else, the same as searching without costs
+        self.assertEqual(len(astar(grid, (0, 0), (9, 2), costs=costs)), len(astar(grid, (0, 0), (9, 2))))
+
+    def test_matches_dijkstra(self):
+        grid, costs = make_grid(ROWS), make_costs(ROWS)
+        tiles = [(x, y) for y in range(grid.height) for x in range(grid.width) if grid.is_walkable(x, y)]
+        for start in tiles[::4]:
+            reference = dijkstra_costs(grid, costs, start)
+            for dest in tiles[::3]:
+                self.assertCheapest(grid, costs, start, dest, reference)
+
+    def test_matches_dijkstra_on_random_maps(self):
+        rng = random.Random(0)
+        for _ in range(10):
+            rows = random_rows(rng, 16, 12)
+            grid, costs = make_grid(rows), make_costs(rows)
+            tiles = [(x, y) for y in range(grid.height) for x in range(grid.width) if grid.is_walkable(x, y)]
+            start = rng.choice(tiles)
+            reference = dijkstra_costs(grid, costs, start)
+            for dest in rng.sample(tiles, 10):
+                self.assertCheapest(grid, costs, start, dest, reference)
+
+    def test_cheaper_than_the_cheapest_tile_before(self):
+        # lowering the minimum cost keeps the distance estimates admissible
+        grid = make_grid(['.' * 8] * 3)
+        costs = make_costs(['2' * 8] * 3)
+        costs.set_cost(4, 2, 0.5)
+        costs.set_cost(5, 2, 0.5)
+        self.assertEqual(costs.minimum, 0.5)
+        self.assertCheapest(grid, costs, (0, 0), (7, 0), dijkstra_costs(grid, costs, (0, 0)))
+
+    def test_invalid_costs(self):
+        self.assertEqual(tile_cost(None), 1.0)
+        self.assertEqual(tile_cost({'Cost': '2.5'}), 2.5)
+        for cost in ('mud', 0, -1):
+            self.assertRaises(ValueError, tile_cost, {'Cost': cost})
+        self.assertRaises(ValueError, CostGrid(2, 2).set_cost, 0, 0, 0)
+
+
+class MapCostsTest(MapTestCase):
+    def test_costs_read_at_load(self):
+        tiled_map = ImagelessTiledMap(self.write_map(ROWS))
+        costs = tiled_map.get_cost_grid()
+        expected = make_costs(ROWS)
+        self.assertEqual(list(costs.costs), list(expected.costs))
+        self.assertEqual(costs.minimum, 1.0)
+
+        path = find_path(tiled_map, 9, 0, 9, 6)
+        self.assertAlmostEqual(path_cost(costs, path), dijkstra_costs(make_grid(ROWS), costs, (9, 0))[(9, 6)])
+
+    def test_map_without_costs(self):
+        # none of the tiles has the property
+        tiled_map = ImagelessTiledMap(self.write_map(ROWS))
+        tiled_map.cost_property = 'Speed'
+        self.assertIsNone(tiled_map.get_cost_grid())
+        self.assertEqual(len(find_path(tiled_map, 9, 2, 9, 6)) - 1, 4)
+
+    def test_set_tile_gid_changes_the_cost(self):
+        tiled_map = ImagelessTiledMap(self.write_map(ROWS))
+        costs = tiled_map.get_cost_grid()
+        path = find_path(tiled_map, 9, 2, 9, 6)
+        self.assertEqual(len(path) - 1, 4)
+
+        # mud on the straight way, the cached path is dropped
+        tiled_map.set_tile_gid(9, 4, pytmx_gid(tiled_map, COST_GIDS['9']))
+        self.assertEqual(costs.get_cost(9, 4), 9.0)
+        path = find_path(tiled_map, 9, 2, 9, 6)
+        self.assertNotIn((9, 4), path)
+        self.assertEqual(path_cost(costs, path), 6)
+
+        tiled_map.set_tile_gid(9, 4, pytmx_gid(tiled_map, FLOOR_GID))
+        self.assertEqual(costs.get_cost(9, 4), 1.0)
+        self.assertEqual(len(find_path(tiled_map, 9, 2, 9, 6)) - 1, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import random
+import unittest
+
+# first, it makes the modules next to tiled.py importable
+from helpers import bfs_distances, is_walkable_path, make_grid
+
+from dstar import DStarLite
+
+ROWS = [
+    '............',
+    '.####.#####.',
+    '.#........#.',
+    '.#.######.#.',
+    '.#.#....#.#.',
+    '...#.##.#...',
+    '####.##.####',
+    '............',
+]
+
+
+class DStarLiteTest(unittest.TestCase):
+    def setUp(self):
+        self.grid = make_grid(ROWS)
+
+    def search(self, start, dest):
+        search = DStarLite(self.grid, start, dest)
+        self.addCleanup(search.close)
+        return search
+
+    def assertShortest(self, search):
+        path = search.find_path()
+        steps = bfs_distances(self.grid, search.start).get(search.dest)
+        if steps is None:
+            self.assertEqual(path, [])
+        else:
+            self.assertEqual(len(path) - 1, steps)
+            self.assertEqual((path[0], path[-1]), (search.start, search.dest))
+            self.assertTrue(is_walkable_path(self.grid, path))
+        return path
+
+    def test_first_search(self):
+        search = self.search((0, 7), (5, 4))
+        self.assertEqual(len(self.assertShortest(search)), 9)
+        self.assertEqual(len(self.assertShortest(self.search((0, 0), (2, 4)))), 9)
+
+    def test_repairs_after_an_edge_changes(self):
+        search = self.search((0, 7), (5, 4))
+        self.assertShortest(search)
+        expansions = search.expansions
+
+        # the short way in through the bottom gets closed
+        self.grid.set_blocked(4, 6, True)
+        self.assertTrue(search.has_changes())
+        path = self.assertShortest(search)
+        self.assertFalse(search.has_changes())
+        self.assertNotIn((4, 6), path)
+
+        # then the long way too, walling the destination in
+        self.grid.set_blocked(7, 6, True)
+        self.assertEqual(self.assertShortest(search), [])
+
+        # and the short way opened again
+        self.grid.set_blocked(4, 6, False)
+        self.assertEqual(len(self.assertShortest(search)), 9)
+        self.assertGreater(search.expansions, expansions)
+
+    def test_walking_while_tiles_change(self):
+        rng = random.Random(0)
+        tiles = [(x, y) for y in range(self.grid.height) for x in range(self.grid.width)]
+        for seed in range(20):
+            rng.seed(seed)
+            grid = self.grid = make_grid(ROWS)
+            start, dest = rng.sample([tile for tile in tiles if grid.is_walkable(*tile)], 2)
+            search = self.search(start, dest)
+            path = self.assertShortest(search)
+            while len(path) > 1:
+                search.move_to(path[1])
+                # tiles get blocked and cleared anywhere but under the agent
+                for _ in range(rng.randint(0, 3)):
+                    tile = rng.choice(tiles)
+                    if tile not in (search.start, search.dest):
+                        grid.set_blocked(tile[0], tile[1], grid.is_walkable(*tile))
+                path = self.assertShortest(search)
+            if path:
+                self.assertEqual(search.start, dest)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import random
+import unittest
+
+# first, it makes the modules next to tiled.py importable
+from helpers import ImagelessTiledMap, MapTestCase, bfs_distances, make_grid
+
+from flowfield import FlowField
+
+ROWS = [
+    '..........',
+    '.####.###.',
+    '.#......#.',
+    '.#.####.#.',
+    '.#.#..#...',
+    '...#..###.',
+    '.###......',
+    '..........',
+]
+
+TARGETS = [(4, 4), (9, 0)]
+
+
+def nearest_target_distances(grid, targets):
+    """The steps from every tile to the nearest target, one BFS a target."""
+    distances = {}
+    for target in targets:
+        if not grid.is_walkable(*target):
+            continue
+        for tile, steps in bfs_distances(grid, target).items():
+            distances[tile] = min(steps, distances.get(tile, steps))
+    return distances
+
+
+class FlowFieldTest(unittest.TestCase):
+    def setUp(self):
+        self.grid = make_grid(ROWS)
+        self.field = FlowField(self.grid, TARGETS)
+        self.addCleanup(self.field.close)
+
+    def assertMatchesBfs(self):
+        expected = nearest_target_distances(self.grid, self.field.targets)
+        tiles = [(x, y) for y in range(self.grid.height) for x in range(self.grid.width)]
+        for tile in tiles:
+            self.assertEqual(self.field.distance(*tile), expected.get(tile), tile)
+
+        # agents stand on walkable tiles only
+        tiles = [tile for tile in tiles if self.grid.is_walkable(*tile)]
+        steps = self.field.next_steps(tiles)
+        for tile, step in zip(tiles, steps):
+            step = tuple(int(value) for value in step)
+            if expected.get(tile, 0) == 0:
+                self.assertIsNone(self.field.next_step(*tile))
+                self.assertEqual(step, tile)
+            else:
+                self.assertEqual(self.field.next_step(*tile), step)
+                self.assertEqual(expected[step], expected[tile] - 1, tile)
+
+    def test_distances_at_creation(self):
+        self.assertMatchesBfs()
+        self.assertEqual(self.field.distance(5, 2), 6)
+        self.assertIsNone(self.field.distance(1, 1))
+        self.assertIsNone(self.field.distance(-1, 0))
+
+    def test_path_from(self):
+        path = self.field.path_from(0, 7)
+        self.assertEqual(len(path) - 1, self.field.distance(0, 7))
+        self.assertIn(path[-1], TARGETS)
+        self.assertEqual(self.field.path_from(1, 1), [])
+
+    def test_blocking_the_way_in(self):
+        # the inner corridor is left with the long way round
+        self.grid.set_blocked(5, 1, True)
+        self.grid.set_blocked(7, 4, True)
+        self.assertMatchesBfs()
+        self.assertEqual(self.field.distance(5, 2), 17)
+        self.assertEqual(self.field.incremental_updates, 2)
+
+        self.grid.set_blocked(5, 1, False)
+        self.assertMatchesBfs()
+        self.assertEqual(self.field.full_updates, 1)
+
+    def test_blocking_a_target(self):
+        self.grid.set_blocked(9, 0, True)
+        self.assertMatchesBfs()
+        self.grid.set_blocked(9, 0, False)
+        self.assertMatchesBfs()
+
+    def test_random_changes(self):
+        rng = random.Random(0)
+        for _ in range(40):
+            for _ in range(rng.randint(1, 4)):
+                x, y = rng.randrange(self.grid.width), rng.randrange(self.grid.height)
+                self.grid.set_blocked(x, y, self.grid.is_walkable(x, y))
+            self.assertMatchesBfs()
+        self.assertEqual(self.field.full_updates, 1)
+
+    def test_many_changes_search_again(self):
+        for y in range(self.grid.height):
+            for x in range(self.grid.width):
+                self.grid.set_blocked(x, y, self.grid.is_walkable(x, y))
+        self.assertMatchesBfs()
+        self.assertEqual(self.field.full_updates, 2)
+
+    def test_set_targets(self):
+        self.field.set_targets([(0, 7)])
+        self.assertMatchesBfs()
+        self.assertEqual(self.field.distance(0, 7), 0)
+
+
+class FlowFieldCacheTest(MapTestCase):
+    def test_least_recently_used_field_is_closed(self):
+        tiled_map = ImagelessTiledMap(self.write_map(ROWS))
+        tiled_map.flow_field_cache_size = 2
+        grid = tiled_map.get_collision_grid()
+
+        first = tiled_map.get_flow_field([(4, 4)])
+        second = tiled_map.get_flow_field([(9, 0)])
+        self.assertIs(tiled_map.get_flow_field([(4, 4)]), first)
+        tiled_map.get_flow_field([(0, 7)])
+
+        # the second one was used the longest ago, it no longer follows the grid
+        self.assertIs(tiled_map.get_flow_field([(4, 4)]), first)
+        self.assertIsNot(tiled_map.get_flow_field([(9, 0)]), second)
+        distance = second.distance(5, 2)
+        grid.set_blocked(5, 1, True)
+        self.assertNotEqual(tiled_map.get_flow_field([(9, 0)]).distance(5, 2), distance)
+        self.assertEqual(second.distance(5, 2), distance)
+        self.assertEqual(first.distance(5, 0), nearest_target_distances(grid, [(4, 4)])[(5, 0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import random
+import unittest
+
+# first, it makes the modules next to tiled.py importable
+from helpers import make_grid
+
+ROWS = [
+    '..#...',
+    '.#..#.',
+    '...#..',
+    '#.....',
+]
+
+
+class NeighborMasksTest(unittest.TestCase):
+    def assertMatchNeighbors(self, grid):
+        """Check the masks, and the neighbors read off them, against the
+        walkable tiles around every tile, collidable ones included.
+        """
+        masks = grid.neighbor_masks()
+        for y in range(grid.height):
+            for x in range(grid.width):
+                index = y * grid.width + x
+                adjacent = [
+                    ((index + offset) % grid.width, (index + offset) // grid.width)
+                    for bit, offset in grid.neighbor_offsets() if masks[index] & bit
+                ]
+                expected = [
+                    tile for tile in ((x, y - 1), (x, y + 1), (x - 1, y), (x + 1, y)) if grid.is_walkable(*tile)]
+                self.assertEqual(adjacent, expected, (x, y))
+                self.assertEqual(grid.neighbors(x, y), expected, (x, y))
+
+    def test_built_from_the_cells(self):
+        self.assertMatchNeighbors(make_grid(ROWS))
+
+    def test_single_row_and_column(self):
+        self.assertMatchNeighbors(make_grid(['..#..']))
+        self.assertMatchNeighbors(make_grid(['.', '.', '#', '.']))
+        self.assertMatchNeighbors(make_grid(['.']))
+
+    def test_follow_set_blocked(self):
+        rng = random.Random(0)
+        grid = make_grid(ROWS)
+        grid.neighbor_masks()
+        for _ in range(50):
+            x, y = rng.randrange(grid.width), rng.randrange(grid.height)
+            grid.set_blocked(x, y, grid.is_walkable(x, y))
+            self.assertMatchNeighbors(grid)
+
+    def test_follow_update_cells(self):
+        grid = make_grid(ROWS)
+        grid.neighbor_masks()
+        grid.update_cells(make_grid(['.' * 6] * 4).cells)
+        self.assertMatchNeighbors(grid)
+        self.assertEqual(grid.neighbors(2, 0), [(2, 1), (1, 0), (3, 0)])
+
+    def test_snapshot_keeps_its_masks(self):
+        grid = make_grid(ROWS)
+        grid.neighbor_masks()
+        snapshot = grid.snapshot()
+        grid.set_blocked(0, 1, True)
+        self.assertMatchNeighbors(snapshot)
+        self.assertEqual(snapshot.neighbors(0, 0), [(0, 1), (1, 0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import unittest
+
+import pytmx
+
+# first, it makes the modules next to tiled.py importable
+from helpers import WALL_GID, ImagelessTiledMap, MapTestCase, pytmx_gid
+
+import mapcache
+
+ROWS = [
+    '..#....S.',
+    '.S#.2#...',
+    '...#..S#.',
+    '#..3..##.',
+    '.#.#.....',
+]
+
+
+def components(labels, width, height):
+    """The tiles of each connected component, whatever their labels."""
+    tiles = {}
+    for y in range(height):
+        for x in range(width):
+            label = labels.label(x, y)
+            if label is not None:
+                tiles.setdefault(label, set()).add((x, y))
+    return sorted(sorted(component) for component in tiles.values())
+
+
+class CompiledMapTest(MapTestCase):
+    def setUp(self):
+        super(CompiledMapTest, self).setUp()
+        self.map_file_path = self.write_map(ROWS)
+        self.parsed = pytmx.TiledMap(self.map_file_path)
+
+        # the first load parses the .tmx and writes the compiled copy
+        self.first = ImagelessTiledMap(self.map_file_path)
+        self.cache_path = mapcache.cache_path_for(self.map_file_path, self.directory)
+        self.compiled = ImagelessTiledMap(self.map_file_path)
+
+    def test_loads_from_the_compiled_copy(self):
+        self.assertTrue(os.path.exists(self.cache_path))
+        self.assertIsNotNone(mapcache.load_compiled_map(self.map_file_path, self.cache_path))
+        self.assertIsNotNone(self.compiled._component_labels)
+
+    def test_matches_pytmx(self):
+        for name in ('width', 'height', 'tilewidth', 'tileheight', 'maxgid'):
+            self.assertEqual(getattr(self.compiled, name), getattr(self.parsed, name), name)
+        self.assertEqual([layer.name for layer in self.compiled.layers], [layer.name for layer in self.parsed.layers])
+
+        for layer_index in range(len(self.parsed.layers)):
+            for y in range(self.parsed.height):
+                for x in range(self.parsed.width):
+                    tile = (x, y, layer_index)
+                    self.assertEqual(self.compiled.get_tile_gid(*tile), self.parsed.get_tile_gid(*tile), tile)
+                    self.assertEqual(
+                        self.compiled.get_tile_properties(*tile), self.parsed.get_tile_properties(*tile), tile)
+
+    def test_lookups_match_the_parsed_map(self):
+        self.assertEqual(bytes(self.compiled.get_collision_grid().cells), bytes(self.first.get_collision_grid().cells))
+        self.assertEqual(self.compiled.get_property_index(), self.first.get_property_index())
+        width, height = len(ROWS[0]), len(ROWS)
+        self.assertEqual(
+            components(self.compiled.get_component_labels(), width, height),
+            components(self.first.get_component_labels(), width, height))
+
+    def test_changes_stay_out_of_the_compiled_copy(self):
+        self.compiled.set_tile_gid(0, 0, pytmx_gid(self.compiled, WALL_GID))
+        self.assertFalse(self.compiled.valid_move(0, 0))
+
+        again = ImagelessTiledMap(self.map_file_path)
+        self.assertTrue(again.valid_move(0, 0))
+        self.assertEqual(again.get_tile_gid(0, 0, 1), 0)
+
+    def test_changed_map_is_parsed_again(self):
+        rows = list(ROWS)
+        rows[0] = '#' + rows[0][1:]
+        self.write_map(rows)
+        self.assertIsNone(mapcache.load_compiled_map(self.map_file_path, self.cache_path))
+
+        changed = ImagelessTiledMap(self.map_file_path)
+        self.assertFalse(changed.valid_move(0, 0))
+        self.assertIsNotNone(mapcache.load_compiled_map(self.map_file_path, self.cache_path))
+
+    def test_unusable_copies_are_ignored(self):
+        with open(self.cache_path, 'rb') as f:
+            data = f.read()
+        for broken in (b'', data[:10], b'XXXX' + data[4:]):
+            with open(self.cache_path, 'wb') as f:
+                f.write(broken)
+            self.assertIsNone(mapcache.load_compiled_map(self.map_file_path, self.cache_path))
+
+    def test_copy_next_to_the_map_comes_first(self):
+        rows = list(ROWS)
+        rows[0] = '#' + rows[0][1:]
+        other_path = self.write_map(rows, 'other.tmx')
+        shipped_path = mapcache.compile_map(
+            pytmx.TiledMap(other_path), self.map_file_path, None, component_labels=True)
+        self.assertEqual(shipped_path, mapcache.cache_path_for(self.map_file_path))
+
+        # compiled from a different map, but the fingerprint is this one's
+        self.assertFalse(ImagelessTiledMap(self.map_file_path).valid_move(0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+
+# first, it makes the modules next to tiled.py importable
+from helpers import GridMap, GridTileMap
+
+from tiled import MovementSystem, TileMovement
+
+
+class MovementSystemTest(unittest.TestCase):
+    def setUp(self):
+        self.tiled_map = GridMap([
+            '.....',
+            '.....',
+            '.....',
+        ])
+        self.tile_map = GridTileMap(self.tiled_map)
+        self.system = MovementSystem(self.tile_map)
+        self.movement = TileMovement(self.tile_map)
+        self.movement.current_tile.x, self.movement.current_tile.y = 0, 1
+        self.completed = []
+        self.movement.bind(on_complete=lambda *args: self.completed.append(1))
+
+    def tearDown(self):
+        self.system.stop()
+
+    def walk(self, steps, dt=0.25):
+        """Update the system, returning the tiles the entity was on."""
+        tiles = []
+        for _ in range(steps):
+            self.system._update(dt)
+            tiles.append((self.movement.current_tile.x, self.movement.current_tile.y))
+        return tiles
+
+    def test_walks_to_destination(self):
+        self.assertTrue(self.system.move_to_tile(self.movement, (4, 1)))
+        tiles = self.walk(20)
+        self.assertEqual(tiles[-1], (4, 1))
+        self.assertEqual(self.completed, [1])
+        self.assertEqual(self.movement.direction, TileMovement.RIGHT)
+
+    def test_faces_the_way_it_steps(self):
+        self.assertTrue(self.system.move_to_tile(self.movement, (0, 0)))
+        self.walk(1)
+        self.assertEqual(self.movement.direction, TileMovement.UP)
+
+    def test_replans_around_a_tile_blocked_ahead(self):
+        self.assertTrue(self.system.move_to_tile(self.movement, (4, 1)))
+        self.assertEqual(self.walk(1), [(1, 1)])
+        self.tiled_map.grid.set_blocked(2, 1, True)
+
+        tiles = self.walk(40)
+        self.assertNotIn((2, 1), tiles)
+        self.assertEqual(tiles[-1], (4, 1))
+        self.assertEqual(self.completed, [1])
+        self.assertIn(self.movement.direction, (TileMovement.RIGHT, TileMovement.DOWN, TileMovement.UP))
+
+    def test_new_destination_mid_step_keeps_the_position(self):
+        self.assertTrue(self.system.move_to_tile(self.movement, (4, 1)))
+        self.walk(3, dt=0.125)
+        self.assertEqual(tuple(self.movement.pos), (24.0, 32.0))
+
+        # turning back to the tile it's leaving
+        self.assertTrue(self.system.move_to_tile(self.movement, (0, 1)))
+        self.assertEqual(self.walk(1, dt=0.125), [(0, 1)])
+        self.assertEqual(tuple(self.movement.pos), (16.0, 32.0))
+        self.assertEqual(self.movement.direction, TileMovement.LEFT)
+
+        # off somewhere else, a quarter of a tile from where it was
+        self.assertTrue(self.system.move_to_tile(self.movement, (2, 2)))
+        self.walk(1, dt=0.125)
+        self.assertIn(tuple(self.movement.pos), ((8.0, 32.0), (24.0, 32.0)))
+        tiles = self.walk(20)
+        self.assertEqual(tiles[-1], (2, 2))
+        self.assertEqual(self.completed, [1])
+
+    def test_removed_when_blocked_with_no_other_path(self):
+        self.assertTrue(self.system.move_to_tile(self.movement, (4, 1)))
+        self.walk(1)
+        for y in range(3):
+            self.tiled_map.grid.set_blocked(2, y, True)
+
+        tiles = self.walk(10)
+        self.assertNotIn((2, 1), tiles)
+        self.assertEqual(tiles[-1], (1, 1))
+        self.assertFalse(self.movement.moving)
+        self.assertEqual(self.completed, [])
+        self.assertFalse(self.system.followers.is_moving(0))
+
+
+if __name__ == '__main__':
+    unittest.main()
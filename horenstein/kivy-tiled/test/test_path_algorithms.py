@@ -0,0 +1,118 @@
+import random
+import unittest
+
+# first, it makes the modules next to tiled.py importable
+from helpers import bfs_distances, dense_astar, is_walkable_path, make_grid
+
+from hpa import HierarchicalPathfinder
+from jps import JumpPointSearch
+from pathfinding import astar
+
+ROWS = [
+    '..........#...',
+    '.####.###.#.#.',
+    '.#....#...#.#.',
+    '.#.##.#.###.#.',
+    '...#..#.....#.',
+    '##.#.####.###.',
+    '...#....#.....',
+    '.#####..#.###.',
+    '.....#..#...#.',
+    '.###.#.####.#.',
+    '...#.......##.',
+    '#.......#.....',
+]
+
+# an area walled off from the rest
+ISLAND_ROWS = [
+    '....#...',
+    '....#...',
+    '#####.#.',
+    '....#...',
+]
+
+
+def random_rows(width, height, density, rng):
+    return [''.join('#' if rng.random() < density else '.' for _ in range(width)) for _ in range(height)]
+
+
+class PathAlgorithmsTest(unittest.TestCase):
+    """A* and Jump Point Search find shortest paths, HPA* paths that may be
+    a little longer, all checked against a breadth first search.
+    """
+
+    def searches(self, grid):
+        jps = JumpPointSearch(grid)
+        hpa = HierarchicalPathfinder(grid, 4)
+        self.addCleanup(jps.close)
+        self.addCleanup(hpa.close)
+        return (
+            ('astar', lambda start, dest: astar(grid, start, dest), True),
+            ('dense astar', lambda start, dest: dense_astar(grid, start, dest), True),
+            ('jps', jps.find_path, True),
+            ('hpa', hpa.find_path, False),
+        )
+
+    def check_pairs(self, grid, searches, pairs):
+        distances = {}
+        for start, dest in pairs:
+            if start not in distances:
+                distances[start] = bfs_distances(grid, start)
+            distance = distances[start].get(dest)
+            for name, find_path, shortest in searches:
+                path = find_path(start, dest)
+                if distance is None:
+                    self.assertEqual(path, [], (name, start, dest))
+                    continue
+                self.assertTrue(path, (name, start, dest))
+                self.assertEqual((path[0], path[-1]), (start, dest), name)
+                self.assertTrue(is_walkable_path(grid, path), (name, path))
+                if shortest:
+                    self.assertEqual(len(path) - 1, distance, (name, start, dest))
+                else:
+                    self.assertGreaterEqual(len(path) - 1, distance, (name, start, dest))
+
+    def walkable(self, grid):
+        return [(x, y) for y in range(grid.height) for x in range(grid.width) if grid.is_walkable(x, y)]
+
+    def test_from_every_tile(self):
+        grid = make_grid(ROWS)
+        tiles = self.walkable(grid)
+        self.check_pairs(grid, self.searches(grid), [(start, dest) for start in tiles for dest in tiles[::3]])
+
+    def test_unreachable(self):
+        grid = make_grid(ISLAND_ROWS)
+        tiles = self.walkable(grid)
+        self.check_pairs(grid, self.searches(grid), [(start, dest) for start in tiles for dest in tiles])
+
+    def test_blocked_and_off_the_grid(self):
+        grid = make_grid(ROWS)
+        for name, find_path, _ in self.searches(grid):
+            self.assertEqual(find_path((0, 0), (10, 0)), [], name)
+            self.assertEqual(find_path((0, 0), (0, 0)), [(0, 0)], name)
+
+    def test_random_grids(self):
+        rng = random.Random(0)
+        for _ in range(3):
+            grid = make_grid(random_rows(24, 20, 0.3, rng))
+            tiles = self.walkable(grid)
+            pairs = [(rng.choice(tiles), rng.choice(tiles)) for _ in range(150)]
+            self.check_pairs(grid, self.searches(grid), pairs)
+
+    def test_follow_the_grid_changing(self):
+        rng = random.Random(1)
+        grid = make_grid(ROWS)
+        searches = self.searches(grid)
+        tiles = [(x, y) for y in range(grid.height) for x in range(grid.width)]
+        for _ in range(10):
+            # built before the change, then patched by it
+            self.check_pairs(grid, searches, [((0, 0), (13, 11))])
+            for _ in range(4):
+                x, y = rng.choice(tiles)
+                grid.set_blocked(x, y, not grid.cells[y * grid.width + x])
+            walkable = self.walkable(grid)
+            self.check_pairs(grid, searches, [(rng.choice(walkable), rng.choice(walkable)) for _ in range(40)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import unittest
+
+# first, it makes the modules next to tiled.py importable
+from helpers import GridMap, bfs_distances, is_walkable_path, make_grid
+
+from path_cache import PathCache
+from pathfinding import astar
+from tiled import find_path
+
+ROWS = [
+    '.......',
+    '.#####.',
+    '.......',
+    '###.###',
+    '.......',
+]
+
+TOP = ((0, 0), (6, 0))
+MIDDLE = ((0, 2), (6, 2))
+DOWN = ((3, 2), (3, 4))
+
+
+class PathCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.grid = make_grid(ROWS)
+        self.cache = PathCache(self.grid)
+        self.addCleanup(self.cache.close)
+        self.searches = []
+        for start, dest in (TOP, MIDDLE, DOWN):
+            self.find_path(start, dest)
+
+    def find_path(self, start, dest):
+        def search(start, dest):
+            self.searches.append((start, dest))
+            return astar(self.grid, start, dest)
+        return self.cache.find_path(start, dest, search)
+
+    def cached(self):
+        return set(key for key in (TOP, MIDDLE, DOWN) if self.cache.get(*key) is not None)
+
+    def test_hits_without_searching(self):
+        self.assertEqual(self.find_path(*TOP), [(x, 0) for x in range(7)])
+        self.assertEqual(len(self.searches), 3)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_drops_only_the_paths_crossing_a_blocked_tile(self):
+        self.grid.set_blocked(3, 2, True)
+        self.assertEqual(self.cached(), set([TOP]))
+
+        self.grid.set_blocked(3, 0, True)
+        self.assertEqual(self.cached(), set())
+        self.assertEqual(self.cache.stats()['invalidations'], 3)
+
+    def test_blocking_a_tile_off_every_path_keeps_them(self):
+        self.grid.set_blocked(0, 4, True)
+        self.grid.set_blocked(3, 1, False)
+        self.assertEqual(self.cached(), set([TOP, MIDDLE, DOWN]))
+
+    def test_opened_tiles_drop_the_pairs_without_a_path(self):
+        self.grid.set_blocked(3, 3, True)
+        self.assertEqual(self.find_path(*DOWN), [])
+        self.assertEqual(self.cache.get(*DOWN), [])
+        self.assertEqual(self.cached(), set([TOP, MIDDLE, DOWN]))
+
+        self.grid.set_blocked(0, 4, True)
+        self.assertEqual(self.cache.get(*DOWN), [])
+        self.grid.set_blocked(3, 3, False)
+        self.assertIsNone(self.cache.get(*DOWN))
+        self.assertEqual(self.find_path(*DOWN), [(3, 2), (3, 3), (3, 4)])
+
+    def test_paths_found_again_match_a_fresh_search(self):
+        for x, y in ((2, 2), (4, 2), (3, 0)):
+            self.grid.set_blocked(x, y, True)
+            for start, dest in (TOP, MIDDLE, DOWN):
+                path = self.find_path(start, dest)
+                distance = bfs_distances(self.grid, start).get(dest)
+                if distance is None:
+                    self.assertEqual(path, [])
+                else:
+                    self.assertEqual(len(path) - 1, distance)
+                    self.assertTrue(is_walkable_path(self.grid, path))
+
+    def test_evicts_the_least_recently_used(self):
+        cache = PathCache(self.grid, max_entries=2)
+        self.addCleanup(cache.close)
+        for start, dest in (TOP, MIDDLE):
+            cache.put(start, dest, astar(self.grid, start, dest))
+        cache.get(*TOP)
+        cache.put(DOWN[0], DOWN[1], astar(self.grid, *DOWN))
+        self.assertIsNone(cache.get(*MIDDLE))
+        self.assertIsNotNone(cache.get(*TOP))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+        # the evicted path no longer hears of its tiles
+        self.grid.set_blocked(1, 2, True)
+        self.assertIsNotNone(cache.get(*TOP))
+
+
+class FindPathCacheTest(unittest.TestCase):
+    def test_find_path_uses_the_map_cache(self):
+        tiled_map = GridMap(ROWS)
+        path = find_path(tiled_map, 0, 0, 6, 4)
+        self.assertEqual(tiled_map.path_cache.get((0, 0), (6, 4)), path)
+
+        # off the only way between the two halves of the map
+        x, y = next(tile for tile in path if tile[1] == 2 and tile[0] != 3)
+        tiled_map.grid.set_blocked(x, y, True)
+        self.assertIsNone(tiled_map.path_cache.get((0, 0), (6, 4)))
+        self.assertEqual(len(find_path(tiled_map, 0, 0, 6, 4)) - 1, bfs_distances(tiled_map.grid, (0, 0))[(6, 4)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import time
+import unittest
+
+# first, it makes the modules next to tiled.py importable
+from helpers import bfs_distances, is_walkable_path, make_costs, make_grid, path_cost
+
+from kivy.clock import Clock
+
+from planner import PathPlanner
+
+ROWS = [
+    '.........',
+    '.#######.',
+    '.#.....#.',
+    '.#.###.#.',
+    '...#...#.',
+    '####.###.',
+    '.........',
+]
+
+
+class PathPlannerTest(unittest.TestCase):
+    def setUp(self):
+        self.grid = make_grid(ROWS)
+        self.planner = PathPlanner(self.grid, hpa_cluster_size=4)
+        self.addCleanup(self.planner.close)
+        self.delivered = []
+
+    def request(self, start, dest, algorithm='astar'):
+        return self.planner.request(start, dest, self.delivered.append, algorithm)
+
+    def wait(self, condition, tick=True, timeout=5.0):
+        """Wait for the planning thread, ticking the Clock the paths are
+        handed back through unless told not to.
+        """
+        deadline = time.time() + timeout
+        while not condition() and time.time() < deadline:
+            time.sleep(0.002)
+            if tick:
+                Clock.tick()
+        self.assertTrue(condition())
+
+    def test_paths_match_a_breadth_first_search(self):
+        requests = [self.request((0, 0), (4, 4), algorithm) for algorithm in ('astar', 'jps', 'hpa')]
+        self.wait(lambda: len(self.delivered) == 3)
+        self.assertEqual(sorted(self.delivered, key=requests.index), requests)
+
+        distance = bfs_distances(self.grid, (0, 0))[(4, 4)]
+        for request in requests:
+            self.assertTrue(is_walkable_path(self.grid, request.path), request.algorithm)
+            self.assertEqual((request.path[0], request.path[-1]), ((0, 0), (4, 4)))
+            if request.algorithm != 'hpa':
+                self.assertEqual(len(request.path) - 1, distance, request.algorithm)
+
+    def test_no_path(self):
+        # walls the room in the middle off
+        self.grid.set_blocked(4, 5, True)
+        self.grid.set_blocked(1, 4, True)
+        self.assertNotIn((4, 4), bfs_distances(self.grid, (0, 0)))
+        request = self.request((0, 0), (4, 4))
+        self.wait(lambda: self.delivered)
+        self.assertEqual(request.path, [])
+
+    def test_cancelled_requests_are_not_delivered(self):
+        cancelled = self.request((0, 0), (4, 4))
+        cancelled.cancel()
+        request = self.request((0, 6), (8, 6))
+        self.wait(lambda: self.delivered)
+        for _ in range(5):
+            time.sleep(0.002)
+            Clock.tick()
+        self.assertEqual(self.delivered, [request])
+
+    def test_unknown_algorithm(self):
+        with self.assertRaises(ValueError):
+            self.request((0, 0), (4, 4), 'dijkstra')
+
+    def test_changes_reach_the_snapshot(self):
+        self.request((0, 6), (8, 6))
+        self.wait(lambda: self.delivered)
+
+        # the short way along the bottom row is cut off
+        self.grid.set_blocked(6, 6, True)
+        request = self.request((0, 6), (8, 6))
+        self.wait(lambda: len(self.delivered) == 2)
+        self.assertNotIn((6, 6), request.path)
+        self.assertEqual(len(request.path) - 1, bfs_distances(self.grid, (0, 6))[(8, 6)])
+        self.assertTrue(self.planner.is_current(request))
+
+    def test_paths_blocked_while_searching_are_searched_again(self):
+        request = self.request((0, 6), (8, 6))
+        self.wait(lambda: request.path is not None, tick=False)
+        self.assertIn((6, 6), request.path)
+
+        # after the search but before the path is handed back
+        self.grid.set_blocked(6, 6, True)
+        self.wait(lambda: self.delivered)
+        self.assertEqual(self.planner.replanned, 1)
+        self.assertNotIn((6, 6), request.path)
+        self.assertTrue(is_walkable_path(self.grid, request.path))
+
+    def test_weighted_paths(self):
+        rows = [
+            '.....',
+            '.###.',
+            '.....',
+        ]
+        costs = make_costs(['.999.', '.....', '.....'])
+        planner = PathPlanner(make_grid(rows), costs=costs)
+        self.addCleanup(planner.close)
+        request = planner.request((0, 0), (4, 0), self.delivered.append)
+        self.wait(lambda: self.delivered)
+        self.assertEqual(path_cost(costs, request.path), 8)
+
+        # a change to the costs goes to the snapshot too
+        costs.set_cost(2, 2, 9)
+        request = planner.request((0, 0), (4, 0), self.delivered.append)
+        self.wait(lambda: len(self.delivered) == 2)
+        self.assertEqual(path_cost(costs, request.path), 16)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+
+import pytmx
+
+# first, it makes the modules next to tiled.py importable
+from helpers import SPAWN_GID, ImagelessTiledMap, MapTestCase, pytmx_gid
+
+ROWS = [
+    '..#.S..',
+    '.S#.2#.',
+    '...#..S',
+    '#..3...',
+]
+
+
+class PropertyIndexTest(MapTestCase):
+    def setUp(self):
+        super(PropertyIndexTest, self).setUp()
+        self.map_file_path = self.write_map(ROWS)
+        self.tiled_map = ImagelessTiledMap(self.map_file_path, use_cache=False)
+
+    def scan(self, tiled_map, property_name):
+        """The tiles having a property row by row, looked up one at a time."""
+        meta = tiled_map.layers.index(tiled_map.get_layer_by_name('Meta'))
+        tiles = []
+        for y in range(tiled_map.height):
+            for x in range(tiled_map.width):
+                properties = tiled_map.get_tile_properties(x, y, meta)
+                if properties and property_name in properties:
+                    tiles.append((x, y))
+        return tiles
+
+    def test_matches_looking_up_every_tile(self):
+        parsed = pytmx.TiledMap(self.map_file_path)
+        for property_name in ('Collidable', 'SpawnPoint', 'Cost'):
+            self.assertEqual(self.tiled_map.find_tiles_with_property(property_name), self.scan(parsed, property_name))
+
+    def test_first_tile_row_by_row(self):
+        self.assertEqual(self.tiled_map.find_tile_with_property('SpawnPoint'), (4, 0))
+
+    def test_missing_property(self):
+        self.assertEqual(self.tiled_map.find_tiles_with_property('CropTile'), [])
+        self.assertIsNone(self.tiled_map.find_tile_with_property('CropTile'))
+
+    def test_get_property_index(self):
+        index = self.tiled_map.get_property_index()
+        # pytmx gives every tile a few properties of its own, such as id
+        self.assertTrue(set(['Collidable', 'Cost', 'SpawnPoint']) <= set(index))
+        self.assertNotIn('CropTile', index)
+        self.assertEqual(index['Cost'], [(4, 1), (3, 3)])
+
+        # a copy, changing it leaves the map's alone
+        index['Cost'].append((0, 0))
+        self.assertEqual(self.tiled_map.find_tiles_with_property('Cost'), [(4, 1), (3, 3)])
+
+    def test_follows_set_tile_gid(self):
+        self.tiled_map.set_tile_gid(0, 0, pytmx_gid(self.tiled_map, SPAWN_GID))
+        self.tiled_map.set_tile_gid(4, 0, 0)
+        self.assertEqual(self.tiled_map.find_tiles_with_property('SpawnPoint'), [(0, 0), (1, 1), (6, 2)])
+        self.assertEqual(
+            self.tiled_map.find_tiles_with_property('SpawnPoint'), self.scan(self.tiled_map, 'SpawnPoint'))
+
+    def test_follows_the_layer_data_being_replaced(self):
+        layer = self.tiled_map.get_layer_by_name('Meta')
+        layer.data = [[0] * len(ROWS[0]) for _ in ROWS]
+        layer.data[3][6] = pytmx_gid(self.tiled_map, SPAWN_GID)
+        self.assertEqual(self.tiled_map.find_tiles_with_property('SpawnPoint'), [(6, 3)])
+
+    def test_restored_from_the_compiled_map(self):
+        ImagelessTiledMap(self.map_file_path)
+        compiled = ImagelessTiledMap(self.map_file_path)
+        self.assertIn('Meta', compiled._property_indexes)
+        self.assertEqual(compiled.get_property_index(), self.tiled_map.get_property_index())
+
+
+if __name__ == '__main__':
+    unittest.main()
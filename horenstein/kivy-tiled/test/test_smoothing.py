@@ -0,0 +1,129 @@
+import unittest
+
+# first, it makes the modules next to tiled.py importable
+from helpers import make_grid
+
+from smoothing import line_of_sight, smooth_path, sweep_order, swept_tiles
+
+
+class SweptTilesTest(unittest.TestCase):
+    def test_single_tile(self):
+        self.assertEqual(swept_tiles((2, 3), (2, 3)), [(2, 3)])
+
+    def test_horizontal(self):
+        self.assertEqual(swept_tiles((0, 1), (3, 1)), [(0, 1), (1, 1), (2, 1), (3, 1)])
+
+    def test_vertical(self):
+        self.assertEqual(swept_tiles((1, 0), (1, 3)), [(1, 0), (1, 1), (1, 2), (1, 3)])
+        self.assertEqual(swept_tiles((1, 3), (1, 0)), [(1, 0), (1, 1), (1, 2), (1, 3)])
+
+    def test_direction_does_not_matter(self):
+        for start, dest in (((0, 0), (3, 1)), ((0, 3), (4, 0)), ((2, 0), (0, 5))):
+            self.assertEqual(sorted(swept_tiles(start, dest)), sorted(swept_tiles(dest, start)))
+
+    def test_diagonal_covers_the_tiles_beside_it(self):
+        self.assertEqual(sorted(swept_tiles((0, 0), (1, 1))), [(0, 0), (0, 1), (1, 0), (1, 1)])
+
+    def test_negative_slope(self):
+        tiles = set(swept_tiles((0, 2), (2, 0)))
+        self.assertEqual(tiles, set([(0, 1), (0, 2), (1, 0), (1, 1), (1, 2), (2, 0), (2, 1)]))
+        # the corners away from the line are never overlapped
+        self.assertNotIn((0, 0), tiles)
+        self.assertNotIn((2, 2), tiles)
+
+    def test_shallow_negative_slope(self):
+        tiles = set(swept_tiles((0, 1), (4, 0)))
+        self.assertEqual(tiles, set((x, y) for x in range(5) for y in (0, 1)))
+
+
+class SweepOrderTest(unittest.TestCase):
+    def test_same_tiles_as_swept_tiles(self):
+        for start, dest in (((0, 0), (3, 1)), ((3, 1), (0, 0)), ((1, 3), (1, 0)), ((0, 2), (2, 0))):
+            self.assertEqual(
+                sorted(tile for _, tile in sweep_order(start, dest)), sorted(swept_tiles(start, dest)))
+
+    def test_vertical_in_walking_order(self):
+        self.assertEqual(
+            sweep_order((0, 3), (0, 0)),
+            [(0.0, (0, 2)), (0.0, (0, 3)), (1.0 / 3, (0, 1)), (2.0 / 3, (0, 0))])
+
+    def test_starts_on_the_start(self):
+        entries = sweep_order((4, 0), (0, 2))
+        self.assertEqual(entries[0][0], 0.0)
+        self.assertIn((0.0, (4, 0)), entries)
+        self.assertEqual(entries[-1][1][0], 0)
+
+
+class LineOfSightTest(unittest.TestCase):
+    def test_open_line(self):
+        grid = make_grid([
+            '....',
+            '....',
+        ])
+        self.assertTrue(line_of_sight(grid, (0, 0), (3, 1)))
+
+    def test_blocked_vertical_line(self):
+        grid = make_grid([
+            '.',
+            '#',
+            '.',
+        ])
+        self.assertFalse(line_of_sight(grid, (0, 0), (0, 2)))
+        self.assertFalse(line_of_sight(grid, (0, 2), (0, 0)))
+
+    def test_no_corner_cutting(self):
+        grid = make_grid([
+            '.#',
+            '..',
+        ])
+        self.assertFalse(line_of_sight(grid, (0, 0), (1, 1)))
+        self.assertFalse(line_of_sight(grid, (1, 1), (0, 0)))
+
+    def test_no_corner_cutting_on_negative_slope(self):
+        grid = make_grid([
+            '..',
+            '#.',
+        ])
+        self.assertFalse(line_of_sight(grid, (0, 0), (1, 1)))
+        grid = make_grid([
+            '.#',
+            '..',
+        ])
+        self.assertFalse(line_of_sight(grid, (0, 1), (1, 0)))
+
+    def test_tile_off_the_line_does_not_block(self):
+        grid = make_grid([
+            '...#',
+            '....',
+            '#...',
+        ])
+        self.assertTrue(line_of_sight(grid, (0, 0), (3, 2)))
+        self.assertTrue(line_of_sight(grid, (0, 1), (3, 1)))
+
+    def test_off_the_grid(self):
+        grid = make_grid(['..'])
+        self.assertFalse(line_of_sight(grid, (0, 0), (2, 0)))
+
+
+class SmoothPathTest(unittest.TestCase):
+    def test_keeps_the_corner_it_goes_around(self):
+        grid = make_grid([
+            '...',
+            '.#.',
+            '...',
+        ])
+        path = [(0, 0), (0, 1), (0, 2), (1, 2), (2, 2)]
+        self.assertEqual(smooth_path(grid, path), [(0, 0), (0, 2), (2, 2)])
+
+    def test_straightens_open_ground(self):
+        grid = make_grid([
+            '...',
+            '...',
+            '...',
+        ])
+        path = [(0, 0), (1, 0), (2, 0), (2, 1), (2, 2)]
+        self.assertEqual(smooth_path(grid, path), [(0, 0), (2, 2)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import time
+import unittest
+
+import pytmx
+
+# first, it makes the modules next to tiled.py importable
+from helpers import SPAWN_GID, WALL_GID, ImagelessTiledMap, MapTestCase, pytmx_gid
+
+ROWS = [
+    '..#....S..#',
+    '.S#.2#.....',
+    '...#..S#.3.',
+    '#..3..##...',
+    '.#.#.....#.',
+    '....2...#..',
+    '.#..#..S...',
+]
+
+
+class SmallChunkMap(ImagelessTiledMap):
+    # chunks of 3x3 tiles, at most four of them in memory
+    stream_chunk_size = 3
+    stream_max_bytes = 4 * 3 * 3 * 4
+
+
+class StreamingTest(MapTestCase):
+    def setUp(self):
+        super(StreamingTest, self).setUp()
+        self.map_file_path = self.write_map(ROWS)
+        self.parsed = pytmx.TiledMap(self.map_file_path)
+        self.tiled_map = SmallChunkMap(self.map_file_path, streaming=True)
+        self.streamer = self.tiled_map.chunk_streamer
+
+    def tearDown(self):
+        self.streamer.close()
+        super(StreamingTest, self).tearDown()
+
+    def test_matches_pytmx(self):
+        for layer_index in range(len(self.parsed.layers)):
+            for y in range(self.parsed.height):
+                for x in range(self.parsed.width):
+                    tile = (x, y, layer_index)
+                    self.assertEqual(self.tiled_map.get_tile_gid(*tile), self.parsed.get_tile_gid(*tile), tile)
+                    self.assertEqual(
+                        self.tiled_map.get_tile_properties(*tile), self.parsed.get_tile_properties(*tile), tile)
+
+    def test_stays_within_the_memory_budget(self):
+        for y in range(len(ROWS)):
+            for x in range(len(ROWS[0])):
+                self.tiled_map.get_tile_gid(x, y, 1)
+                self.assertLessEqual(self.streamer.loaded_bytes(), SmallChunkMap.stream_max_bytes)
+        self.assertGreater(self.streamer.evictions, 0)
+
+    def test_lookups_match_the_rows(self):
+        parsed = ImagelessTiledMap(self.map_file_path, use_cache=False)
+        self.assertEqual(bytes(self.tiled_map.get_collision_grid().cells), bytes(parsed.get_collision_grid().cells))
+        self.assertEqual(self.tiled_map.get_property_index(), parsed.get_property_index())
+        self.assertEqual(self.tiled_map.get_cost_grid().costs, parsed.get_cost_grid().costs)
+
+    def test_changes_survive_eviction(self):
+        self.tiled_map.set_tile_gid(10, 6, pytmx_gid(self.tiled_map, WALL_GID))
+        self.tiled_map.set_tile_gid(0, 0, pytmx_gid(self.tiled_map, SPAWN_GID))
+        for y in range(len(ROWS)):
+            for x in range(len(ROWS[0])):
+                self.tiled_map.get_tile_gid(x, y, 1)
+
+        self.assertFalse(self.tiled_map.valid_move(10, 6))
+        self.assertEqual(self.tiled_map.get_layer_by_name('Meta').data[6][10], pytmx_gid(self.tiled_map, WALL_GID))
+        self.assertIn((0, 0), self.tiled_map.find_tiles_with_property('SpawnPoint'))
+
+    def test_prefetch_loads_in_the_background(self):
+        self.tiled_map.prefetch_region(3, 3, 5, 5)
+        deadline = time.time() + 5
+        while self.streamer.prefetched < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.streamer.prefetched, 2)
+
+        sync_loads = self.streamer.sync_loads
+        self.assertEqual(self.tiled_map.get_tile_gid(4, 4, 1), self.parsed.get_tile_gid(4, 4, 1))
+        self.assertEqual(self.streamer.sync_loads, sync_loads)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+
+# first, it makes the modules next to tiled.py importable
+from helpers import GridMap
+
+from kivy.uix.widget import Widget
+
+from tiled import TileMap
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class PositionMap(Widget):
+    """The parts of a TileMap that finding the tile at a position uses."""
+    get_tile_position = TileMap.get_tile_position
+    get_tile_at_position = TileMap.get_tile_at_position
+    get_tiles_at_positions = TileMap.get_tiles_at_positions
+    _get_tile_pos = TileMap._get_tile_pos
+
+    def __init__(self, rows, tile_size, **kwargs):
+        super(PositionMap, self).__init__(**kwargs)
+        self.tiled_map = GridMap(rows)
+        self.tile_map_size = (self.tiled_map.width, self.tiled_map.height)
+        self.tile_size = self.scaled_tile_size = tile_size
+
+
+class TileAtPositionTest(unittest.TestCase):
+    def setUp(self):
+        self.tile_map = PositionMap(['.....'] * 3, (32, 24))
+
+    def test_middle_of_every_tile(self):
+        for y in range(3):
+            for x in range(5):
+                pos_x, pos_y = self.tile_map.get_tile_position(x, y)
+                self.assertEqual(self.tile_map.get_tile_at_position((pos_x + 16, pos_y + 12)), (x, y))
+
+    def test_edges_belong_to_the_left_and_lower_tile(self):
+        self.assertEqual(self.tile_map.get_tile_at_position((32, 30)), (0, 1))
+        self.assertEqual(self.tile_map.get_tile_at_position((40, 24)), (1, 2))
+        self.assertEqual(self.tile_map.get_tile_at_position((160, 72)), (4, 0))
+
+    def test_clamps_below_and_left_of_the_map(self):
+        self.assertEqual(self.tile_map.get_tile_at_position((-10, 30)), (0, 1))
+        self.assertEqual(self.tile_map.get_tile_at_position((40, -5)), (1, 2))
+
+    def test_off_the_map(self):
+        self.assertIsNone(self.tile_map.get_tile_at_position((161, 30)))
+        self.assertIsNone(self.tile_map.get_tile_at_position((40, 73)))
+
+    @unittest.skipIf(numpy is None, 'requires numpy')
+    def test_many_positions_at_once(self):
+        positions = [(x * 8.0 - 12, y * 6.0 - 9) for y in range(16) for x in range(26)]
+        tiles = self.tile_map.get_tiles_at_positions(positions).tolist()
+        for pos, tile in zip(positions, tiles):
+            self.assertEqual(tuple(tile), self.tile_map.get_tile_at_position(pos) or (-1, -1), pos)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+
+# first, it makes the modules next to tiled.py importable
+from helpers import make_grid
+
+from waiting import TileWaiters
+
+
+class TileWaitersTest(unittest.TestCase):
+    def setUp(self):
+        self.grid = make_grid(['.' * 20] * 12)
+        self.waiters = TileWaiters(self.grid, bucket_size=8)
+        self.addCleanup(self.waiters.close)
+        self.calls = []
+
+    def callback(self, wait, x, y, blocked):
+        self.calls.append((wait, x, y, blocked))
+
+    def test_wait_on_tiles(self):
+        wait = self.waiters.wait(self.callback, tiles=[(3, 3), (10, 9)])
+        self.grid.set_blocked(4, 3, True)
+        self.assertEqual(self.calls, [])
+
+        self.grid.set_blocked(10, 9, True)
+        self.assertEqual(self.calls, [(wait, 10, 9, True)])
+        self.assertTrue(wait.cancelled)
+        self.assertEqual(self.waiters.waiting(), 0)
+
+        # called back once only
+        self.grid.set_blocked(3, 3, True)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.waiters.woken, 1)
+
+    def test_wait_on_bounds(self):
+        # across four buckets, and past the edges of the grid
+        wait = self.waiters.wait(self.callback, bounds=(6, 6, 25, 9))
+        self.assertEqual(len(wait._buckets), 6)
+        for x, y in ((5, 6), (6, 5), (6, 10)):
+            self.grid.set_blocked(x, y, True)
+        self.assertEqual(self.calls, [])
+
+        self.grid.set_blocked(19, 9, True)
+        self.assertEqual(self.calls, [(wait, 19, 9, True)])
+
+    def test_wait_on_the_whole_grid(self):
+        wait = self.waiters.wait(self.callback)
+        self.grid.set_blocked(0, 11, True)
+        self.assertEqual(self.calls, [(wait, 0, 11, True)])
+
+    def test_wait_for_walkable_tiles(self):
+        self.grid.set_blocked(2, 2, True)
+        wait = self.waiters.wait(self.callback, bounds=(0, 0, 4, 4), blocked=False)
+        self.grid.set_blocked(3, 3, True)
+        self.assertEqual(self.calls, [])
+        self.grid.set_blocked(2, 2, False)
+        self.assertEqual(self.calls, [(wait, 2, 2, False)])
+
+    def test_unchanged_tiles_dont_wake(self):
+        self.waiters.wait(self.callback, tiles=[(1, 1)])
+        self.grid.set_blocked(1, 1, False)
+        self.assertEqual(self.calls, [])
+
+    def test_cancel(self):
+        wait = self.waiters.wait(self.callback, bounds=(0, 0, 19, 11))
+        other = self.waiters.wait(self.callback, tiles=[(5, 5)])
+        self.assertEqual(self.waiters.waiting(), 2)
+        wait.cancel()
+        self.assertEqual(self.waiters.waiting(), 1)
+        self.grid.set_blocked(5, 5, True)
+        self.assertEqual(self.calls, [(other, 5, 5, True)])
+
+    def test_callback_cancelling_another_wait(self):
+        waits = []
+
+        def cancel_the_other(wait, x, y, blocked):
+            self.calls.append(wait)
+            waits[1 - waits.index(wait)].cancel()
+
+        waits.append(self.waiters.wait(cancel_the_other, tiles=[(5, 5)]))
+        waits.append(self.waiters.wait(cancel_the_other, bounds=(4, 4, 6, 6)))
+        self.grid.set_blocked(5, 5, True)
+        self.assertEqual(self.calls, [waits[0]])
+        self.assertEqual(self.waiters.waiting(), 0)
+
+    def test_matches(self):
+        wait = self.waiters.wait(self.callback, tiles=[(1, 1), (2, 1)], bounds=(2, 0, 3, 3), blocked=True)
+        self.assertTrue(wait.matches(2, 1, True))
+        self.assertFalse(wait.matches(1, 1, True))
+        self.assertFalse(wait.matches(2, 1, False))
+        self.assertFalse(wait.matches(3, 3, True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,10 @@
+import collections
 import os
-import itertools
-import random
+import math
 
 from kivy.animation import Animation
 from kivy.clock import Clock
-from kivy.core.image import Image as CoreImage
-from kivy.graphics import Color, Rectangle
+from kivy.graphics import Color, InstructionGroup, Mesh, PopMatrix, PushMatrix, Rectangle, Scale
 from kivy.logger import Logger
 from kivy.properties import BooleanProperty, ListProperty
 from kivy.uix.widget import Widget
@@ -13,101 +12,462 @@ from kivy.vector import Vector
 
 import pytmx
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import mapcache
+from batch import BatchPlanner
+from components import BLOCKED, ComponentLabels
+from cooperative import CooperativePlanner
+from dstar import DStarLite
+from flowfield import FlowField
+from grid import CollisionGrid, CostGrid, build_collision_cells, build_cost_cells, build_property_index, tile_cost
+from hpa import HierarchicalPathfinder
+from jps import JumpPointSearch
+from movement import PathFollowers
+from path_cache import PathCache
+from pathfinding import astar
+from planner import PathPlanner
+from searches import ALGORITHMS as PATH_ALGORITHMS
+from smoothing import farthest_visible, sweep_order
+from streaming import ChunkStreamer, StreamedLayerData
+from tileset_cache import tileset_cache
+from waiting import TileWaiters
+
 
 class KivyTiledMap(pytmx.TiledMap):
     """
     Loads Kivy images. Make sure that there is an active OpenGL context
     (Kivy Window) before trying to load a map.
+
+    Parsed maps are compiled to a binary copy (see mapcache) that later loads
+    use instead of parsing the .tmx file again, for as long as it doesn't
+    change. A copy compiled next to the .tmx with mapcache.py is used first,
+    others are written to map_cache_dir. Pass use_cache=False to always
+    parse.
+
+    Pass streaming=True for maps too big to hold in memory: the layers then
+    stay in the compiled copy and are read in chunks as they're used, see
+    prefetch_region.
     """
+    # tiles of this layer having this property can't be walked on
+    collision_layer_name = 'Meta'
+    collision_property = 'Collidable'
+
+    # tiles of this layer having this property cost that much to step onto
+    # with find_path's 'astar', 1 otherwise
+    cost_layer_name = 'Meta'
+    cost_property = 'Cost'
+
+    # decoded tileset images shared between maps
+    tileset_cache = tileset_cache
+
+    # where compiled maps are written, None for mapcache.default_cache_dir()
+    map_cache_dir = None
+
+    # chunk size in tiles and memory budget in bytes of streaming maps
+    stream_chunk_size = 64
+    stream_max_bytes = 32 * 1024 * 1024
+
+    # cluster size in tiles of the hierarchical path finder
+    hpa_cluster_size = 16
+
+    # paths kept by the path cache of each find_path algorithm
+    path_cache_size = 1024
+
+    # flow fields kept by get_flow_field, the least recently used one is
+    # closed past that
+    flow_field_cache_size = 16
+
+    # worker processes of the find_paths batch planner, None for one per core
+    batch_workers = None
+
+    # steps each agent of the cooperative planner looks ahead
+    cooperative_window = 16
 
     def __init__(self, map_file_path=None, *args, **kwargs):
         assert map_file_path, 'No map file provided, please provide the path to a .tmx file.'
-        super(KivyTiledMap, self).__init__(map_file_path, *args, **kwargs)
+        use_cache = kwargs.pop('use_cache', True)
+        streaming = kwargs.pop('streaming', False)
+        cache_path = mapcache.cache_path_for(map_file_path, self.map_cache_dir or mapcache.default_cache_dir())
+        compiled = self._load(map_file_path, cache_path, use_cache, streaming, *args, **kwargs)
+
+        # compiled from the collision layer, see get_collision_grid
+        self._collision_grid = None
+        self._collision_layer = None
+        self._collision_data = None
+        self._component_labels = None
+        # None for maps without tile costs, see get_cost_grid
+        self._cost_grid = None
+        self._cost_grid_built = False
+        self._hierarchical_pathfinder = None
+        self._jump_point_search = None
+        # find_path algorithm to its PathCache
+        self._path_caches = {}
+        self._path_planner = None
+        self._batch_planner = None
+        # frozenset of target tiles to their FlowField, least recently used
+        # first
+        self._flow_fields = collections.OrderedDict()
+        self._tile_waiters = None
+        self._cooperative_planner = None
+
+        # layer name to (layer, data, property index), see get_property_index
+        self._property_indexes = {}
+
+        self.chunk_streamer = None
+        if streaming:
+            self.chunk_streamer = ChunkStreamer(
+                [compiled.get_layer_gids(layer_index) for layer_index in range(len(self.layers))],
+                self.width, self.height, self.stream_chunk_size, self.stream_max_bytes)
+            for layer_index, layer in enumerate(self.layers):
+                layer.data = StreamedLayerData(self.chunk_streamer, layer_index)
+
+        if compiled is not None:
+            self._restore_compiled_lookups(compiled)
 
         # pull out the directory containing the map file path
         self.map_dir = os.path.dirname(map_file_path)
         Logger.debug('KivyTiledMap: directory containing map file: "{}"'.format(self.map_dir))
 
-        # call load tile images for each tileset
+        # initialize the image array, then call load tile images for each tileset
+        Logger.debug('KivyTiledMap: initializing image array')
+        self.images = [0] * self.maxgid
         for tileset in self.tilesets:
             self.loadTileImages(tileset)
 
+        for layer in self.layers:
+            if isinstance(layer, pytmx.TiledTileLayer):
+                self._get_property_index(layer.name)
+
+        # label while loading, unless the compiled map had the labels, so the
+        # first path asked for doesn't pay for it and the compiled copy
+        # written next has them
+        self.get_component_labels()
+
+        if use_cache and compiled is None:
+            self._write_compiled_map(map_file_path, cache_path)
+
+    def _load(self, map_file_path, cache_path, use_cache, streaming, *args, **kwargs):
+        """Fill the map in from its compiled copy if there is a usable one,
+        compiling it first for streaming, and otherwise by parsing the .tmx.
+        :return: The compiled map loaded from, None if the .tmx was parsed.
+        :rtype: mapcache.CompiledMap | None
+        """
+        compiled = None
+        if use_cache or streaming:
+            # a copy compiled ahead of time and shipped with the map first
+            compiled = mapcache.load_compiled_map(map_file_path) or mapcache.load_compiled_map(map_file_path, cache_path)
+        if compiled is None and streaming:
+            # streamed layers are read out of the compiled copy, make it first
+            Logger.info('KivyTiledMap: compiling {} for streaming'.format(map_file_path))
+            mapcache.compile_map(
+                pytmx.TiledMap(map_file_path, *args, **kwargs), map_file_path, cache_path,
+                self.collision_layer_name, self.collision_property, component_labels=True)
+            compiled = mapcache.load_compiled_map(map_file_path, cache_path)
+
+        if compiled is None:
+            super(KivyTiledMap, self).__init__(map_file_path, *args, **kwargs)
+        else:
+            Logger.debug('KivyTiledMap: loading compiled map {}'.format(cache_path))
+            super(KivyTiledMap, self).__init__(None, *args, **kwargs)
+            compiled.restore(self)
+            self.filename = map_file_path
+        return compiled
+
+    def _restore_compiled_lookups(self, compiled):
+        """Use the collision grid and property indexes stored in a compiled
+        map instead of building them.
+        :type compiled: mapcache.CompiledMap
+        """
+        cells = compiled.get_collision_cells(self.collision_layer_name, self.collision_property)
+        if cells is not None:
+            try:
+                layer = self.get_layer_by_name(self.collision_layer_name)
+            except ValueError:
+                layer = None
+            self._collision_grid = CollisionGrid(self.width, self.height, cells)
+            self._collision_layer = layer
+            self._collision_data = getattr(layer, 'data', None)
+
+            component_labels = compiled.get_component_labels(self.collision_layer_name, self.collision_property)
+            if component_labels is not None:
+                self._component_labels = ComponentLabels(self._collision_grid, *component_labels)
+
+        for layer_name, index in compiled.get_property_indexes().items():
+            layer = self.get_layer_by_name(layer_name)
+            self._property_indexes[layer_name] = (layer, layer.data, index)
+
+    def _write_compiled_map(self, map_file_path, cache_path):
+        property_indexes = dict((name, cached[2]) for name, cached in self._property_indexes.items())
+        try:
+            mapcache.compile_map(
+                self, map_file_path, cache_path, self.collision_layer_name, self.collision_property,
+                self.get_collision_grid().cells, property_indexes, self._component_labels)
+        except (IOError, OSError, ValueError) as e:
+            Logger.warning('KivyTiledMap: could not compile {}: {}'.format(map_file_path, e))
+        else:
+            Logger.debug('KivyTiledMap: compiled map written to {}'.format(cache_path))
+
+    def prefetch_region(self, x0, y0, x1, y1):
+        """Start loading the tiles from x0,y0 to x1,y1 in the background, if
+        the map is streaming its layers.
+        """
+        if self.chunk_streamer is not None:
+            self.chunk_streamer.prefetch(int(x0), int(y0), int(x1), int(y1))
+
     def loadTileImages(self, ts):
         """
         Loads the images in filename into Kivy Images.
-        This is a port of the code here: https://github.com/bitcraft/PyTMX/blob/master/pytmx/tmxloader.py
+        The image is decoded and cut into tiles by the shared tileset_cache,
+        so maps using the same tileset don't load it again.
 
         :type ts: pytmx.TiledTileset
         """
-        tile_image_path = self.map_dir + '/' + ts.source
+        tile_image_path = os.path.join(self.map_dir, ts.source)
         Logger.debug('KivyTiledMap: loading tile image at {}'.format(tile_image_path))
-        texture = CoreImage(tile_image_path).texture
+        texture, regions = self.tileset_cache.get_regions(
+            tile_image_path, ts.tilewidth, ts.tileheight, ts.spacing, ts.margin)
 
         ts.width, ts.height = texture.size
-        tilewidth = ts.tilewidth + ts.spacing
-        tileheight = ts.tileheight + ts.spacing
-        Logger.debug('KivyTiledMap: TiledTileSet: {}x{} with {}x{} tiles'.format(ts.width, ts.height, tilewidth, tileheight))
+        Logger.debug('KivyTiledMap: TiledTileSet: {}x{} with {}x{} tiles'.format(ts.width, ts.height, ts.tilewidth, ts.tileheight))
 
-        # some tileset images may be slightly larger than the tile area
-        # ie: may include a banner, copyright, ect.  this compensates for that
-        width = int((((ts.width - ts.margin * 2 + ts.spacing) / tilewidth) * tilewidth) - ts.spacing)
-        height = int((((ts.height - ts.margin * 2 + ts.spacing) / tileheight) * tileheight) - ts.spacing)
-        Logger.debug('KivyTiledMap: TiledTileSet: true size: {}x{}'.format(width, height))
-
-        # initialize the image array
-        Logger.debug('KivyTiledMap: initializing image array')
-        self.images = [0] * self.maxgid
-
-        p = itertools.product(
-            xrange(ts.margin, height + ts.margin, tileheight),
-            xrange(ts.margin, width + ts.margin, tilewidth)
-        )
-
-        # trim off any pixels on the right side that isn't a tile
-        # this happens if extra graphics are included on the left, but they are not actually part of the tileset
-        width -= (ts.width - ts.margin) % tilewidth
-
-        for real_gid, (y, x) in enumerate(p, ts.firstgid):
-            if x + ts.tilewidth - ts.spacing > width:
+        for real_gid, tile in enumerate(regions, ts.firstgid):
+            if tile is None:
                 continue
 
             gids = self.map_gid(real_gid)
 
             if gids:
-                # invert y for OpenGL coordinates
-                y = ts.height - y - ts.tileheight
-
-                tile = texture.get_region(x, y, ts.tilewidth, ts.tileheight)
-
                 for gid, flags in gids:
                     self.images[gid] = tile
 
     def find_tile_with_property(self, property_name, layer_name='Meta'):
-        layer = self.get_layer_by_name(layer_name)
-        index = self.layers.index(layer)
-        for tile in layer:
-            properties = self.get_tile_properties(tile[0], tile[1], index)
-            if properties and property_name in properties:
-                return tile[0], tile[1]
-
-        return None
+        tiles = self._get_property_index(layer_name).get(property_name)
+        return tiles[0] if tiles else None
 
     def find_tiles_with_property(self, property_name, layer_name='Meta'):
-        tiles = []
+        return list(self._get_property_index(layer_name).get(property_name, ()))
+
+    def get_property_index(self, layer_name='Meta'):
+        """Find the tiles having each of the properties used in a layer.
+        :return: Dictionary of property name to a list of coordinate tuples.
+        :rtype: dict
+        """
+        index = self._get_property_index(layer_name)
+        return dict((name, list(tiles)) for name, tiles in index.items())
+
+    def _get_property_index(self, layer_name):
         layer = self.get_layer_by_name(layer_name)
-        index = self.layers.index(layer)
-        for tile in layer:
-            properties = self.get_tile_properties(tile[0], tile[1], index)
-            if properties and property_name in properties:
-                tiles.append((tile[0], tile[1]))
+        cached = self._property_indexes.get(layer_name)
+        if cached and cached[0] is layer and cached[1] is layer.data:
+            return cached[2]
+
+        Logger.debug('KivyTiledMap: indexing tile properties of layer "{}"'.format(layer_name))
+        index = build_property_index(self, layer)
+        self._property_indexes[layer_name] = (layer, layer.data, index)
+        return index
+
+    def get_collision_grid(self):
+        """Get the collidable flags of the collision layer as a CollisionGrid.
+        The grid is compiled on first use and again whenever the collision
+        layer or its data gets replaced, use set_tile_gid to change single
+        tiles.
+        :rtype: CollisionGrid
+        """
+        try:
+            layer = self.get_layer_by_name(self.collision_layer_name)
+        except ValueError:
+            layer = None
+        data = getattr(layer, 'data', None)
+
+        if self._collision_grid is None:
+            cells = build_collision_cells(self, layer, self.collision_property)
+            self._collision_grid = CollisionGrid(self.width, self.height, cells)
+        elif layer is not self._collision_layer or data is not self._collision_data:
+            Logger.debug('KivyTiledMap: collision layer changed, rebuilding the collision grid')
+            self._collision_grid.update_cells(build_collision_cells(self, layer, self.collision_property))
+        else:
+            return self._collision_grid
 
-        return tiles
+        self._collision_layer = layer
+        self._collision_data = data
+        return self._collision_grid
+
+    def get_component_labels(self):
+        """Get the connected components of the walkable tiles of the
+        collision grid, labelled when the map loads, or restored from its
+        compiled copy, and kept up to date with it from then on.
+        :rtype: ComponentLabels
+        """
+        grid = self.get_collision_grid()
+        if self._component_labels is None:
+            self._component_labels = ComponentLabels(grid)
+        return self._component_labels
+
+    def is_reachable(self, start_x, start_y, dest_x, dest_y):
+        """Check if there's a path between two tiles without searching for
+        it.
+        :rtype: bool
+        """
+        return self.get_component_labels().is_connected((start_x, start_y), (dest_x, dest_y))
+
+    def get_cost_grid(self):
+        """Get the cost of stepping onto each tile, read from the tiles of
+        the cost layer on first use and kept up to date by set_tile_gid.
+        Only the 'astar' algorithm weighs paths by it, 'jps', 'hpa' and the
+        flow fields count every tile as 1.
+        :return: The costs, None if no tile of the map has one.
+        :rtype: CostGrid
+        """
+        if not self._cost_grid_built:
+            self._cost_grid_built = True
+            try:
+                layer = self.get_layer_by_name(self.cost_layer_name)
+            except ValueError:
+                layer = None
+            rows = None
+            if layer is not None and self.chunk_streamer is not None:
+                # read past the chunks, a whole layer would go through them all
+                rows = self.chunk_streamer.iter_rows(self.layers.index(layer))
+            costs = build_cost_cells(self, layer, self.cost_property, rows)
+            if costs is not None:
+                self._cost_grid = CostGrid(self.width, self.height, costs)
+        return self._cost_grid
+
+    def get_hierarchical_pathfinder(self):
+        """Get the HPA* path finder of the collision grid, built on first use
+        and kept up to date with it from then on.
+        :rtype: HierarchicalPathfinder
+        """
+        if self._hierarchical_pathfinder is None:
+            self._hierarchical_pathfinder = HierarchicalPathfinder(self.get_collision_grid(), self.hpa_cluster_size)
+        return self._hierarchical_pathfinder
+
+    def get_jump_point_search(self):
+        """Get the Jump Point Search of the collision grid, its jump tables
+        are built by the first search and kept up to date with the grid.
+        Building them takes a few hundred milliseconds on a 256x256 map,
+        call its build_tables while loading to not have a query pay for it.
+        :rtype: JumpPointSearch
+        """
+        if self._jump_point_search is None:
+            self._jump_point_search = JumpPointSearch(self.get_collision_grid())
+        return self._jump_point_search
+
+    def get_path_cache(self, algorithm='astar'):
+        """Get the cache of the paths find_path found with an algorithm.
+        :rtype: PathCache
+        """
+        path_cache = self._path_caches.get(algorithm)
+        if path_cache is None:
+            path_cache = self._path_caches[algorithm] = PathCache(self.get_collision_grid(), self.path_cache_size)
+        return path_cache
+
+    def get_path_planner(self):
+        """Get the planner running find_path_async searches in the background.
+        :rtype: PathPlanner
+        """
+        if self._path_planner is None:
+            self._path_planner = PathPlanner(self.get_collision_grid(), self.hpa_cluster_size, self.get_cost_grid())
+        return self._path_planner
+
+    def get_batch_planner(self):
+        """Get the process pool find_paths solves batches of queries on,
+        started on first use. Call its close method when done with the map.
+        :rtype: BatchPlanner
+        """
+        if self._batch_planner is None:
+            self._batch_planner = BatchPlanner(
+                self.get_collision_grid(), self.batch_workers, self.hpa_cluster_size, self.get_cost_grid())
+        return self._batch_planner
+
+    def get_flow_field(self, targets):
+        """Get the flow field leading to the nearest of some tiles, such as
+        find_tiles_with_property('CustomerWaitingArea'), built on first use
+        and kept up to date with the collision grid. Requires numpy.
+
+        Only the flow_field_cache_size most recently used fields are kept,
+        the others are closed and no longer follow the grid, so get the
+        field again rather than holding on to it.
+        :param targets: Coordinate tuples of the tiles to head to.
+        :type targets: list
+        :rtype: FlowField
+        """
+        key = frozenset(tuple(target) for target in targets)
+        flow_field = self._flow_fields.pop(key, None)
+        if flow_field is None:
+            flow_field = FlowField(self.get_collision_grid(), key)
+        self._flow_fields[key] = flow_field  # most recently used
+        while len(self._flow_fields) > self.flow_field_cache_size:
+            self._flow_fields.popitem(last=False)[1].close()
+        return flow_field
+
+    def get_cooperative_planner(self):
+        """Get the planner giving many agents paths that never run into
+        each other, see CooperativeMovement.
+        :rtype: CooperativePlanner
+        """
+        if self._cooperative_planner is None:
+            self._cooperative_planner = CooperativePlanner(self.get_collision_grid(), self.cooperative_window)
+        return self._cooperative_planner
+
+    def get_tile_waiters(self):
+        """Get the waits on tiles of the collision grid, which entities that
+        can't get anywhere use to find out when to look for a path again.
+        :rtype: TileWaiters
+        """
+        if self._tile_waiters is None:
+            self._tile_waiters = TileWaiters(self.get_collision_grid())
+        return self._tile_waiters
+
+    def set_tile_gid(self, x, y, gid, layer_name='Meta'):
+        """Change the tile at x,y in a layer, keeping the collision grid in
+        sync.
+        :param gid: The pytmx gid of the new tile, 0 to clear it.
+        :type gid: int
+        """
+        layer = self.get_layer_by_name(layer_name)
+        layer.data[y][x] = gid
+
+        # the index is rebuilt on the next lookup
+        self._property_indexes.pop(layer_name, None)
+
+        if layer_name == self.collision_layer_name:
+            properties = self.get_tile_properties_by_gid(gid)
+            blocked = bool(properties) and self.collision_property in properties
+            self.get_collision_grid().set_blocked(x, y, blocked)
+
+        if layer_name == self.cost_layer_name and self._cost_grid is not None:
+            cost = tile_cost(self.get_tile_properties_by_gid(gid), self.cost_property)
+            if cost != self._cost_grid.get_cost(x, y):
+                self._cost_grid.set_cost(x, y, cost)
+                # cached paths may no longer be the cheapest
+                path_cache = self._path_caches.get('astar')
+                if path_cache is not None:
+                    path_cache.clear()
+
+    def set_collidable(self, x, y, collidable=True):
+        """Make a tile collidable or walkable without changing the tile,
+        such as when a crop grows on it. The path finders, caches and moving
+        entities pick the change up from the collision grid. Replacing the
+        collision layer resets it.
+        :type collidable: bool
+        """
+        self.get_collision_grid().set_blocked(x, y, collidable)
 
     def tile_has_property(self, x, y, property_name, layer_name='Meta'):
         """Check if the tile coordinates passed in represent a collision.
         :return: Boolean representing whether or not there was a collision.
         :rtype: bool
         """
+        if property_name == self.collision_property and layer_name == self.collision_layer_name:
+            grid = self.get_collision_grid()
+            if grid.in_bounds(x, y):
+                return bool(grid.cells[y * grid.width + x])
+
         layer = self.get_layer_by_name(layer_name)
         layer_index = self.layers.index(layer)
 
@@ -117,6 +477,8 @@ class KivyTiledMap(pytmx.TiledMap):
         return property_name in properties if properties else False
 
     def valid_move(self, x, y, debug=False):
+        grid = self.get_collision_grid()
+
         # check if the tile is out of bounds
         if x < 0 or x > self.width - 1 or y < 0 or y > self.height - 1:
             if debug:
@@ -124,7 +486,7 @@ class KivyTiledMap(pytmx.TiledMap):
             return False
 
         # check if the tile has the property 'Collidable'
-        if self.tile_has_property(x, y, 'Collidable'):
+        if grid.cells[y * grid.width + x]:
             if debug:
                 Logger.debug('KivyTiledMap: Move {},{} collides with map object'.format(x, y))
             return False
@@ -136,35 +498,35 @@ class KivyTiledMap(pytmx.TiledMap):
         :return: A list of coordinate tuples adjacent to x,y.
         :rtype: list
         """
-        adjacent_tiles = []
+        return self.get_collision_grid().neighbors(x, y)
 
-        # try each direction and add to the list if they are valid_moves
-        # up
-        if self.valid_move(x, y - 1):
-            adjacent_tiles.append((x, y - 1))
 
-        # down
-        if self.valid_move(x, y + 1):
-            adjacent_tiles.append((x, y + 1))
+class TileMap(Widget):
+    """Creates a Kivy grid and puts the tiles in a KivyTiledMap in it.
 
-        # left
-        if self.valid_move(x - 1, y):
-            adjacent_tiles.append((x - 1, y))
+    The map is drawn in square chunks of chunk_size tiles, each chunk of each
+    layer in its own InstructionGroup. Only the chunks overlapping the window
+    are on the canvas, they are swapped in and out as the map or any of its
+    parents moves. A chunk_size of None draws the whole map as one chunk.
 
-        # right
-        if self.valid_move(x + 1, y):
-            adjacent_tiles.append((x + 1, y))
+    The 'rectangles' renderer draws every tile with its own Rectangle. The
+    'mesh' renderer batches the tiles of a chunk into one Mesh per tileset
+    texture, so each layer only costs a few draw calls.
 
-        return adjacent_tiles
+    Chunks are built at the tile size of the map and drawn through a single
+    Scale instruction, so resizing or zooming only updates that instruction.
+    """
+    RENDERERS = ('rectangles', 'mesh')
 
+    # kivy meshes index their vertices with unsigned shorts, 4 vertices per tile
+    MESH_MAX_TILES = 65536 // 4
 
-class TileMap(Widget):
-    """Creates a Kivy grid and puts the tiles in a KivyTiledMap in it."""
     scaled_tile_size = ListProperty()
 
-    def __init__(self, map_file_path=None, **kwargs):
+    def __init__(self, map_file_path=None, chunk_size=16, renderer='rectangles', streaming=False, **kwargs):
         assert map_file_path, 'No map file path provided to TileMap. Please pass in a path to a .tmx file.q'
-        self.tiled_map = KivyTiledMap(map_file_path)
+        assert renderer in self.RENDERERS, 'Unknown TileMap renderer "{}", use one of {}'.format(renderer, self.RENDERERS)
+        self.tiled_map = KivyTiledMap(map_file_path, streaming=streaming)
         super(TileMap, self).__init__(**kwargs)
 
         self._scale = 1.0
@@ -174,6 +536,22 @@ class TileMap(Widget):
         self.scaled_map_width = self.scaled_tile_size[0] * self.tile_map_size[0]
         self.scaled_map_height = self.scaled_tile_size[1] * self.tile_map_size[1]
 
+        self.renderer = renderer
+        self.chunk_size = chunk_size or max(self.tile_map_size)
+        # (layer index, group) for every visible layer, chunks in view are added to the group
+        self._layer_groups = []
+        # (layer index, chunk x, chunk y) to the chunk's group, None if it has no tiles
+        self._chunks = {}
+        # (chunk x, chunk y) of the chunks on the canvas
+        self._visible_chunks = set()
+        # scales the chunks from the map's tile size to scaled_tile_size
+        self._scale_instruction = None
+
+        # widgets whose movement changes what part of the map is in view
+        self._viewport_bindings = []
+        self._update_chunks_trigger = Clock.create_trigger(self._update_visible_chunks)
+        self.bind(pos=self._update_chunks_trigger)
+
     @property
     def scale(self):
         return self._scale
@@ -181,45 +559,228 @@ class TileMap(Widget):
     @scale.setter
     def scale(self, value):
         self._scale = value
-        self.scaled_tile_size = (self.tile_size[0] * self.scale, self.tile_size[1] * self.scale)
-        self.scaled_map_width = self.scaled_tile_size[0] * self.tile_map_size[0]
-        self.scaled_map_height = self.scaled_tile_size[1] * self.tile_map_size[1]
-        self.on_size()
+        self._set_scaled_tile_size(self.tile_size[0] * self.scale, self.tile_size[1] * self.scale)
 
     def on_size(self, *args):
-        Logger.debug('TileMap: Re-drawing')
-
         screen_tile_size = self.get_root_window().width / 8
-        self.scaled_tile_size = (screen_tile_size, screen_tile_size)
+        self._set_scaled_tile_size(screen_tile_size, screen_tile_size)
+
+    def _set_scaled_tile_size(self, width, height):
+        self.scaled_tile_size = (width, height)
         self.scaled_map_width = self.scaled_tile_size[0] * self.tile_map_size[0]
         self.scaled_map_height = self.scaled_tile_size[1] * self.tile_map_size[1]
 
+        if self._scale_instruction is None:
+            self.redraw()
+        else:
+            Logger.debug('TileMap: Re-scaling')
+            self._update_scale_instruction()
+            self._update_visible_chunks()
+
+    def _update_scale_instruction(self):
+        self._scale_instruction.x = float(self.scaled_tile_size[0]) / self.tile_size[0]
+        self._scale_instruction.y = float(self.scaled_tile_size[1]) / self.tile_size[1]
+
+    def redraw(self):
+        """Throw away all the instructions and draw the map again, for when
+        the tiles or layers themselves changed.
+        """
+        Logger.debug('TileMap: Re-drawing')
+
         self.canvas.clear()
-        with self.canvas:
-            layer_idx = 0
-            for layer in self.tiled_map.layers:
-                if not layer.visible:
-                    continue  # skip the layer if it's not visible
-
-                # set up the opacity of the tiled layer
-                Color(1.0, 1.0, 1.0, layer.opacity)
-
-                # iterate through the tiles in the layer
-                for tile in layer:
-                    tile_x = tile[0]
-                    tile_y = tile[1]
-                    try:
-                        texture = self.tiled_map.get_tile_image(tile_x, tile_y, layer_idx)
-                    except AttributeError:
-                        continue  # keep going if the texture is empty
-
-                    # calculate the drawing parameters of the tile
-                    draw_pos = self._get_tile_pos(tile_x, tile_y)
-                    draw_size = self.scaled_tile_size
-
-                    # create a rectangle instruction for the gpu
-                    Rectangle(texture=texture, pos=draw_pos, size=draw_size)
-                layer_idx += 1
+        self._chunks = {}
+        self._visible_chunks = set()
+        self._layer_groups = []
+
+        self.canvas.add(PushMatrix())
+        self._scale_instruction = Scale(origin=(0, 0))
+        self._update_scale_instruction()
+        self.canvas.add(self._scale_instruction)
+
+        for layer_idx, layer in enumerate(self.tiled_map.layers):
+            if not layer.visible or not isinstance(layer, pytmx.TiledTileLayer):
+                continue  # skip the layer if it's not visible
+
+            # set up the opacity of the tiled layer
+            group = InstructionGroup()
+            group.add(Color(1.0, 1.0, 1.0, layer.opacity))
+            self.canvas.add(group)
+            self._layer_groups.append((layer_idx, group))
+
+        self.canvas.add(PopMatrix())
+        self._update_visible_chunks()
+
+    def on_parent(self, *args):
+        # rebind to everything between this widget and the window
+        for widget, name in self._viewport_bindings:
+            widget.unbind(**{name: self._update_chunks_trigger})
+        self._viewport_bindings = []
+
+        widget = self.parent
+        while widget is not None:
+            properties = widget.properties()
+            for name in ('pos', 'size', 'transform'):
+                if name in properties:
+                    widget.bind(**{name: self._update_chunks_trigger})
+                    self._viewport_bindings.append((widget, name))
+            if widget.parent is widget:
+                break  # the window is its own parent
+            widget = widget.parent
+
+        self._update_chunks_trigger()
+
+    def refresh_viewport(self):
+        """Update the chunks on the canvas right away, for when the view
+        changed in a way the map isn't bound to.
+        """
+        self._update_visible_chunks()
+
+    def _update_visible_chunks(self, *args):
+        in_view = self._get_chunks_in_view()
+        if in_view == self._visible_chunks:
+            return
+
+        # streamed maps are too big to keep every chunk drawn so far
+        streaming = self.tiled_map.chunk_streamer is not None
+        for chunk_x, chunk_y in self._visible_chunks - in_view:
+            self._hide_chunk(chunk_x, chunk_y, evict=streaming)
+
+        for chunk_x, chunk_y in in_view - self._visible_chunks:
+            for layer_idx, group in self._layer_groups:
+                key = (layer_idx, chunk_x, chunk_y)
+                if key not in self._chunks:
+                    self._chunks[key] = self._build_chunk(layer_idx, chunk_x, chunk_y)
+                chunk = self._chunks[key]
+                if chunk is not None:
+                    group.add(chunk)
+
+        Logger.debug('TileMap: {} chunks in view'.format(len(in_view)))
+        self._visible_chunks = in_view
+
+        if streaming and in_view:
+            self._prefetch_around(in_view)
+
+    def _hide_chunk(self, chunk_x, chunk_y, evict=False):
+        """Take a chunk of every layer off the canvas.
+        :param evict: Whether or not to drop its instructions too, to be
+            built again from the map the next time it's in view.
+        :type evict: bool
+        """
+        for layer_idx, group in self._layer_groups:
+            if evict:
+                chunk = self._chunks.pop((layer_idx, chunk_x, chunk_y), None)
+            else:
+                chunk = self._chunks.get((layer_idx, chunk_x, chunk_y))
+            if chunk is not None:
+                group.remove(chunk)
+
+    def _prefetch_around(self, chunks):
+        """Load the ring of chunks around some chunks of a streamed map
+        before the view gets there.
+        """
+        size = self.chunk_size
+        chunks_x = [chunk[0] for chunk in chunks]
+        chunks_y = [chunk[1] for chunk in chunks]
+        self.tiled_map.prefetch_region(
+            (min(chunks_x) - 1) * size, (min(chunks_y) - 1) * size,
+            (max(chunks_x) + 2) * size - 1, (max(chunks_y) + 2) * size - 1)
+
+    def _get_chunks_in_view(self):
+        """Find the chunks overlapping the window, taking the transforms of
+        any parents into account.
+        :return: Set of (chunk x, chunk y) tuples.
+        :rtype: set
+        """
+        window = self.get_root_window()
+        if window is None or not self._layer_groups:
+            return set()
+
+        corners = [self.to_widget(x, y) for x, y in ((0, 0), (window.width, 0), (0, window.height), (window.width, window.height))]
+        xs = [corner[0] for corner in corners]
+        ys = [corner[1] for corner in corners]
+
+        tile_width, tile_height = self.scaled_tile_size
+        map_width, map_height = self.tile_map_size
+        first_column = max(0, int(math.floor(min(xs) / tile_width)))
+        last_column = min(map_width - 1, int(math.floor(max(xs) / tile_width)))
+        # rows count down from the top of the map
+        first_row = max(0, map_height - 1 - int(math.floor(max(ys) / tile_height)))
+        last_row = min(map_height - 1, map_height - 1 - int(math.floor(min(ys) / tile_height)))
+        if first_column > last_column or first_row > last_row:
+            return set()
+
+        size = self.chunk_size
+        return set(
+            (chunk_x, chunk_y)
+            for chunk_x in range(first_column // size, last_column // size + 1)
+            for chunk_y in range(first_row // size, last_row // size + 1)
+        )
+
+    def _build_chunk(self, layer_idx, chunk_x, chunk_y):
+        """Create the instructions for the tiles of a layer in a chunk.
+        :return: The group of instructions, None if there are no tiles.
+        :rtype: InstructionGroup | None
+        """
+        layer = self.tiled_map.layers[layer_idx]
+        images = self.tiled_map.images
+        size = self.chunk_size
+
+        tiles = []
+        for tile_y in range(chunk_y * size, min((chunk_y + 1) * size, self.tile_map_size[1])):
+            row = layer.data[tile_y]
+            for tile_x in range(chunk_x * size, min((chunk_x + 1) * size, self.tile_map_size[0])):
+                gid = row[tile_x]
+                texture = images[gid] if gid else None
+                if texture:  # keep going if the texture is empty
+                    tiles.append((tile_x, tile_y, texture))
+
+        if not tiles:
+            return None
+
+        group = InstructionGroup()
+        if self.renderer == 'mesh':
+            for mesh in self._build_meshes(tiles):
+                group.add(mesh)
+        else:
+            for tile_x, tile_y, texture in tiles:
+                # create a rectangle instruction for the gpu
+                group.add(Rectangle(texture=texture, pos=self._get_unscaled_tile_pos(tile_x, tile_y), size=self.tile_size))
+        return group
+
+    def _build_meshes(self, tiles):
+        """Batch tiles into one Mesh per texture they're cut from.
+        :param tiles: List of (tile x, tile y, texture region) tuples.
+        :rtype: list
+        """
+        tile_width, tile_height = self.tile_size
+
+        # regions of the same texture share its id, any of them can be bound
+        batches = {}
+        meshes = []
+        for tile_x, tile_y, texture in tiles:
+            batch = batches.get(texture.id)
+            if batch is None:
+                batch = batches[texture.id] = (texture, [], [])
+            region, vertices, indices = batch
+
+            x, y = self._get_unscaled_tile_pos(tile_x, tile_y)
+            u0, v0, u1, v1, u2, v2, u3, v3 = texture.tex_coords
+            first = len(vertices) // 4
+            vertices.extend((
+                x, y, u0, v0,
+                x + tile_width, y, u1, v1,
+                x + tile_width, y + tile_height, u2, v2,
+                x, y + tile_height, u3, v3,
+            ))
+            indices.extend((first, first + 1, first + 2, first + 2, first + 3, first))
+
+            if len(indices) // 6 == self.MESH_MAX_TILES:
+                meshes.append(Mesh(texture=region, vertices=vertices, indices=indices, mode='triangles'))
+                del batches[texture.id]
+
+        for region, vertices, indices in batches.values():
+            meshes.append(Mesh(texture=region, vertices=vertices, indices=indices, mode='triangles'))
+        return meshes
 
     def _get_tile_pos(self, x, y):
         """Get the tile position relative to the widget."""
@@ -227,6 +788,14 @@ class TileMap(Widget):
         pos_y = (self.tile_map_size[1] - y - 1) * self.scaled_tile_size[1]
         return pos_x, pos_y
 
+    def _get_unscaled_tile_pos(self, x, y):
+        """Get the tile position at the map's own tile size, which is what
+        the chunks are built at.
+        """
+        pos_x = x * self.tile_size[0]
+        pos_y = (self.tile_map_size[1] - y - 1) * self.tile_size[1]
+        return pos_x, pos_y
+
     def get_tile_position(self, x, y):
         """Get the tile position according to the window."""
         return self._get_tile_pos(x, y)
@@ -242,29 +811,36 @@ class TileMap(Widget):
         pos = self.to_local(*pos)
         Logger.debug('TileMap: Finding tile at position {}'.format(pos))
 
-        found_x = False
-        tile_x = 0
-        while tile_x < self.tiled_map.width:
-            tile_x_right = (tile_x + 1) * self.scaled_tile_size[0]
-            if tile_x_right < pos[0]:
-                tile_x += 1
-            else:
-                found_x = True
-                break
-
-        # start at the bottom of the map, same as kivy coords
-        tile_y = self.tiled_map.height
-        while tile_y != 0:
-            # calculate how far up from the bottom of the widget the tile is
-            tile_y_top = (self.tiled_map.height - tile_y) * self.scaled_tile_size[1]
-            if tile_y_top < pos[1]:
-                tile_y -= 1
-            else:
-                if found_x:
-                    return tile_x, tile_y
-                break
+        # a position on the edge between two tiles belongs to the left or
+        # lower one, positions left of or below the map clamp to its edge
+        tile_x = max(0, int(math.ceil(pos[0] / self.scaled_tile_size[0])) - 1)
+        rows_from_bottom = max(1, int(math.ceil(pos[1] / self.scaled_tile_size[1])))
+        if tile_x >= self.tiled_map.width or rows_from_bottom > self.tiled_map.height:
+            return None
+
+        return tile_x, self.tiled_map.height - rows_from_bottom
+
+    def get_tiles_at_positions(self, positions):
+        """Find out the tile coordinates of many positions at once, same as
+        get_tile_at_position. Requires numpy.
+        :param positions: The screen positions to get the tiles of.
+        :type positions: numpy.ndarray | list
+        :return: Integer array of shape (n, 2) holding the tile coordinates,
+            with (-1, -1) for positions that aren't on the map.
+        :rtype: numpy.ndarray
+        """
+        if numpy is None:
+            raise ImportError('TileMap.get_tiles_at_positions requires numpy')
 
-        return None
+        # widgets only ever translate to local coords
+        positions = numpy.asarray(positions, dtype=float).reshape(-1, 2) + self.to_local(0, 0)
+
+        tiles_x = numpy.maximum(numpy.ceil(positions[:, 0] / self.scaled_tile_size[0]).astype(int) - 1, 0)
+        rows_from_bottom = numpy.maximum(numpy.ceil(positions[:, 1] / self.scaled_tile_size[1]).astype(int), 1)
+
+        tiles = numpy.column_stack((tiles_x, self.tiled_map.height - rows_from_bottom))
+        tiles[(tiles_x >= self.tiled_map.width) | (rows_from_bottom > self.tiled_map.height)] = -1
+        return tiles
 
 
 class TileMovement(Widget):
@@ -277,6 +853,33 @@ class TileMovement(Widget):
     moving = BooleanProperty(False)
     path = ListProperty()  # list of nodes to the destination tile
 
+    # tiles around the mover to prefetch on streamed maps
+    prefetch_radius = 16
+
+    # the find_path algorithm, see PATH_ALGORITHMS
+    path_algorithm = 'astar'
+
+    # find paths in the background with find_path_async, the path starts
+    # being walked a frame or more after move_to_tile is called
+    async_planning = False
+
+    # keep a D* Lite search for the whole move, so tiles becoming collidable
+    # on the way only repair the path ahead instead of failing the move
+    incremental_planning = False
+
+    # walk straight lines to the farthest tile of the path in sight instead
+    # of tile by tile, one animation for each line
+    smooth_paths = False
+
+    # seconds to walk the width of a tile
+    step_duration = 0.5
+
+    # a step to the direction of the move making it
+    DIRECTIONS = {
+        (0, -1): UP, (0, 1): DOWN,
+        (-1, 0): LEFT, (1, 0): RIGHT,
+    }
+
     def __init__(self, tile_map, **kwargs):
         super(TileMovement, self).__init__(**kwargs)
 
@@ -297,6 +900,15 @@ class TileMovement(Widget):
         # debugging via rectangle drawing
         self._debug = False
 
+        # the path being planned in the background, see async_planning
+        self._plan_request = None
+        # the search of the current move, see incremental_planning
+        self._incremental_planner = None
+        # waiting for the map to change when there's no path, see move_to_tile
+        self._tile_wait = None
+        # the straight line being walked, see smooth_paths
+        self._line = None
+
     def on_complete(self):
         pass
 
@@ -310,6 +922,7 @@ class TileMovement(Widget):
             self._move_to_tile()
         elif self.current_tile == self.destination_tile:
             Logger.debug('TileMovement: Move complete')
+            self._close_incremental_planner()
             self.dispatch('on_complete')
 
     def move(self, direction):
@@ -324,6 +937,10 @@ class TileMovement(Widget):
         self.direction = direction
         new_x, new_y = self.get_tile_in_direction(self.direction)
 
+        # the tile may have become collidable since the path was found
+        if not self.tile_map.tiled_map.valid_move(new_x, new_y, debug=True):
+            return False
+
         # move the destination tile to keep coherence
         if self.destination_tile == self.current_tile:
             self.destination_tile.x = new_x
@@ -331,6 +948,7 @@ class TileMovement(Widget):
 
         self.current_tile.x = new_x
         self.current_tile.y = new_y
+        self._prefetch_around(new_x, new_y)
 
         coordinates = self.tile_map.get_tile_position(self.current_tile.x, self.current_tile.y)
         Logger.debug('TileMovement: Moving to {} at {}'.format(self.current_tile, coordinates))
@@ -338,15 +956,137 @@ class TileMovement(Widget):
         # mark moving variable in case anyone is watching it
         self.moving = True
 
-        animation = Animation(pos=coordinates, duration=0.5)
+        animation = Animation(pos=coordinates, duration=self.step_duration)
         animation.bind(on_complete=lambda *args: self.on_animation_complete())
         animation.start(self)
+        return True
+
+    def _move_in_line(self, x, y):
+        """Walk to a tile in line of sight in a straight line, at the same
+        speed as moving a tile at a time.
+
+        Like a move checks the tile it steps onto, the tiles the entity
+        overlaps on the way are each checked a tile before it gets to them,
+        and current_tile follows the tile it's closest to. One that became
+        collidable since the line was chosen stops the entity on the last
+        tile it got to, to find a path from there.
+        """
+        start_x, start_y = self.current_tile.x, self.current_tile.y
+        x_differential = x - start_x
+        y_differential = y - start_y
+        if abs(x_differential) > abs(y_differential):
+            self.direction = self.LEFT if x_differential < 0 else self.RIGHT
+        else:
+            self.direction = self.UP if y_differential < 0 else self.DOWN
+
+        coordinates = self.tile_map.get_tile_position(x, y)
+        Logger.debug('TileMovement: Moving in a line to {} at {}'.format((x, y), coordinates))
+
+        self.moving = True
+
+        distance = math.sqrt(x_differential ** 2 + y_differential ** 2)
+        # the tiles overlapped in the order they're come to, and how many of
+        # them were checked
+        self._line = [(start_x, start_y), (x, y), distance, sweep_order((start_x, start_y), (x, y)), 0]
+        animation = Animation(pos=coordinates, duration=self.step_duration * distance)
+        animation.bind(on_progress=self._on_line_progress)
+        animation.bind(on_complete=lambda *args: self._on_line_complete())
+        self._check_line(0)
+        animation.start(self)
+
+    def _check_line(self, progression):
+        """Check the tiles of the line the entity comes to within a tile of
+        walking, and follow the tile it's closest to.
+        :return: Whether or not they're all walkable.
+        :rtype: bool
+        """
+        (start_x, start_y), (x, y), distance, entries, checked = self._line
+        tiled_map = self.tile_map.tiled_map
+        ahead = progression + 1.0 / distance
+        while checked < len(entries) and entries[checked][0] <= ahead:
+            tile_x, tile_y = entries[checked][1]
+            if not tiled_map.valid_move(tile_x, tile_y, debug=True):
+                self._line[4] = checked
+                return False
+            checked += 1
+        self._line[4] = checked
+
+        tile_x = int(math.floor(start_x + (x - start_x) * progression + 0.5))
+        tile_y = int(math.floor(start_y + (y - start_y) * progression + 0.5))
+        if (tile_x, tile_y) != (self.current_tile.x, self.current_tile.y):
+            self.current_tile.x = tile_x
+            self.current_tile.y = tile_y
+            self._prefetch_around(tile_x, tile_y)
+        return True
+
+    def _on_line_progress(self, animation, widget, progression):
+        if self._line is None or self._check_line(progression):
+            return
+
+        # the tile the entity is closest to was checked before it got onto
+        # it, stop there
+        Logger.debug('TileMovement: Line blocked, stopping at {}'.format(self.current_tile))
+        self._line = None
+        animation.cancel(self)
+        coordinates = self.tile_map.get_tile_position(self.current_tile.x, self.current_tile.y)
+        animation = Animation(pos=coordinates, duration=self.step_duration * 0.5)
+        animation.bind(on_complete=lambda *args: self._on_line_blocked())
+        animation.start(self)
+
+    def _on_line_complete(self):
+        x, y = self._line[1]
+        self._line = None
+        self.current_tile.x = x
+        self.current_tile.y = y
+        self.on_animation_complete()
+
+    def _on_line_blocked(self):
+        Logger.debug('TileMovement: Move failed, finding a different path')
+        self.path = []
+        self.moving = False
+        self.move_to_tile(self.destination_tile, retry=True)
+
+    def _repair_path(self):
+        """Search the path ahead again where tiles changed under it, when
+        keeping a D* Lite search for the move, see incremental_planning.
+        """
+        planner = self._incremental_planner
+        if planner is None:
+            return
+        planner.move_to((self.current_tile.x, self.current_tile.y))
+        if planner.has_changes():
+            Logger.debug('TileMovement: Map changed, repairing the path')
+            self.path = planner.find_path()[1:]
+
+    def _take_line(self):
+        """Take the tiles of the path up to the farthest one in sight off it,
+        to walk there in a straight line, see smooth_paths.
+        :return: The coordinate tuple of the tile, None if it's the next one.
+        :rtype: tuple
+        """
+        # the line is checked against the map as it is now, a tile in the way
+        # leaves only the next step, which fails as usual
+        tiled_map = self.tile_map.tiled_map
+        index = farthest_visible(
+            tiled_map.get_collision_grid(), (self.current_tile.x, self.current_tile.y), self.path,
+            tiled_map.get_cost_grid())
+        if not index:
+            return None
+        tile = self.path[index]
+        del self.path[:index + 1]
+        return tile
 
     def _move_to_tile(self):
+        self._repair_path()
         if not self.path:
             self.move_to_tile(self.destination_tile)
             return
 
+        line_end = self._take_line() if self.smooth_paths else None
+        if line_end is not None:
+            self._move_in_line(*line_end)
+            return
+
         next_tile_x, next_tile_y = self.path[0]
         # this inherently moves up/down before left/right
         x_differential = next_tile_x - self.current_tile.x
@@ -365,14 +1105,16 @@ class TileMovement(Widget):
         if not move_succeeded:
             Logger.debug('TileMovement: Move failed, finding a different path')
             self.path = []
-            Clock.schedule_once(lambda *args: self._move_to_tile(), 1)
+            self.moving = False
+            self.move_to_tile(self.destination_tile, retry=True)
             return False
         else:
             self.path.pop(0)
 
     def move_to_tile(self, tile, retry=False):
         """Move to the specified tile, if possible.
-        :param retry: Whether or not to keep attempting the move every second.
+        :param retry: Whether or not to attempt the move again when a tile
+            becomes walkable, until it's possible.
         :type retry: bool
         :return: Whether or not the move is possible.
         :rtype: bool
@@ -384,17 +1126,55 @@ class TileMovement(Widget):
         self.destination_tile.x = tile[0]
         self.destination_tile.y = tile[1]
 
-        def move_to_tile(*args):
-            self.move_to_tile(self.destination_tile)
+        # a new destination makes the path still being planned useless
+        if self._plan_request is not None:
+            self._plan_request.cancel()
+            self._plan_request = None
+        self._close_incremental_planner()
+        self._cancel_tile_wait()
 
         # find a path
-        self.path = find_path(self.tile_map, self.current_tile.x, self.current_tile.y, tile[0], tile[1])
+        tiled_map = self.tile_map.tiled_map
+        start_x, start_y = self.current_tile.x, self.current_tile.y
+        if self.incremental_planning:
+            path = []
+            if tiled_map.is_reachable(start_x, start_y, tile[0], tile[1]):
+                self._incremental_planner = DStarLite(
+                    tiled_map.get_collision_grid(), (start_x, start_y), (tile[0], tile[1]))
+                path = self._incremental_planner.find_path()
+            return self._on_path_found(path, retry)
+
+        if self.async_planning:
+            self._plan_request = find_path_async(
+                tiled_map, start_x, start_y, tile[0], tile[1],
+                lambda path: self._on_path_found(path, retry), self.path_algorithm)
+            return
+
+        path = find_path(tiled_map, start_x, start_y, tile[0], tile[1], self.path_algorithm)
+        return self._on_path_found(path, retry)
+
+    def _on_path_found(self, path, retry):
+        self._plan_request = None
+
+        def move_to_tile(*args):
+            self.move_to_tile(self.destination_tile, retry)
+
+        # the path was planned in the background while still moving to a
+        # tile, it starts from the tile moved from
+        current_tile = (self.current_tile.x, self.current_tile.y)
+        if path and tuple(path[0]) != current_tile:
+            if current_tile not in path:
+                move_to_tile()
+                return
+            path = path[path.index(current_tile):]
+
+        self.path = path
 
         if not self.path:
             Logger.debug('TileMovement: Move failed, no path')
             if retry:
-                Logger.debug('TileMovement: Trying to move again in a second')
-                Clock.schedule_once(move_to_tile, 1)
+                Logger.debug('TileMovement: Trying to move again when a tile becomes walkable')
+                self._wait_for_path()
             return False
 
         # pop the first tile in the path, which is the current one
@@ -403,6 +1183,59 @@ class TileMovement(Widget):
             self.path.pop(0)
             self._move_to_tile()
 
+    def _wait_for_path(self):
+        """Move to the destination as soon as it can be reached. Only tiles
+        becoming walkable can open up a path, and only next to the component
+        of the tile moved from, so those are the tiles waited on. Whether the
+        destination came within reach is a check of the map's connected
+        components, so nothing is searched until it did.
+        """
+        tiled_map = self.tile_map.tiled_map
+
+        def on_tile_changed(wait, x, y, blocked):
+            # the components are brought up to date with the change by the
+            # grid listener after this one, check them before the next frame
+            self._tile_wait = None
+            Clock.schedule_once(check, -1)
+
+        def check(*args):
+            if self._tile_wait is not None or self.moving:
+                return
+            destination_x, destination_y = self.destination_tile.x, self.destination_tile.y
+            if tiled_map.is_reachable(self.current_tile.x, self.current_tile.y, destination_x, destination_y):
+                self.move_to_tile((destination_x, destination_y), retry=True)
+            else:
+                self._wait_for_path()
+
+        # a tile joining the component is next to it, within a tile of the
+        # rectangle it covers; standing on a collidable tile, any of the
+        # components around it can grow
+        components = tiled_map.get_component_labels()
+        label = components.label(self.current_tile.x, self.current_tile.y)
+        bounds = components.bounds(label) if label != BLOCKED else None
+        if bounds is not None:
+            x0, y0, x1, y1 = bounds
+            bounds = (x0 - 1, y0 - 1, x1 + 1, y1 + 1)
+
+        self._cancel_tile_wait()
+        self._tile_wait = tiled_map.get_tile_waiters().wait(on_tile_changed, bounds=bounds, blocked=False)
+
+    def _cancel_tile_wait(self):
+        if self._tile_wait is not None:
+            self._tile_wait.cancel()
+            self._tile_wait = None
+
+    def _close_incremental_planner(self):
+        if self._incremental_planner is not None:
+            self._incremental_planner.close()
+            self._incremental_planner = None
+
+    def _prefetch_around(self, x, y):
+        tiled_map = self.tile_map.tiled_map
+        if tiled_map.chunk_streamer is not None:
+            radius = self.prefetch_radius
+            tiled_map.prefetch_region(x - radius, y - radius, x + radius, y + radius)
+
     def get_tile_in_direction(self, direction):
         """Find out what the coordinates of the tile are in the specified
         direction.
@@ -452,7 +1285,202 @@ class TileMovement(Widget):
             Rectangle(pos=self.pos, size=self.size)
 
 
+class CooperativeMovement(object):
+    """Moves TileMovement entities in lock step along paths from the map's
+    CooperativePlanner, so they never walk into each other. Agents are
+    planned a few per frame, within planning_budget tiles searched and
+    planning_time seconds, and all move one tile every
+    TileMovement.step_duration seconds.
+
+    :param tile_map: The tile map the entities are on.
+    :type tile_map: TileMap
+    :param on_stalled: Called with the list of entities that stopped getting
+        any closer to their destination (see CooperativePlanner.stalled),
+        once a frame when there are new ones.
+    :type on_stalled: callable
+    """
+    # tiles the cooperative planner may search per frame
+    planning_budget = 2000
+
+    # seconds the cooperative planner may search for per frame
+    planning_time = 0.004
+
+    def __init__(self, tile_map, on_stalled=None):
+        self.tile_map = tile_map
+        self.on_stalled = on_stalled
+        self.planner = tile_map.tiled_map.get_cooperative_planner()
+
+        # agent id to TileMovement
+        self._movements = {}
+        # ids of the agents reported stalled
+        self._stalled = set()
+        self._plan_event = None
+        self._step_event = None
+
+    def move_to_tile(self, movement, tile):
+        """Have an entity move to a tile, along with the others.
+        :type movement: TileMovement
+        :type tile: (int, int)
+        """
+        agent_id = id(movement)
+        movement.destination_tile.x = tile[0]
+        movement.destination_tile.y = tile[1]
+        if agent_id in self._movements:
+            self.planner.set_destination(agent_id, tile)
+        else:
+            self._movements[agent_id] = movement
+            self.planner.add_agent(agent_id, (movement.current_tile.x, movement.current_tile.y), tile)
+
+        if self._plan_event is None:
+            self._plan_event = Clock.schedule_interval(self._plan, 0)
+            self._step_event = Clock.schedule_interval(self._step, TileMovement.step_duration)
+
+    def remove(self, movement):
+        """Stop moving an entity, it's left where it is."""
+        if self._movements.pop(id(movement), None) is not None:
+            self.planner.remove_agent(id(movement))
+        if not self._movements:
+            self.stop()
+
+    def stop(self):
+        if self._plan_event is not None:
+            self._plan_event.cancel()
+            self._step_event.cancel()
+            self._plan_event = self._step_event = None
+
+    def _plan(self, dt):
+        self.planner.plan(self.planning_budget, self.planning_time)
+        if self.on_stalled is not None:
+            stalled = set(self.planner.stalled())
+            new = stalled - self._stalled
+            self._stalled = stalled
+            if new:
+                self.on_stalled([self._movements[agent_id] for agent_id in new])
+
+    def _step(self, dt):
+        for agent_id, (x, y) in self.planner.advance().items():
+            movement = self._movements[agent_id]
+            direction = TileMovement.DIRECTIONS.get((x - movement.current_tile.x, y - movement.current_tile.y))
+            if direction is not None:
+                movement.move(direction)
+
+
+class MovementSystem(object):
+    """Moves TileMovement entities along their paths from one Clock
+    callback a frame instead of an Animation a step each, for maps with
+    thousands of them. Requires numpy.
+
+    Where every entity is along its path, walking a tile every step_duration
+    seconds of its own, is worked out for all of them at once by a
+    PathFollowers, and the entities that got to their destination
+    dispatch on_complete together once all the others were moved.
+
+    :param tile_map: The tile map the entities are on.
+    :type tile_map: TileMap
+    :param on_arrived: Called with the list of entities that got to their
+        destination, once a frame when there are any.
+    :type on_arrived: callable
+    """
+    def __init__(self, tile_map, on_arrived=None):
+        self.tile_map = tile_map
+        self.on_arrived = on_arrived
+        self.followers = PathFollowers(tile_map.tiled_map.get_collision_grid())
+
+        # agent of the path followers to TileMovement, and back by id
+        self._movements = {}
+        self._agents = {}
+        self._event = None
+
+    def move_to_tile(self, movement, tile):
+        """Have an entity walk to a tile, along a path from find_path with
+        its path_algorithm.
+        :type movement: TileMovement
+        :type tile: (int, int)
+        :return: Whether or not there's a path.
+        :rtype: bool
+        """
+        tiled_map = self.tile_map.tiled_map
+        current_x, current_y = movement.current_tile.x, movement.current_tile.y
+        path = find_path(tiled_map, current_x, current_y, tile[0], tile[1], movement.path_algorithm)
+        if not path:
+            Logger.debug('MovementSystem: Move failed, no path')
+            return False
+
+        movement.destination_tile.x = tile[0]
+        movement.destination_tile.y = tile[1]
+        movement.moving = True
+
+        agent = self._agents.get(id(movement))
+        if agent is None:
+            agent = self._agents[id(movement)] = self.followers.add(path, 1.0 / movement.step_duration)
+            self._movements[agent] = movement
+        else:
+            self.followers.set_path(agent, path)
+
+        if self._event is None:
+            self._event = Clock.schedule_interval(self._update, 0)
+        return True
+
+    def remove(self, movement):
+        """Stop moving an entity, it's left where it is."""
+        agent = self._agents.pop(id(movement), None)
+        if agent is not None:
+            del self._movements[agent]
+            self.followers.remove(agent)
+            movement.moving = False
+        if not self._agents:
+            self.stop()
+
+    def stop(self):
+        if self._event is not None:
+            self._event.cancel()
+            self._event = None
+
+    def _update(self, dt):
+        moved, arrived, blocked = self.followers.advance(dt)
+        if not len(moved):
+            return
+
+        # tile coordinates to widget positions, see TileMap._get_tile_pos
+        tile_map = self.tile_map
+        tile_width, tile_height = tile_map.scaled_tile_size
+        positions = self.followers.positions[moved]
+        xs = (positions[:, 0] * tile_width).tolist()
+        ys = ((tile_map.tile_map_size[1] - positions[:, 1] - 1) * tile_height).tolist()
+        tiles = self.followers.tiles[moved].tolist()
+
+        movements = self._movements
+        directions = TileMovement.DIRECTIONS
+        for agent, x, y, tile in zip(moved.tolist(), xs, ys, tiles):
+            movement = movements[agent]
+            current_tile = movement.current_tile
+            if tile[0] != current_tile.x or tile[1] != current_tile.y:
+                # facing the way of the step, as a move does
+                movement.direction = directions.get(
+                    (tile[0] - current_tile.x, tile[1] - current_tile.y), movement.direction)
+                current_tile.x, current_tile.y = tile
+            movement.pos = x, y
+
+        for agent in blocked.tolist():
+            movement = movements[agent]
+            Logger.debug('MovementSystem: Move failed, finding a different path')
+            destination = (movement.destination_tile.x, movement.destination_tile.y)
+            if not self.move_to_tile(movement, destination):
+                self.remove(movement)
+
+        if len(arrived):
+            completed = [movements[agent] for agent in arrived.tolist()]
+            for movement in completed:
+                self.remove(movement)
+            for movement in completed:
+                movement.dispatch('on_complete')
+            if self.on_arrived is not None:
+                self.on_arrived(completed)
+
+
 class TiledNode(object):
+    __slots__ = ('x', 'y', 'next', 'previous')
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -477,7 +1505,7 @@ class TiledNode(object):
         return '<TiledNode: {},{}>'.format(self.x, self.y)
 
     def __hash__(self):
-        return hash(self.__repr__())
+        return hash((self.x, self.y))
 
 
 def build_path(node):
@@ -489,48 +1517,110 @@ def build_path(node):
     """
     path = []
     while node is not None:
-        path.insert(0, (node.x, node.y))
+        path.append((node.x, node.y))
         node = node.previous
+    path.reverse()
     return path
 
 
-def find_path(tiled_map, start_x, start_y, dest_x, dest_y):
-    """Find a path from the start position to the destination.
+def find_path(tiled_map, start_x, start_y, dest_x, dest_y, algorithm='astar', use_cache=True):
+    """Find the shortest path from the start position to the destination.
     :param tiled_map: The tile map to find a path in.
     :type tiled_map: TiledMap
+    :param algorithm: 'astar' or 'jps' for the shortest path, JPS being
+        faster on maps of rooms and open floor once its jump tables are
+        built, but not on maps cluttered with obstacles, 'hpa' for a near
+        shortest one
+        found much faster on big maps. Only 'astar' weighs the path by the
+        map's tile costs, see KivyTiledMap.get_cost_grid.
+    :type algorithm: str
+    :param use_cache: Whether to look the path up in the map's path cache
+        first. Cached paths are dropped when a tile on them becomes
+        collidable, but not when a shorter way opens up.
+    :type use_cache: bool
     :return: List of tiles in the path found.
     :rtype: list
     """
-
-    start_node = TiledNode(start_x, start_y)
-    end_node = TiledNode(dest_x, dest_y)
-
-    reachable = set([start_node])
-    explored = set()
-
-    while reachable:  # while reachable is not empty
-        # choose some node we know how to reach
-        # casting to list to be able to
-        node = random.sample(reachable, 1)[0]
-
-        # if the node is the end node, build and return the path
-        if node == end_node:
-            return build_path(node)
-
-        # don't repeat ourselves
-        reachable.remove(node)
-        explored.add(node)
-
-        # find out possible moves from this point
-        adjacent_tiles = set([TiledNode(*tile) for tile in tiled_map.get_adjacent_tiles(node.x, node.y)])
-        new_reachable = adjacent_tiles - explored
-        for adjacent in new_reachable:
-            if adjacent not in reachable:
-                adjacent.previous = node  # remember how we got there
-                reachable.add(adjacent)
-
-    # if we got here no path was found
-    return []
+    # refresh the grid first, replacing the collision layer rebuilds it
+    grid = tiled_map.get_collision_grid()
+    if algorithm == 'astar':
+        def search(start, dest):
+            return astar(grid, start, dest, costs=tiled_map.get_cost_grid())
+    elif algorithm == 'jps':
+        search = tiled_map.get_jump_point_search().find_path
+    elif algorithm == 'hpa':
+        search = tiled_map.get_hierarchical_pathfinder().find_path
+    else:
+        raise ValueError('Unknown path finding algorithm "{}", use one of {}'.format(algorithm, PATH_ALGORITHMS))
+
+    start, dest = (start_x, start_y), (dest_x, dest_y)
+    if not tiled_map.is_reachable(start_x, start_y, dest_x, dest_y):
+        return []
+    if not use_cache:
+        return search(start, dest)
+    return tiled_map.get_path_cache(algorithm).find_path(start, dest, search)
+
+
+def find_paths(tiled_map, pairs, algorithm='astar', use_cache=True):
+    """Find the paths between many pairs of tiles at once, such as when every
+    agent re-plans, spread over the map's batch planner processes.
+    :param pairs: The ((start_x, start_y), (dest_x, dest_y)) to find paths
+        for.
+    :type pairs: list
+    :return: List of paths in the order of pairs, see find_path.
+    :rtype: list
+    """
+    tiled_map.get_collision_grid()
+    pairs = [(tuple(start), tuple(dest)) for start, dest in pairs]
+    path_cache = tiled_map.get_path_cache(algorithm) if use_cache else None
+
+    component_labels = tiled_map.get_component_labels()
+    paths = [
+        (path_cache.get(start, dest) if path_cache else None) if component_labels.is_connected(start, dest) else []
+        for start, dest in pairs
+    ]
+    missing = [index for index, path in enumerate(paths) if path is None]
+    if missing:
+        found = tiled_map.get_batch_planner().find_paths([pairs[index] for index in missing], algorithm)
+        for index, path in zip(missing, found):
+            paths[index] = path
+            if path_cache is not None:
+                path_cache.put(pairs[index][0], pairs[index][1], path)
+    return paths
+
+
+def find_path_async(tiled_map, start_x, start_y, dest_x, dest_y, callback, algorithm='astar', use_cache=True):
+    """Find a path like find_path does, but on a background thread against a
+    snapshot of the collision grid so the frame doesn't stall.
+    :param callback: Called on the main thread with the list of tiles in the
+        path found, right away if it was cached or there is none.
+    :type callback: callable
+    :return: The request, cancel it to drop the path, None if it came from
+        the cache or there is none.
+    :rtype: PlanRequest
+    """
+    start, dest = (start_x, start_y), (dest_x, dest_y)
+    # refresh the grid first, replacing the collision layer rebuilds it
+    tiled_map.get_collision_grid()
+    if not tiled_map.is_reachable(start_x, start_y, dest_x, dest_y):
+        callback([])
+        return None
+    path_cache = tiled_map.get_path_cache(algorithm) if use_cache else None
+    if path_cache is not None:
+        path = path_cache.get(start, dest)
+        if path is not None:
+            callback(path)
+            return None
+
+    planner = tiled_map.get_path_planner()
+
+    def on_planned(request):
+        # paths found on an outdated snapshot may cross tiles blocked since
+        if path_cache is not None and planner.is_current(request):
+            path_cache.put(start, dest, request.path)
+        callback(request.path)
+
+    return planner.request(start, dest, on_planned, algorithm)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,148 @@
+"""Process wide cache of decoded tileset images.
+
+Every level using the same tileset image shares one texture and one set of
+tile regions cut from it, instead of decoding the image again for each map.
+Make sure that there is an active OpenGL context (Kivy Window) before using
+it, same as KivyTiledMap.
+"""
+import collections
+import itertools
+import os
+
+from kivy.core.image import Image as CoreImage
+from kivy.logger import Logger
+
+
+class _CachedTileset(object):
+    def __init__(self, mtime, texture):
+        self.mtime = mtime
+        self.texture = texture
+        # 4 bytes per pixel once uploaded as RGBA
+        self.nbytes = texture.width * texture.height * 4
+        # (tilewidth, tileheight, spacing, margin) to the list of regions
+        self.regions = {}
+
+
+class TilesetCache(object):
+    """Least recently used cache of tileset textures, keyed on the absolute
+    path and modification time of the image.
+
+    Evicting a tileset only drops the cache's references, maps that loaded
+    it keep their regions.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        # the memory budget for the cached textures
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # absolute path to _CachedTileset, least recently used first
+        self._tilesets = collections.OrderedDict()
+
+    def get_texture(self, image_path):
+        """Get the texture of a tileset image, decoding it if it's not cached
+        or changed on disk since.
+        :rtype: kivy.graphics.texture.Texture
+        """
+        return self._get(image_path).texture
+
+    def get_regions(self, image_path, tilewidth, tileheight, spacing=0, margin=0):
+        """Cut a tileset image into tiles.
+        :return: The tileset texture and a list with the region of each tile,
+            indexed by tile id. Tiles that don't fit in the image are None.
+        :rtype: (kivy.graphics.texture.Texture, list)
+        """
+        tileset = self._get(image_path)
+        key = (tilewidth, tileheight, spacing, margin)
+        regions = tileset.regions.get(key)
+        if regions is None:
+            regions = tileset.regions[key] = _cut_regions(tileset.texture, tilewidth, tileheight, spacing, margin)
+        return tileset.texture, regions
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / float(lookups) if lookups else 0.0,
+            'size_bytes': self.size_bytes,
+            'tilesets': len(self._tilesets),
+        }
+
+    def clear(self):
+        self._tilesets.clear()
+        self.size_bytes = 0
+
+    def _get(self, image_path):
+        path = os.path.abspath(image_path)
+        mtime = os.path.getmtime(path)
+
+        tileset = self._tilesets.pop(path, None)
+        if tileset is not None and tileset.mtime == mtime:
+            self.hits += 1
+            self._tilesets[path] = tileset  # most recently used
+            return tileset
+
+        if tileset is not None:
+            Logger.debug('TilesetCache: {} changed on disk, reloading'.format(path))
+            self.size_bytes -= tileset.nbytes
+
+        self.misses += 1
+        Logger.debug('TilesetCache: loading tile image at {}'.format(path))
+        tileset = _CachedTileset(mtime, CoreImage(path).texture)
+        self._tilesets[path] = tileset
+        self.size_bytes += tileset.nbytes
+        self._evict(keep=path)
+        return tileset
+
+    def _evict(self, keep):
+        for path in list(self._tilesets):
+            if self.size_bytes <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            tileset = self._tilesets.pop(path)
+            self.size_bytes -= tileset.nbytes
+            self.evictions += 1
+            Logger.debug('TilesetCache: evicted {}'.format(path))
+
+
+def _cut_regions(texture, tilewidth, tileheight, spacing, margin):
+    """Port of the slicing code here: https://github.com/bitcraft/PyTMX/blob/master/pytmx/tmxloader.py"""
+    texture_width, texture_height = texture.size
+    spaced_width = tilewidth + spacing
+    spaced_height = tileheight + spacing
+
+    # some tileset images may be slightly larger than the tile area
+    # ie: may include a banner, copyright, ect.  this compensates for that
+    width = ((texture_width - margin * 2 + spacing) // spaced_width) * spaced_width - spacing
+    height = ((texture_height - margin * 2 + spacing) // spaced_height) * spaced_height - spacing
+
+    p = itertools.product(
+        range(margin, height + margin, spaced_height),
+        range(margin, width + margin, spaced_width)
+    )
+
+    # trim off any pixels on the right side that isn't a tile
+    # this happens if extra graphics are included on the left, but they are not actually part of the tileset
+    width -= (texture_width - margin) % spaced_width
+
+    regions = []
+    for y, x in p:
+        if x + tilewidth - spacing > width:
+            regions.append(None)
+            continue
+
+        # invert y for OpenGL coordinates
+        y = texture_height - y - tileheight
+        regions.append(texture.get_region(x, y, tilewidth, tileheight))
+    return regions
+
+
+# shared by every KivyTiledMap
+tileset_cache = TilesetCache()
@@ -0,0 +1,133 @@
+"""Waiting for tiles of a collision grid to change.
+
+Agents that can't get anywhere shouldn't search the map again on a timer
+just to find out nothing changed. They wait on the tiles or the region in
+the way instead, and are called back the moment one of those changes.
+Waits are filed by the square buckets of tiles they cover, so a change only
+looks at the waits of its own bucket and the ones covering the whole grid.
+"""
+
+
+class TileWait(object):
+    """A wait added with TileWaiters.wait, called back at most once."""
+
+    def __init__(self, waiters, callback, tiles, bounds, blocked):
+        self.waiters = waiters
+        self.callback = callback
+        self.tiles = tiles
+        self.bounds = bounds
+        self.blocked = blocked
+        self.cancelled = False
+        self._buckets = ()
+
+    def cancel(self):
+        """Stop waiting, the callback won't be called."""
+        self.cancelled = True
+        self.waiters._remove(self)
+
+    def matches(self, x, y, blocked):
+        if self.blocked is not None and blocked != self.blocked:
+            return False
+        if self.tiles is not None and (x, y) not in self.tiles:
+            return False
+        if self.bounds is not None:
+            x0, y0, x1, y1 = self.bounds
+            return x0 <= x <= x1 and y0 <= y <= y1
+        return True
+
+
+class TileWaiters(object):
+    """The waits on the tiles of a CollisionGrid.
+
+    :param grid: The collision grid, changes to it are picked up through a
+        listener.
+    :type grid: CollisionGrid
+    :param bucket_size: Width and height in tiles of the buckets waits are
+        filed in.
+    :type bucket_size: int
+    """
+
+    def __init__(self, grid, bucket_size=16):
+        self.grid = grid
+        self.bucket_size = bucket_size
+
+        self.woken = 0
+
+        # (bucket x, bucket y) to the waits covering some of its tiles, None
+        # for the waits on the whole grid
+        self._buckets = {}
+        grid.add_listener(self._on_tile_changed)
+
+    def close(self):
+        """Stop following changes to the grid."""
+        self.grid.remove_listener(self._on_tile_changed)
+
+    def wait(self, callback, tiles=None, bounds=None, blocked=None):
+        """Wait for a tile to change.
+
+        :param callback: Called with the wait and the ``(x, y, blocked)`` of
+            the first change matching it, from within the grid's listeners,
+            so defer any work that changes the grid or reads what its other
+            listeners build.
+        :type callback: callable
+        :param tiles: Coordinate tuples of the tiles to wait on, all of them
+            if None.
+        :type tiles: list
+        :param bounds: Rectangle of tiles ``(x0, y0, x1, y1)``, both corners
+            included, to wait on, the whole grid if None.
+        :type bounds: (int, int, int, int)
+        :param blocked: Only wait for tiles becoming collidable if True or
+            walkable if False.
+        :type blocked: bool
+        :rtype: TileWait
+        """
+        tiles = None if tiles is None else set(tuple(tile) for tile in tiles)
+        wait = TileWait(self, callback, tiles, bounds, blocked)
+
+        size = self.bucket_size
+        if tiles is not None:
+            keys = set((x // size, y // size) for x, y in tiles)
+        elif bounds is not None:
+            x0, y0, x1, y1 = bounds
+            keys = set(
+                (bucket_x, bucket_y)
+                for bucket_x in range(max(x0, 0) // size, min(x1, self.grid.width - 1) // size + 1)
+                for bucket_y in range(max(y0, 0) // size, min(y1, self.grid.height - 1) // size + 1)
+            )
+        else:
+            keys = [None]
+
+        for key in keys:
+            self._buckets.setdefault(key, []).append(wait)
+        wait._buckets = keys
+        return wait
+
+    def waiting(self):
+        """Get the number of waits not called back or cancelled yet.
+        :rtype: int
+        """
+        return len(set(wait for waits in self._buckets.values() for wait in waits))
+
+    def _on_tile_changed(self, x, y, blocked):
+        size = self.bucket_size
+        for key in ((x // size, y // size), None):
+            waits = self._buckets.get(key)
+            if not waits:
+                continue
+
+            for wait in list(waits):
+                # an earlier callback may have cancelled it
+                if not wait.cancelled and wait.matches(x, y, blocked):
+                    self._remove(wait)
+                    wait.cancelled = True
+                    self.woken += 1
+                    wait.callback(wait, x, y, blocked)
+
+    def _remove(self, wait):
+        for key in wait._buckets:
+            waits = self._buckets.get(key)
+            if waits is not None and wait in waits:
+                waits.remove(wait)
+                if not waits:
+                    del self._buckets[key]
+        wait._buckets = ()